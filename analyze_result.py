@@ -4,23 +4,7 @@ from pathlib import Path
 
 import pandas as pd
 
-
-def extract_timing(f):
-    total_time = None
-    ipopt_time = None
-    ad_time = None
-    with open(f, "r") as f:
-        lines = f.readlines()
-    for line in reversed(lines):
-        if total_time and ipopt_time and ad_time:
-            break
-        if "OverallAlgorithm" in line:
-            ipopt_time = float(line.split()[1])
-        elif "Function Evaluations" in line:
-            ad_time = float(line.split()[2])
-        elif "Total time" in line:
-            total_time = float(line.split()[2])
-    return total_time, ipopt_time, ad_time
+from results_store import load_phases, run_table
 
 
 def main():
@@ -52,16 +36,13 @@ def main():
             solvers_details.append(f"{solver}.{i}")
     wide_df = pd.DataFrame(columns=solvers_details, index=test_cases)
 
-    logdir = Path(__file__).parent / "log"
+    runs = run_table("polar")
 
     for case, solver in product(test_cases, solvers):
-        suffix = solver
-        if solver == "poi":
-            suffix = "poi_LLVM"
-        # print(f"Get {case} with {solver}")
-        logpath = logdir / f"{case}_{suffix}.log"
-        with open(logpath, "r") as f:
-            total_time, ipopt_time, ad_time = extract_timing(logpath)
+        run = runs.get((case, solver), {})
+        total_time = run.get("total_time")
+        ipopt_time = run.get("ipopt_time")
+        ad_time = run.get("ad_time")
 
         if total_time:
             content = f"{ad_time:.1f}/{ipopt_time:.1f}/{total_time:.1f}"
@@ -85,6 +66,16 @@ def main():
 
     wide_df.to_csv("result_wide.csv")
 
+    # phase breakdown of the Python backends from their run records
+    phase_df = load_phases("polar")
+    phase_df = phase_df[phase_df["case"].isin(test_cases)]
+    if len(phase_df) > 0:
+        phase_df = phase_df.pivot_table(
+            index=["case", "solver"], columns="phase", values="seconds"
+        )
+        print(phase_df)
+        phase_df.to_csv("result_phases.csv")
+
 
 if __name__ == "__main__":
     main()
@@ -4,29 +4,7 @@ from pathlib import Path
 
 import pandas as pd
 
-
-def extract_timing(f):
-    total_time = None
-    ipopt_time = None
-    ad_time = None
-    number_of_iterations = None
-    objective_value = None
-    with open(f, "r") as f:
-        lines = f.readlines()
-    for line in reversed(lines):
-        if total_time and ipopt_time and ad_time and number_of_iterations and objective_value:
-            break
-        if "OverallAlgorithm" in line:
-            ipopt_time = float(line.split()[1])
-        elif "Function Evaluations" in line:
-            ad_time = float(line.split()[2])
-        elif "Total time" in line:
-            total_time = float(line.split()[2])
-        elif "Number of Iterations....:" in line:
-            number_of_iterations = int(line.split()[3])
-        elif "Objective...............:" in line:
-            objective_value = float(line.split()[2])
-    return total_time, ipopt_time, ad_time, number_of_iterations, objective_value
+from results_store import run_table
 
 
 def main():
@@ -57,16 +35,15 @@ def main():
             solvers_details.append(f"{solver}.{i}")
     wide_df = pd.DataFrame(columns=solvers_details, index=test_cases)
 
-    logdir = Path(__file__).parent / "log"
+    runs = run_table("polar")
 
     for case, solver in product(test_cases, solvers):
-        suffix = solver
-        if solver == "poi":
-            suffix = "poi_LLVM"
-        # print(f"Get {case} with {solver}")
-        logpath = logdir / f"{case}_{suffix}.log"
-        with open(logpath, "r") as f:
-            total_time, ipopt_time, ad_time, number_of_iterations, objective_value = extract_timing(logpath)
+        run = runs.get((case, solver), {})
+        total_time = run.get("total_time")
+        ipopt_time = run.get("ipopt_time")
+        ad_time = run.get("ad_time")
+        number_of_iterations = run.get("iterations")
+        objective_value = run.get("objective")
 
         if total_time:
             content = f"{ad_time:.1f}/{ipopt_time:.1f}/{total_time:.1f}"
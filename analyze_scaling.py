@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+
+from results_store import load_phases, load_runs
+from timing import SUMMARY_PHASES
+
+
+def build_times(phase_df):
+    # seconds spent creating variables and constraints per run
+    summary = phase_df["phase"].map(lambda p: SUMMARY_PHASES.get(p, "constraints"))
+    build = phase_df[summary.isin(["variables", "constraints"])]
+    return (
+        build.groupby(["case", "solver", "method", "jit"], dropna=False)["seconds"]
+        .sum()
+        .rename("build_time")
+        .reset_index()
+    )
+
+
+def normalized_metrics(run_df, phase_df):
+    df = run_df.merge(
+        build_times(phase_df), on=["case", "solver", "method", "jit"], how="left"
+    )
+    df["n_constraints"] = df["n_equality"] + df["n_inequality"]
+    df["nnz_jacobian"] = df["nnz_jac_equality"] + df["nnz_jac_inequality"]
+    df["nnz"] = df["nnz_jacobian"] + df["nnz_hessian"]
+    df["build_us_per_nnz"] = df["build_time"] * 1e6 / df["nnz"]
+    per_iteration_nnz = df["iterations"] * df["nnz"]
+    df["eval_us_per_iter_nnz"] = df["ad_time"] * 1e6 / per_iteration_nnz
+    df["ipopt_us_per_iter_nnz"] = df["ipopt_time"] * 1e6 / per_iteration_nnz
+    return df
+
+
+def scaling_exponents(df):
+    # slope of log(time) over log(nnz) per backend and formulation, close to 1
+    # for a backend whose cost grows linearly with the problem
+    rows = []
+    for (solver, method), group in df.groupby(["solver", "method"]):
+        row = {"solver": solver, "method": method, "cases": len(group)}
+        for name, time in [
+            ("build", group["build_time"]),
+            ("eval_per_iter", group["ad_time"] / group["iterations"]),
+        ]:
+            valid = (time > 0) & (group["nnz"] > 0)
+            row[name] = (
+                np.polyfit(np.log(group["nnz"][valid]), np.log(time[valid]), 1)[0]
+                if valid.sum() >= 3
+                else np.nan
+            )
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def formulation_comparison(df, base="polar"):
+    # function evaluation milliseconds per iteration and iterations of every
+    # formulation next to the `base` one, per case and backend
+    df = df.assign(eval_ms_per_iter=df["ad_time"] * 1e3 / df["iterations"])
+    table = df.pivot_table(
+        index=["case", "solver"],
+        columns="method",
+        values=["eval_ms_per_iter", "iterations"],
+    )
+    if base in table["eval_ms_per_iter"]:
+        for method in table["eval_ms_per_iter"].columns:
+            if method != base:
+                table[("eval_ratio", method)] = (
+                    table[("eval_ms_per_iter", method)]
+                    / table[("eval_ms_per_iter", base)]
+                )
+    return table
+
+
+def main():
+    run_df = load_runs()
+    run_df = run_df[run_df["nnz_hessian"].notna()]
+    df = normalized_metrics(run_df, load_phases())
+
+    columns = [
+        "case",
+        "solver",
+        "method",
+        "n_variables",
+        "n_constraints",
+        "nnz_jacobian",
+        "nnz_hessian",
+        "build_us_per_nnz",
+        "eval_us_per_iter_nnz",
+        "ipopt_us_per_iter_nnz",
+    ]
+    df = df.sort_values(["method", "solver", "nnz"])
+    print(df[columns].to_string(index=False, float_format="{:.4f}".format))
+    df[columns].to_csv("result_scaling.csv", index=False)
+
+    # structure of the formulations side by side
+    structure = df.pivot_table(
+        index=["case", "solver"],
+        columns="method",
+        values=["n_variables", "n_constraints", "nnz_jacobian", "nnz_hessian"],
+    )
+    print(structure.to_string())
+
+    print(formulation_comparison(df).to_string(float_format="{:.3f}".format))
+
+    print(scaling_exponents(df).to_string(index=False, float_format="{:.2f}".format))
+
+
+if __name__ == "__main__":
+    main()
@@ -3,19 +3,42 @@
 # pip install casadi
 
 import casadi
-from pathlib import Path
-import json
-import time
+import numpy as np
+
+import argparse
+import itertools
 import math
+import shutil
+
+from case_data import load_case
+import casadi_codegen
+from ipopt_log import exit_message
+from network_reduction import (
+    bus_mismatch,
+    expand_solution,
+    reduce_network,
+    reduction_sizes,
+)
+from power_flow import ac_start, current_coefficients, power_flow_start
+from timing import SETUP_PHASES, PhaseTimer, traced_allocations, write_record
+
+# formulations in vm, va, the others are in vr, vi
+polar_methods = ["polar", "polar_aux"]
 
 
-def solve_opf(data, options):
+def build_opf(data, timer=None, aux=False):
+    # with aux the voltage products wr, wi of every branch are variables,
+    # defined once, and the four flows are linear in them
+    if timer is None:
+        timer = PhaseTimer()
+    timer.mark()
+
     x, x0, lbx, ubx, cons, lbg, ubg = [], [], [], [], [], [], []
 
     va, vm = {}, {}
-    Nbus = len(data["bus"])
-    vmin = data["vmin"]
-    vmax = data["vmax"]
+    Nbus = data.Nbus
+    vmin = data.vmin.tolist()
+    vmax = data.vmax.tolist()
     for k in range(Nbus):
         va[k] = casadi.SX.sym(f"va{k}")
         x.append(va[k])
@@ -29,11 +52,11 @@ def solve_opf(data, options):
         ubx.append(vmax[k])
 
     pg, qg = {}, {}
-    Ngen = len(data["gen"])
-    pmin = data["pmin"]
-    pmax = data["pmax"]
-    qmin = data["qmin"]
-    qmax = data["qmax"]
+    Ngen = data.Ngen
+    pmin = data.pmin.tolist()
+    pmax = data.pmax.tolist()
+    qmin = data.qmin.tolist()
+    qmax = data.qmax.tolist()
     for k in range(Ngen):
         pg[k] = casadi.SX.sym(f"pg{k}")
         x.append(pg[k])
@@ -47,8 +70,8 @@ def solve_opf(data, options):
         ubx.append(qmax[k])
 
     p, q = {}, {}
-    Narc = len(data["arc"])
-    rate_a = data["rate_a"]
+    Narc = data.Narc
+    rate_a = data.rate_a.tolist()
     for k in range(Narc):
         a = rate_a[k]
         p[k] = casadi.SX.sym(f"p{k}")
@@ -61,50 +84,74 @@ def solve_opf(data, options):
         x0.append(0.0)
         lbx.append(-a)
         ubx.append(a)
+    timer.lap("variables")
 
     f = sum(
-        g["cost1"] * pg[g["i"] - 1] * pg[g["i"] - 1]
-        + g["cost2"] * pg[g["i"] - 1]
-        + g["cost3"]
-        for g in data["gen"]
+        cost1 * pg[i] * pg[i] + cost2 * pg[i] + cost3
+        for i, (cost1, cost2, cost3) in enumerate(
+            zip(
+                data.gen_cost1.tolist(),
+                data.gen_cost2.tolist(),
+                data.gen_cost3.tolist(),
+            )
+        )
     )
+    timer.lap("objective")
 
-    for k in data["ref_buses"]:
-        cons.append(va[k - 1])
+    for k in data.ref_buses.tolist():
+        cons.append(va[k])
         lbg.append(0)
         ubg.append(0)
+    timer.lap("reference")
 
-    p_balance_expr = [0.0 for _ in range(Nbus)]
-    q_balance_expr = [0.0 for _ in range(Nbus)]
-    for i, b in enumerate(data["bus"]):
-        p_balance_expr[i] += b["pd"] + b["gs"] * vm[i] * vm[i]
-        q_balance_expr[i] += b["qd"] - b["bs"] * vm[i] * vm[i]
-    for a in data["arc"]:
-        bus = a["bus"] - 1
-        i = a["i"] - 1
-        p_balance_expr[bus] += p[i]
-        q_balance_expr[bus] += q[i]
-    for g in data["gen"]:
-        bus = g["bus"] - 1
-        i = g["i"] - 1
-        p_balance_expr[bus] -= pg[i]
-        q_balance_expr[bus] -= qg[i]
-
+    bus_pd = data.bus_pd.tolist()
+    bus_qd = data.bus_qd.tolist()
+    bus_gs = data.bus_gs.tolist()
+    bus_bs = data.bus_bs.tolist()
+    bus_arcs = data.bus_arc_slices()
+    bus_gens = data.bus_gen_slices()
     for i in range(Nbus):
-        cons.append(p_balance_expr[i])
+        p_balance_expr = bus_pd[i] + bus_gs[i] * vm[i] * vm[i]
+        q_balance_expr = bus_qd[i] - bus_bs[i] * vm[i] * vm[i]
+        for a in bus_arcs[i]:
+            p_balance_expr += p[a]
+            q_balance_expr += q[a]
+        for g in bus_gens[i]:
+            p_balance_expr -= pg[g]
+            q_balance_expr -= qg[g]
+        cons.append(p_balance_expr)
         lbg.append(0)
         ubg.append(0)
-        cons.append(q_balance_expr[i])
+        cons.append(q_balance_expr)
         lbg.append(0)
         ubg.append(0)
+    timer.lap("balance")
 
-    angmin = data["angmin"]
-    angmax = data["angmax"]
-    for i, br in enumerate(data["branch"]):
-        f_idx = br["f_idx"] - 1
-        t_idx = br["t_idx"] - 1
-        f_bus = br["f_bus"] - 1
-        t_bus = br["t_bus"] - 1
+    angmin = data.angmin.tolist()
+    angmax = data.angmax.tolist()
+    branch = {
+        k: getattr(data, f"branch_{k}").tolist()
+        for k in [
+            "f_idx",
+            "t_idx",
+            "f_bus",
+            "t_bus",
+            "g",
+            "b",
+            "tr",
+            "ti",
+            "g_fr",
+            "b_fr",
+            "g_to",
+            "b_to",
+            "rate_a_sq",
+        ]
+    }
+    for i in range(data.Nbranch):
+        f_idx = branch["f_idx"][i]
+        t_idx = branch["t_idx"][i]
+        f_bus = branch["f_bus"][i]
+        t_bus = branch["t_bus"][i]
         p_fr = p[f_idx]
         q_fr = q[f_idx]
         p_to = p[t_idx]
@@ -113,38 +160,58 @@ def solve_opf(data, options):
         vm_to = vm[t_bus]
         va_fr = va[f_bus]
         va_to = va[t_bus]
-        g, b = br["g"], br["b"]
-        tr, ti = br["tr"], br["ti"]
+        g, b = branch["g"][i], branch["b"][i]
+        tr, ti = branch["tr"][i], branch["ti"][i]
         ttm = tr**2 + ti**2
-        g_fr = br["g_fr"]
-        b_fr = br["b_fr"]
-        g_to = br["g_to"]
-        b_to = br["b_to"]
+        g_fr = branch["g_fr"][i]
+        b_fr = branch["b_fr"][i]
+        g_to = branch["g_to"][i]
+        b_to = branch["b_to"][i]
+        if aux:
+            wr = casadi.SX.sym(f"wr{i}")
+            wi = casadi.SX.sym(f"wi{i}")
+            w_max = vmax[f_bus] * vmax[t_bus]
+            for w, start in [(wr, 1.0), (wi, 0.0)]:
+                x.append(w)
+                x0.append(start)
+                lbx.append(-w_max)
+                ubx.append(w_max)
+            cons.append(wr - vm_fr * vm_to * casadi.cos(va_fr - va_to))
+            cons.append(wi - vm_fr * vm_to * casadi.sin(va_fr - va_to))
+            lbg.extend([0, 0])
+            ubg.extend([0, 0])
+            re_ft, im_ft = wr, wi
+            re_tf, im_tf = wr, -wi
+        else:
+            re_ft = vm_fr * vm_to * casadi.cos(va_fr - va_to)
+            im_ft = vm_fr * vm_to * casadi.sin(va_fr - va_to)
+            re_tf = vm_to * vm_fr * casadi.cos(va_to - va_fr)
+            im_tf = vm_to * vm_fr * casadi.sin(va_to - va_fr)
         cons.append(
             (g + g_fr) / ttm * vm_fr**2
-            + (-g * tr + b * ti) / ttm * (vm_fr * vm_to * casadi.cos(va_fr - va_to))
-            + (-b * tr - g * ti) / ttm * (vm_fr * vm_to * casadi.sin(va_fr - va_to))
+            + (-g * tr + b * ti) / ttm * re_ft
+            + (-b * tr - g * ti) / ttm * im_ft
             - p_fr
         )
         cons.append(
             -(b + b_fr) / ttm * vm_fr**2
-            - (-b * tr - g * ti) / ttm * (vm_fr * vm_to * casadi.cos(va_fr - va_to))
-            + (-g * tr + b * ti) / ttm * (vm_fr * vm_to * casadi.sin(va_fr - va_to))
+            - (-b * tr - g * ti) / ttm * re_ft
+            + (-g * tr + b * ti) / ttm * im_ft
             - q_fr
         )
         cons.append(
             (g + g_to) * vm_to**2
-            + (-g * tr - b * ti) / ttm * (vm_to * vm_fr * casadi.cos(va_to - va_fr))
-            + (-b * tr + g * ti) / ttm * (vm_to * vm_fr * casadi.sin(va_to - va_fr))
+            + (-g * tr - b * ti) / ttm * re_tf
+            + (-b * tr + g * ti) / ttm * im_tf
             - p_to
         )
         cons.append(
             -(b + b_to) * vm_to**2
-            - (-b * tr + g * ti) / ttm * (vm_to * vm_fr * casadi.cos(va_to - va_fr))
-            + (-g * tr - b * ti) / ttm * (vm_to * vm_fr * casadi.sin(va_to - va_fr))
+            - (-b * tr + g * ti) / ttm * re_tf
+            + (-g * tr - b * ti) / ttm * im_tf
             - q_to
         )
-        for i in range(4):
+        for _ in range(4):
             lbg.append(0)
             ubg.append(0)
 
@@ -152,37 +219,31 @@ def solve_opf(data, options):
         lbg.append(angmin[i])
         ubg.append(angmax[i])
 
-        rate_a_sq = br["rate_a_sq"]
+        rate_a_sq = branch["rate_a_sq"][i]
         cons.append(p_fr**2 + q_fr**2)
         lbg.append(-casadi.inf)
         ubg.append(rate_a_sq)
         cons.append(p_to**2 + q_to**2)
         lbg.append(-casadi.inf)
         ubg.append(rate_a_sq)
+    timer.lap("branch")
+
+    nlp = {"x": casadi.vcat(x), "f": f, "g": casadi.vcat(cons)}
+    bounds = {"lbx": lbx, "ubx": ubx, "lbg": lbg, "ubg": ubg, "x0": x0}
+    return nlp, bounds
 
-    model = casadi.nlpsol(
-        "model",
-        "ipopt",
-        {"x": casadi.vcat(x), "f": f, "g": casadi.vcat(cons)},
-        options,
-    )
-    solution = model(
-        lbx=lbx,
-        ubx=ubx,
-        lbg=lbg,
-        ubg=ubg,
-        x0=x0,
-    )
-    return solution
 
+def build_opf_rectangular(data, timer=None):
+    if timer is None:
+        timer = PhaseTimer()
+    timer.mark()
 
-def solve_opf_rectangular(data, options):
     x, x0, lbx, ubx, cons, lbg, ubg = [], [], [], [], [], [], []
 
     vr, vi = {}, {}
-    Nbus = len(data["bus"])
-    vmin = data["vmin"]
-    vmax = data["vmax"]
+    Nbus = data.Nbus
+    vmin = data.vmin.tolist()
+    vmax = data.vmax.tolist()
     for k in range(Nbus):
         vr[k] = casadi.SX.sym(f"vr{k}")
         x.append(vr[k])
@@ -200,11 +261,11 @@ def solve_opf_rectangular(data, options):
         ubg.append(vmax[k] ** 2)
 
     pg, qg = {}, {}
-    Ngen = len(data["gen"])
-    pmin = data["pmin"]
-    pmax = data["pmax"]
-    qmin = data["qmin"]
-    qmax = data["qmax"]
+    Ngen = data.Ngen
+    pmin = data.pmin.tolist()
+    pmax = data.pmax.tolist()
+    qmin = data.qmin.tolist()
+    qmax = data.qmax.tolist()
     for k in range(Ngen):
         pg[k] = casadi.SX.sym(f"pg{k}")
         x.append(pg[k])
@@ -218,8 +279,8 @@ def solve_opf_rectangular(data, options):
         ubx.append(qmax[k])
 
     p, q = {}, {}
-    Narc = len(data["arc"])
-    rate_a = data["rate_a"]
+    Narc = data.Narc
+    rate_a = data.rate_a.tolist()
     for k in range(Narc):
         a = rate_a[k]
         p[k] = casadi.SX.sym(f"p{k}")
@@ -232,50 +293,74 @@ def solve_opf_rectangular(data, options):
         x0.append(0.0)
         lbx.append(-a)
         ubx.append(a)
+    timer.lap("variables")
 
     f = sum(
-        g["cost1"] * pg[g["i"] - 1] * pg[g["i"] - 1]
-        + g["cost2"] * pg[g["i"] - 1]
-        + g["cost3"]
-        for g in data["gen"]
+        cost1 * pg[i] * pg[i] + cost2 * pg[i] + cost3
+        for i, (cost1, cost2, cost3) in enumerate(
+            zip(
+                data.gen_cost1.tolist(),
+                data.gen_cost2.tolist(),
+                data.gen_cost3.tolist(),
+            )
+        )
     )
+    timer.lap("objective")
 
-    for k in data["ref_buses"]:
-        cons.append(vi[k - 1])
+    for k in data.ref_buses.tolist():
+        cons.append(vi[k])
         lbg.append(0)
         ubg.append(0)
+    timer.lap("reference")
 
-    p_balance_expr = [0.0 for _ in range(Nbus)]
-    q_balance_expr = [0.0 for _ in range(Nbus)]
-    for i, b in enumerate(data["bus"]):
-        p_balance_expr[i] += b["pd"] + b["gs"] * (vr[i] ** 2 + vi[i] ** 2)
-        q_balance_expr[i] += b["qd"] - b["bs"] * (vr[i] ** 2 + vi[i] ** 2)
-    for a in data["arc"]:
-        bus = a["bus"] - 1
-        i = a["i"] - 1
-        p_balance_expr[bus] += p[i]
-        q_balance_expr[bus] += q[i]
-    for g in data["gen"]:
-        bus = g["bus"] - 1
-        i = g["i"] - 1
-        p_balance_expr[bus] -= pg[i]
-        q_balance_expr[bus] -= qg[i]
-
+    bus_pd = data.bus_pd.tolist()
+    bus_qd = data.bus_qd.tolist()
+    bus_gs = data.bus_gs.tolist()
+    bus_bs = data.bus_bs.tolist()
+    bus_arcs = data.bus_arc_slices()
+    bus_gens = data.bus_gen_slices()
     for i in range(Nbus):
-        cons.append(p_balance_expr[i])
+        p_balance_expr = bus_pd[i] + bus_gs[i] * (vr[i] ** 2 + vi[i] ** 2)
+        q_balance_expr = bus_qd[i] - bus_bs[i] * (vr[i] ** 2 + vi[i] ** 2)
+        for a in bus_arcs[i]:
+            p_balance_expr += p[a]
+            q_balance_expr += q[a]
+        for g in bus_gens[i]:
+            p_balance_expr -= pg[g]
+            q_balance_expr -= qg[g]
+        cons.append(p_balance_expr)
         lbg.append(0)
         ubg.append(0)
-        cons.append(q_balance_expr[i])
+        cons.append(q_balance_expr)
         lbg.append(0)
         ubg.append(0)
+    timer.lap("balance")
 
-    angmin = data["angmin"]
-    angmax = data["angmax"]
-    for i, br in enumerate(data["branch"]):
-        f_idx = br["f_idx"] - 1
-        t_idx = br["t_idx"] - 1
-        f_bus = br["f_bus"] - 1
-        t_bus = br["t_bus"] - 1
+    angmin = data.angmin.tolist()
+    angmax = data.angmax.tolist()
+    branch = {
+        k: getattr(data, f"branch_{k}").tolist()
+        for k in [
+            "f_idx",
+            "t_idx",
+            "f_bus",
+            "t_bus",
+            "g",
+            "b",
+            "tr",
+            "ti",
+            "g_fr",
+            "b_fr",
+            "g_to",
+            "b_to",
+            "rate_a_sq",
+        ]
+    }
+    for i in range(data.Nbranch):
+        f_idx = branch["f_idx"][i]
+        t_idx = branch["t_idx"][i]
+        f_bus = branch["f_bus"][i]
+        t_bus = branch["t_bus"][i]
         p_fr = p[f_idx]
         q_fr = q[f_idx]
         p_to = p[t_idx]
@@ -284,13 +369,13 @@ def solve_opf_rectangular(data, options):
         vi_to = vi[t_bus]
         vr_fr = vr[f_bus]
         vr_to = vr[t_bus]
-        g, b = br["g"], br["b"]
-        tr, ti = br["tr"], br["ti"]
+        g, b = branch["g"][i], branch["b"][i]
+        tr, ti = branch["tr"][i], branch["ti"][i]
         ttm = tr**2 + ti**2
-        g_fr = br["g_fr"]
-        b_fr = br["b_fr"]
-        g_to = br["g_to"]
-        b_to = br["b_to"]
+        g_fr = branch["g_fr"][i]
+        b_fr = branch["b_fr"][i]
+        g_to = branch["g_to"][i]
+        b_to = branch["b_to"][i]
         cons.append(
             (g + g_fr) / ttm * (vr_fr**2 + vi_fr**2)
             + (-g * tr + b * ti) / ttm * (vr_fr * vr_to + vi_fr * vi_to)
@@ -315,7 +400,7 @@ def solve_opf_rectangular(data, options):
             + (-g * tr - b * ti) / ttm * (-(vi_fr * vr_to - vr_fr * vi_to))
             - q_to
         )
-        for i in range(4):
+        for _ in range(4):
             lbg.append(0)
             ubg.append(0)
 
@@ -323,42 +408,808 @@ def solve_opf_rectangular(data, options):
         lbg.append(math.tan(angmin[i]))
         ubg.append(math.tan(angmax[i]))
 
-        rate_a_sq = br["rate_a_sq"]
+        rate_a_sq = branch["rate_a_sq"][i]
         cons.append(p_fr**2 + q_fr**2)
         lbg.append(-casadi.inf)
         ubg.append(rate_a_sq)
         cons.append(p_to**2 + q_to**2)
         lbg.append(-casadi.inf)
         ubg.append(rate_a_sq)
+    timer.lap("branch")
+
+    nlp = {"x": casadi.vcat(x), "f": f, "g": casadi.vcat(cons)}
+    bounds = {"lbx": lbx, "ubx": ubx, "lbg": lbg, "ubg": ubg, "x0": x0}
+    return nlp, bounds
+
+
+def build_opf_iv(data, timer=None):
+    # current-voltage model: rectangular voltages, the series current of every
+    # branch and the net current injection of every bus as variables, linear
+    # current balances, see power_flow.current_coefficients
+    if timer is None:
+        timer = PhaseTimer()
+    timer.mark()
+
+    x, x0, lbx, ubx, cons, lbg, ubg = [], [], [], [], [], [], []
+
+    vr, vi = {}, {}
+    Nbus = data.Nbus
+    vmin = data.vmin.tolist()
+    vmax = data.vmax.tolist()
+    for k in range(Nbus):
+        vr[k] = casadi.SX.sym(f"vr{k}")
+        x.append(vr[k])
+        x0.append(1.0)
+        lbx.append(-vmax[k])
+        ubx.append(vmax[k])
+        vi[k] = casadi.SX.sym(f"vi{k}")
+        x.append(vi[k])
+        x0.append(0.0)
+        lbx.append(-vmax[k])
+        ubx.append(vmax[k])
+
+        cons.append(vr[k] ** 2 + vi[k] ** 2)
+        lbg.append(vmin[k] ** 2)
+        ubg.append(vmax[k] ** 2)
+
+    pg, qg = {}, {}
+    Ngen = data.Ngen
+    pmin = data.pmin.tolist()
+    pmax = data.pmax.tolist()
+    qmin = data.qmin.tolist()
+    qmax = data.qmax.tolist()
+    for k in range(Ngen):
+        pg[k] = casadi.SX.sym(f"pg{k}")
+        x.append(pg[k])
+        x0.append(0.0)
+        lbx.append(pmin[k])
+        ubx.append(pmax[k])
+        qg[k] = casadi.SX.sym(f"qg{k}")
+        x.append(qg[k])
+        x0.append(0.0)
+        lbx.append(qmin[k])
+        ubx.append(qmax[k])
+
+    csr, csi = {}, {}
+    for k in range(data.Nbranch):
+        csr[k] = casadi.SX.sym(f"csr{k}")
+        csi[k] = casadi.SX.sym(f"csi{k}")
+        for c in [csr[k], csi[k]]:
+            x.append(c)
+            x0.append(0.0)
+            lbx.append(-casadi.inf)
+            ubx.append(casadi.inf)
+
+    ir, ii = {}, {}
+    for k in range(Nbus):
+        ir[k] = casadi.SX.sym(f"ir{k}")
+        ii[k] = casadi.SX.sym(f"ii{k}")
+        for c in [ir[k], ii[k]]:
+            x.append(c)
+            x0.append(0.0)
+            lbx.append(-casadi.inf)
+            ubx.append(casadi.inf)
+    timer.lap("variables")
+
+    f = sum(
+        cost1 * pg[i] * pg[i] + cost2 * pg[i] + cost3
+        for i, (cost1, cost2, cost3) in enumerate(
+            zip(
+                data.gen_cost1.tolist(),
+                data.gen_cost2.tolist(),
+                data.gen_cost3.tolist(),
+            )
+        )
+    )
+    timer.lap("objective")
+
+    for k in data.ref_buses.tolist():
+        cons.append(vi[k])
+        lbg.append(0)
+        ubg.append(0)
+    timer.lap("reference")
+
+    s_f, s_t, k_f, y_f, y_t, y_bus = [c.tolist() for c in current_coefficients(data)]
+    # current balance of every bus, the arc currents are added per branch
+    kcl_r = [y_bus[i].real * vr[i] - y_bus[i].imag * vi[i] - ir[i] for i in range(Nbus)]
+    kcl_i = [y_bus[i].imag * vr[i] + y_bus[i].real * vi[i] - ii[i] for i in range(Nbus)]
+
+    angmin = data.angmin.tolist()
+    angmax = data.angmax.tolist()
+    f_bus = data.branch_f_bus.tolist()
+    t_bus = data.branch_t_bus.tolist()
+    rate_a_sq = data.branch_rate_a_sq.tolist()
+    for i in range(data.Nbranch):
+        vr_fr, vi_fr = vr[f_bus[i]], vi[f_bus[i]]
+        vr_to, vi_to = vr[t_bus[i]], vi[t_bus[i]]
+        cs_r, cs_i = csr[i], csi[i]
+        sf, st, kf, yf, yt = s_f[i], s_t[i], k_f[i], y_f[i], y_t[i]
+
+        cons.append(
+            cs_r
+            - (sf.real * vr_fr - sf.imag * vi_fr)
+            - (st.real * vr_to - st.imag * vi_to)
+        )
+        cons.append(
+            cs_i
+            - (sf.imag * vr_fr + sf.real * vi_fr)
+            - (st.imag * vr_to + st.real * vi_to)
+        )
+        for _ in range(2):
+            lbg.append(0)
+            ubg.append(0)
+
+        cr_fr = kf.real * cs_r - kf.imag * cs_i + yf.real * vr_fr - yf.imag * vi_fr
+        ci_fr = kf.imag * cs_r + kf.real * cs_i + yf.imag * vr_fr + yf.real * vi_fr
+        cr_to = -cs_r + yt.real * vr_to - yt.imag * vi_to
+        ci_to = -cs_i + yt.imag * vr_to + yt.real * vi_to
+        kcl_r[f_bus[i]] += kf.real * cs_r - kf.imag * cs_i
+        kcl_i[f_bus[i]] += kf.imag * cs_r + kf.real * cs_i
+        kcl_r[t_bus[i]] -= cs_r
+        kcl_i[t_bus[i]] -= cs_i
+
+        cons.append((vi_fr * vr_to - vr_fr * vi_to) / (vr_fr * vr_to + vi_fr * vi_to))
+        lbg.append(math.tan(angmin[i]))
+        ubg.append(math.tan(angmax[i]))
+
+        # p^2 + q^2 <= rate_a^2 as |V|^2 |I|^2 of both arcs
+        cons.append((vr_fr**2 + vi_fr**2) * (cr_fr**2 + ci_fr**2))
+        lbg.append(-casadi.inf)
+        ubg.append(rate_a_sq[i])
+        cons.append((vr_to**2 + vi_to**2) * (cr_to**2 + ci_to**2))
+        lbg.append(-casadi.inf)
+        ubg.append(rate_a_sq[i])
+    timer.lap("branch")
+
+    bus_pd = data.bus_pd.tolist()
+    bus_qd = data.bus_qd.tolist()
+    bus_gens = data.bus_gen_slices()
+    for i in range(Nbus):
+        p_balance_expr = bus_pd[i] + vr[i] * ir[i] + vi[i] * ii[i]
+        q_balance_expr = bus_qd[i] + vi[i] * ir[i] - vr[i] * ii[i]
+        for g in bus_gens[i]:
+            p_balance_expr -= pg[g]
+            q_balance_expr -= qg[g]
+        cons.extend([kcl_r[i], kcl_i[i], p_balance_expr, q_balance_expr])
+        for _ in range(4):
+            lbg.append(0)
+            ubg.append(0)
+    timer.lap("balance")
+
+    nlp = {"x": casadi.vcat(x), "f": f, "g": casadi.vcat(cons)}
+    bounds = {"lbx": lbx, "ubx": ubx, "lbg": lbg, "ubg": ubg, "x0": x0}
+    return nlp, bounds
+
+
+def build_opf_iv_vectorized(data, timer=None):
+    # the current-voltage model from vector symbols, the current balances
+    # from sparse incidence matrices
+    if timer is None:
+        timer = PhaseTimer()
+    timer.mark()
+
+    MX, DM = casadi.MX, casadi.DM
+    Nbus, Ngen, Nbranch = data.Nbus, data.Ngen, data.Nbranch
+    vr, vi = MX.sym("vr", Nbus), MX.sym("vi", Nbus)
+    pg, qg = MX.sym("pg", Ngen), MX.sym("qg", Ngen)
+    csr, csi = MX.sym("csr", Nbranch), MX.sym("csi", Nbranch)
+    ir, ii = MX.sym("ir", Nbus), MX.sym("ii", Nbus)
+    x = casadi.vertcat(vr, vi, pg, qg, csr, csi, ir, ii)
+    free = np.full(2 * Nbranch + 2 * Nbus, np.inf)
+    lbx = np.concatenate([-data.vmax, -data.vmax, data.pmin, data.qmin, -free])
+    ubx = np.concatenate([data.vmax, data.vmax, data.pmax, data.qmax, free])
+    x0 = np.concatenate([np.ones(Nbus), np.zeros(Nbus + 2 * Ngen + len(free))])
+    timer.lap("variables")
+
+    f = (
+        casadi.dot(data.gen_cost1, pg**2)
+        + casadi.dot(data.gen_cost2, pg)
+        + float(data.gen_cost3.sum())
+    )
+    timer.lap("objective")
+
+    cons, lbg, ubg = [], [], []
+
+    def add(g, lb, ub):
+        cons.append(g)
+        lbg.append(np.broadcast_to(lb, g.shape[0]))
+        ubg.append(np.broadcast_to(ub, g.shape[0]))
+
+    add(vi[data.ref_buses.tolist()], 0.0, 0.0)
+    timer.lap("reference")
+
+    add(vr**2 + vi**2, data.vmin**2, data.vmax**2)
+    s_f, s_t, k_f, y_f, y_t, y_bus = [
+        (DM(c.real), DM(c.imag)) for c in current_coefficients(data)
+    ]
+    f_bus = data.branch_f_bus.tolist()
+    t_bus = data.branch_t_bus.tolist()
+    vr_fr, vi_fr, vr_to, vi_to = vr[f_bus], vi[f_bus], vr[t_bus], vi[t_bus]
+
+    def times(c, re, im):
+        # real and imaginary part of c (re + j im) for complex coefficients c
+        return c[0] * re - c[1] * im, c[1] * re + c[0] * im
+
+    sf_r, sf_i = times(s_f, vr_fr, vi_fr)
+    st_r, st_i = times(s_t, vr_to, vi_to)
+    add(csr - sf_r - st_r, 0.0, 0.0)
+    add(csi - sf_i - st_i, 0.0, 0.0)
+
+    # arc currents minus the shunt currents of the branches, those are in y_bus
+    kf_r, kf_i = times(k_f, csr, csi)
+    shunt_r, shunt_i = times(y_bus, vr, vi)
+    from_arcs = incidence_matrix(data.branch_f_bus, Nbus)
+    to_arcs = incidence_matrix(data.branch_t_bus, Nbus)
+    gens = incidence_matrix(data.gen_bus, Nbus)
+    add(
+        casadi.mtimes(from_arcs, kf_r) - casadi.mtimes(to_arcs, csr) + shunt_r - ir,
+        0.0,
+        0.0,
+    )
+    add(
+        casadi.mtimes(from_arcs, kf_i) - casadi.mtimes(to_arcs, csi) + shunt_i - ii,
+        0.0,
+        0.0,
+    )
+    add(vr * ir + vi * ii - casadi.mtimes(gens, pg), -data.bus_pd, -data.bus_pd)
+    add(vi * ir - vr * ii - casadi.mtimes(gens, qg), -data.bus_qd, -data.bus_qd)
+    timer.lap("balance")
 
-    model = casadi.nlpsol(
-        "model",
-        "ipopt",
-        {"x": casadi.vcat(x), "f": f, "g": casadi.vcat(cons)},
-        options,
+    add(
+        (vi_fr * vr_to - vr_fr * vi_to) / (vr_fr * vr_to + vi_fr * vi_to),
+        np.tan(data.angmin),
+        np.tan(data.angmax),
     )
-    solution = model(
-        lbx=lbx,
-        ubx=ubx,
-        lbg=lbg,
-        ubg=ubg,
-        x0=x0,
+    yf_r, yf_i = times(y_f, vr_fr, vi_fr)
+    yt_r, yt_i = times(y_t, vr_to, vi_to)
+    for v_r, v_i, c_r, c_i in [
+        (vr_fr, vi_fr, kf_r + yf_r, kf_i + yf_i),
+        (vr_to, vi_to, yt_r - csr, yt_i - csi),
+    ]:
+        add(
+            (v_r**2 + v_i**2) * (c_r**2 + c_i**2),
+            -np.inf,
+            data.branch_rate_a_sq,
+        )
+    timer.lap("branch")
+
+    nlp = {"x": x, "f": f, "g": casadi.vertcat(*cons)}
+    bounds = {
+        "lbx": lbx,
+        "ubx": ubx,
+        "lbg": np.concatenate(lbg),
+        "ubg": np.concatenate(ubg),
+        "x0": x0,
+    }
+    return nlp, bounds
+
+
+def branch_product_function():
+    # [wr, wi] of one branch, V_f conj(V_t) from [vm_fr, vm_to, va_fr, va_to]
+    v = casadi.SX.sym("v", 4)
+    vm_fr, vm_to, va_fr, va_to = casadi.vertsplit(v)
+    products = casadi.vertcat(
+        vm_fr * vm_to * casadi.cos(va_fr - va_to),
+        vm_fr * vm_to * casadi.sin(va_fr - va_to),
+    )
+    return casadi.Function("branch_product", [v], [products])
+
+
+def branch_flow_function(method):
+    # [p_fr, q_fr, p_to, q_to] of one branch from its voltages v, that are
+    # [vm_fr, vm_to, va_fr, va_to], [vm_fr, vm_to, wr, wi] or
+    # [vr_fr, vr_to, vi_fr, vi_to], and its coefficients c1..c8
+    v = casadi.SX.sym("v", 4)
+    c = casadi.SX.sym("c", 8)
+    c1, c2, c3, c4, c5, c6, c7, c8 = casadi.vertsplit(c)
+    if method == "polar":
+        vm_fr, vm_to, va_fr, va_to = casadi.vertsplit(v)
+        vfr_sq = vm_fr**2
+        vto_sq = vm_to**2
+        re_vfr_vto = vm_fr * vm_to * casadi.cos(va_fr - va_to)
+        im_vfr_vto = vm_fr * vm_to * casadi.sin(va_fr - va_to)
+    elif method == "polar_aux":
+        vm_fr, vm_to, re_vfr_vto, im_vfr_vto = casadi.vertsplit(v)
+        vfr_sq = vm_fr**2
+        vto_sq = vm_to**2
+    else:
+        vr_fr, vr_to, vi_fr, vi_to = casadi.vertsplit(v)
+        vfr_sq = vr_fr**2 + vi_fr**2
+        vto_sq = vr_to**2 + vi_to**2
+        re_vfr_vto = vr_fr * vr_to + vi_fr * vi_to
+        im_vfr_vto = vi_fr * vr_to - vr_fr * vi_to
+    flows = casadi.vertcat(
+        c5 * vfr_sq + c3 * re_vfr_vto + c4 * im_vfr_vto,
+        -c6 * vfr_sq - c4 * re_vfr_vto + c3 * im_vfr_vto,
+        c7 * vto_sq + c1 * re_vfr_vto - c2 * im_vfr_vto,
+        -c8 * vto_sq - c2 * re_vfr_vto - c1 * im_vfr_vto,
+    )
+    return casadi.Function("branch_flow", [v, c], [flows])
+
+
+def bus_injection_function(method):
+    # [p, q] drawn at one bus by its load and shunt from its voltages v, that
+    # are [vm, va] or [vr, vi], and its coefficients [pd, qd, gs, bs]
+    v = casadi.SX.sym("v", 2)
+    c = casadi.SX.sym("c", 4)
+    pd, qd, gs, bs = casadi.vertsplit(c)
+    if method == "rect":
+        vm_sq = v[0] ** 2 + v[1] ** 2
+    else:
+        vm_sq = v[0] ** 2
+    injection = casadi.vertcat(pd + gs * vm_sq, qd - bs * vm_sq)
+    return casadi.Function("bus_injection", [v, c], [injection])
+
+
+def mapped(f, n, threads=None):
+    # f evaluated for n elements, on `threads` threads if given
+    if threads is None:
+        return f.map(n)
+    return f.map(n, "thread", threads)
+
+
+def incidence_matrix(rows, n):
+    # sparse n x len(rows) matrix with a one at (rows[k], k)
+    m = len(rows)
+    return casadi.DM.triplet(rows.tolist(), list(range(m)), [1.0] * m, n, m)
+
+
+def build_opf_vectorized(data, method="polar", timer=None, threads=None):
+    # vector symbols, branch flow and bus injection functions mapped over all
+    # branches and buses, bus balances from sparse incidence matrices
+    if method not in ["polar", "polar_aux", "rect"]:
+        raise ValueError(f"No vectorized {method} formulation, see builder")
+    if timer is None:
+        timer = PhaseTimer()
+    timer.mark()
+
+    MX = casadi.MX
+    Nbus, Ngen, Narc, Nbranch = data.Nbus, data.Ngen, data.Narc, data.Nbranch
+    inf = np.full(Nbus, np.inf)
+    if method != "rect":
+        v1, v2 = MX.sym("vm", Nbus), MX.sym("va", Nbus)
+        v_lb = [data.vmin, -inf]
+        v_ub = [data.vmax, inf]
+        v_start = [np.ones(Nbus), np.zeros(Nbus)]
+    else:
+        v1, v2 = MX.sym("vr", Nbus), MX.sym("vi", Nbus)
+        v_lb = [-data.vmax, -data.vmax]
+        v_ub = [data.vmax, data.vmax]
+        v_start = [np.ones(Nbus), np.zeros(Nbus)]
+    pg, qg = MX.sym("pg", Ngen), MX.sym("qg", Ngen)
+    p, q = MX.sym("p", Narc), MX.sym("q", Narc)
+    x = casadi.vertcat(v1, v2, pg, qg, p, q)
+    lbx = np.concatenate(v_lb + [data.pmin, data.qmin, -data.rate_a, -data.rate_a])
+    ubx = np.concatenate(v_ub + [data.pmax, data.qmax, data.rate_a, data.rate_a])
+    x0 = np.concatenate(v_start + [np.zeros(2 * Ngen + 2 * Narc)])
+    if method == "polar_aux":
+        # voltage products of every branch after the arc flows
+        wr, wi = MX.sym("wr", Nbranch), MX.sym("wi", Nbranch)
+        w_max = data.vmax[data.branch_f_bus] * data.vmax[data.branch_t_bus]
+        x = casadi.vertcat(x, wr, wi)
+        lbx = np.concatenate([lbx, -w_max, -w_max])
+        ubx = np.concatenate([ubx, w_max, w_max])
+        x0 = np.concatenate([x0, np.ones(Nbranch), np.zeros(Nbranch)])
+    timer.lap("variables")
+
+    f = (
+        casadi.dot(data.gen_cost1, pg**2)
+        + casadi.dot(data.gen_cost2, pg)
+        + float(data.gen_cost3.sum())
+    )
+    timer.lap("objective")
+
+    cons, lbg, ubg = [], [], []
+
+    def add(g, lb, ub):
+        cons.append(g)
+        lbg.append(np.broadcast_to(lb, g.shape[0]))
+        ubg.append(np.broadcast_to(ub, g.shape[0]))
+
+    add(v2[data.ref_buses.tolist()], 0.0, 0.0)
+    timer.lap("reference")
+
+    if method == "rect":
+        add(v1**2 + v2**2, data.vmin**2, data.vmax**2)
+    bus_coefficients = casadi.DM(
+        np.vstack([data.bus_pd, data.bus_qd, data.bus_gs, data.bus_bs])
+    )
+    injection = mapped(bus_injection_function(method), Nbus, threads)(
+        casadi.horzcat(v1, v2).T, bus_coefficients
+    )
+    arcs = incidence_matrix(data.arc_bus, Nbus)
+    gens = incidence_matrix(data.gen_bus, Nbus)
+    add(
+        injection[0, :].T + casadi.mtimes(arcs, p) - casadi.mtimes(gens, pg),
+        0.0,
+        0.0,
+    )
+    add(
+        injection[1, :].T + casadi.mtimes(arcs, q) - casadi.mtimes(gens, qg),
+        0.0,
+        0.0,
+    )
+    timer.lap("balance")
+
+    f_bus = data.branch_f_bus.tolist()
+    t_bus = data.branch_t_bus.tolist()
+    f_idx = data.branch_f_idx.tolist()
+    t_idx = data.branch_t_idx.tolist()
+    voltages = casadi.horzcat(v1[f_bus], v1[t_bus], v2[f_bus], v2[t_bus]).T
+    if method == "polar_aux":
+        products = mapped(branch_product_function(), Nbranch, threads)(voltages)
+        add(casadi.vec(products - casadi.horzcat(wr, wi).T), 0.0, 0.0)
+        voltages = casadi.horzcat(v1[f_bus], v1[t_bus], wr, wi).T
+    coefficients = casadi.DM(np.vstack(data.branch_coefficients()))
+    flows = mapped(branch_flow_function(method), Nbranch, threads)(
+        voltages, coefficients
+    )
+    arc_flows = casadi.horzcat(p[f_idx], q[f_idx], p[t_idx], q[t_idx]).T
+    # branch by branch like the scalar formulation
+    add(casadi.vec(flows - arc_flows), 0.0, 0.0)
+
+    if method != "rect":
+        add(v2[f_bus] - v2[t_bus], data.angmin, data.angmax)
+    else:
+        vr_fr, vr_to, vi_fr, vi_to = v1[f_bus], v1[t_bus], v2[f_bus], v2[t_bus]
+        add(
+            (vi_fr * vr_to - vr_fr * vi_to) / (vr_fr * vr_to + vi_fr * vi_to),
+            np.tan(data.angmin),
+            np.tan(data.angmax),
+        )
+    add(p[f_idx] ** 2 + q[f_idx] ** 2, -np.inf, data.branch_rate_a_sq)
+    add(p[t_idx] ** 2 + q[t_idx] ** 2, -np.inf, data.branch_rate_a_sq)
+    timer.lap("branch")
+
+    nlp = {"x": x, "f": f, "g": casadi.vertcat(*cons)}
+    bounds = {
+        "lbx": lbx,
+        "ubx": ubx,
+        "lbg": np.concatenate(lbg),
+        "ubg": np.concatenate(ubg),
+        "x0": x0,
+    }
+    return nlp, bounds
+
+
+def build_dc_opf(data):
+    # lossless linearized OPF with voltage magnitudes fixed at 1, a QP
+    MX = casadi.MX
+    Nbus, Ngen, Nbranch = data.Nbus, data.Ngen, data.Nbranch
+    va, pg, pf = MX.sym("va", Nbus), MX.sym("pg", Ngen), MX.sym("pf", Nbranch)
+    x = casadi.vertcat(va, pg, pf)
+    inf = np.full(Nbus, np.inf)
+    rate_a = data.rate_a[data.branch_f_idx]
+    lbx = np.concatenate([-inf, data.pmin, -rate_a])
+    ubx = np.concatenate([inf, data.pmax, rate_a])
+    f = (
+        casadi.dot(data.gen_cost1, pg**2)
+        + casadi.dot(data.gen_cost2, pg)
+        + float(data.gen_cost3.sum())
+    )
+
+    f_bus = data.branch_f_bus.tolist()
+    t_bus = data.branch_t_bus.tolist()
+    from_arcs = incidence_matrix(data.branch_f_bus, Nbus)
+    to_arcs = incidence_matrix(data.branch_t_bus, Nbus)
+    gens = incidence_matrix(data.gen_bus, Nbus)
+    # the to arc carries -pf
+    g = [
+        va[data.ref_buses.tolist()],
+        pf + casadi.DM(data.branch_b) * (va[f_bus] - va[t_bus]),
+        casadi.mtimes(from_arcs - to_arcs, pf) - casadi.mtimes(gens, pg),
+        va[f_bus] - va[t_bus],
+    ]
+    n_ref = len(data.ref_buses)
+    balance = -data.bus_pd - data.bus_gs
+    lbg = np.concatenate([np.zeros(n_ref + Nbranch), balance, data.angmin])
+    ubg = np.concatenate([np.zeros(n_ref + Nbranch), balance, data.angmax])
+
+    nlp = {"x": x, "f": f, "g": casadi.vertcat(*g)}
+    bounds = {
+        "lbx": lbx,
+        "ubx": ubx,
+        "lbg": lbg,
+        "ubg": ubg,
+        "x0": np.zeros(x.shape[0]),
+    }
+    return nlp, bounds
+
+
+def build_soc_opf(data):
+    # second-order cone relaxation of the AC OPF in the variables
+    # w = vm^2, wr = vm_f vm_t cos(va_f - va_t) and wi = vm_f vm_t sin(...)
+    MX = casadi.MX
+    Nbus, Ngen, Narc, Nbranch = data.Nbus, data.Ngen, data.Narc, data.Nbranch
+    f_bus, t_bus = data.branch_f_bus, data.branch_t_bus
+    w = MX.sym("w", Nbus)
+    wr, wi = MX.sym("wr", Nbranch), MX.sym("wi", Nbranch)
+    pg, qg = MX.sym("pg", Ngen), MX.sym("qg", Ngen)
+    p, q = MX.sym("p", Narc), MX.sym("q", Narc)
+    x = casadi.vertcat(w, wr, wi, pg, qg, p, q)
+    w_max = data.vmax[f_bus] * data.vmax[t_bus]
+    lbx = np.concatenate(
+        [data.vmin**2, np.zeros(Nbranch), -w_max]
+        + [data.pmin, data.qmin, -data.rate_a, -data.rate_a]
+    )
+    ubx = np.concatenate(
+        [data.vmax**2, w_max, w_max] + [data.pmax, data.qmax, data.rate_a, data.rate_a]
     )
+    x0 = np.concatenate(
+        [np.ones(Nbus + Nbranch), np.zeros(Nbranch + 2 * Ngen + 2 * Narc)]
+    )
+    f = (
+        casadi.dot(data.gen_cost1, pg**2)
+        + casadi.dot(data.gen_cost2, pg)
+        + float(data.gen_cost3.sum())
+    )
+
+    cons, lbg, ubg = [], [], []
+
+    def add(g, lb, ub):
+        cons.append(g)
+        lbg.append(np.broadcast_to(lb, g.shape[0]))
+        ubg.append(np.broadcast_to(ub, g.shape[0]))
+
+    # the branch flows of the polar model are linear in w, wr and wi
+    c1, c2, c3, c4, c5, c6, c7, c8 = [casadi.DM(c) for c in data.branch_coefficients()]
+    w_f, w_t = w[f_bus.tolist()], w[t_bus.tolist()]
+    f_idx = data.branch_f_idx.tolist()
+    t_idx = data.branch_t_idx.tolist()
+    add(p[f_idx] - (c5 * w_f + c3 * wr + c4 * wi), 0.0, 0.0)
+    add(q[f_idx] - (-c6 * w_f - c4 * wr + c3 * wi), 0.0, 0.0)
+    add(p[t_idx] - (c7 * w_t + c1 * wr - c2 * wi), 0.0, 0.0)
+    add(q[t_idx] - (-c8 * w_t - c2 * wr - c1 * wi), 0.0, 0.0)
+
+    add(wr**2 + wi**2 - w_f * w_t, -np.inf, 0.0)
+    add(wi - casadi.DM(np.tan(data.angmax)) * wr, -np.inf, 0.0)
+    add(wi - casadi.DM(np.tan(data.angmin)) * wr, 0.0, np.inf)
+    add(p[f_idx] ** 2 + q[f_idx] ** 2, -np.inf, data.branch_rate_a_sq)
+    add(p[t_idx] ** 2 + q[t_idx] ** 2, -np.inf, data.branch_rate_a_sq)
+
+    arcs = incidence_matrix(data.arc_bus, Nbus)
+    gens = incidence_matrix(data.gen_bus, Nbus)
+    gs, bs = casadi.DM(data.bus_gs), casadi.DM(data.bus_bs)
+    add(
+        casadi.mtimes(arcs, p) + gs * w - casadi.mtimes(gens, pg),
+        -data.bus_pd,
+        -data.bus_pd,
+    )
+    add(
+        casadi.mtimes(arcs, q) - bs * w - casadi.mtimes(gens, qg),
+        -data.bus_qd,
+        -data.bus_qd,
+    )
+
+    nlp = {"x": x, "f": f, "g": casadi.vertcat(*cons)}
+    bounds = {
+        "lbx": lbx,
+        "ubx": ubx,
+        "lbg": np.concatenate(lbg),
+        "ubg": np.concatenate(ubg),
+        "x0": x0,
+    }
+    return nlp, bounds
+
+
+def relaxation_start(data, init, options):
+    # AC starting point from the solution of the DC or SOC relaxation or from
+    # the AC power flow, see power_flow.ac_start and poi.relaxation_start
+    if init == "pf":
+        return power_flow_start(data)
+    # the relaxation is solved quietly with the Ipopt options of the AC model
+    options = {
+        k: v
+        for k, v in options.items()
+        if k.startswith("ipopt.") and k != "ipopt.output_file"
+    }
+    options.update(
+        {
+            "ipopt.print_level": 0,
+            "ipopt.print_timing_statistics": "no",
+            "print_time": False,
+        }
+    )
+    Nbus, Ngen, Nbranch = data.Nbus, data.Ngen, data.Nbranch
+    if init == "dc":
+        nlp, bounds = build_dc_opf(data)
+        x = np.asarray(casadi.nlpsol("dc", "ipopt", nlp, options)(**bounds)["x"])
+        x = x.ravel()
+        vm = np.ones(Nbus)
+        va = x[:Nbus]
+        pg = x[Nbus : Nbus + Ngen]
+        qg = np.clip(0.0, data.qmin, data.qmax)
+    elif init == "soc":
+        nlp, bounds = build_soc_opf(data)
+        x = np.asarray(casadi.nlpsol("soc", "ipopt", nlp, options)(**bounds)["x"])
+        x = x.ravel()
+        # angles recovered from wr, wi along a spanning tree accumulate the
+        # error of the loose cones and start Ipopt further away than flat ones
+        vm = np.sqrt(x[:Nbus])
+        va = np.zeros(Nbus)
+        offset = Nbus + 2 * Nbranch
+        pg = x[offset : offset + Ngen]
+        qg = x[offset + Ngen : offset + 2 * Ngen]
+    else:
+        raise ValueError(f"Unknown initialization: {init}")
+    # arc flows consistent with the voltages rather than the relaxed flows
+    return ac_start(data, vm, va, pg, qg)
+
+
+def solve_nlp(nlp, bounds, options, timer=None):
+    # nlp is either the problem or the path of a compiled NLP library
+    if timer is None:
+        timer = PhaseTimer()
+    timer.mark()
+    # nlpsol builds the derivative functions (and compiles them with jit)
+    model = casadi.nlpsol("model", "ipopt", nlp, options)
+    timer.lap("solver_init")
+    solution = model(**bounds)
+    timer.lap("optimize")
+    solution["stats"] = model.stats()
     return solution
 
 
-def casadi_main(logdir, filename, method, jit=False):
+def solver_results(solution):
+    # status, objective, iterations and times of a solve_nlp solution; the
+    # times are CPU times like those of the Ipopt timing statistics, the
+    # evaluation time is that of the NLP functions Ipopt calls
+    stats = solution["stats"]
+    functions = ["nlp_f", "nlp_g", "nlp_grad_f", "nlp_jac_g", "nlp_hess_l"]
+    return dict(
+        status=exit_message(stats["return_status"]),
+        objective=float(solution["f"]),
+        iterations=int(stats["iter_count"]),
+        ipopt_time=stats["t_proc_total"],
+        ad_time=sum(stats.get(f"t_proc_{name}", 0.0) for name in functions),
+    )
+
+
+def solve_opf(data, options, timer=None):
+    nlp, bounds = build_opf(data, timer)
+    return solve_nlp(nlp, bounds, options, timer)
+
+
+def solve_opf_rectangular(data, options, timer=None):
+    nlp, bounds = build_opf_rectangular(data, timer)
+    return solve_nlp(nlp, bounds, options, timer)
+
+
+def builder(method, vectorized=False, threads=None):
+    if method == "iv":
+        return build_opf_iv_vectorized if vectorized else build_opf_iv
+    elif vectorized:
+        return lambda data, timer=None: build_opf_vectorized(
+            data, method, timer, threads
+        )
+    elif method == "polar":
+        return build_opf
+    elif method == "polar_aux":
+        return lambda data, timer=None: build_opf(data, timer, aux=True)
+    else:
+        return build_opf_rectangular
+
+
+def start_vector(start, method, vectorized=False):
+    # x0 in the variable order of the builders from a relaxation_start dict
+    if method in polar_methods:
+        v1, v2 = start["vm"], start["va"]
+    else:
+        v1 = start["vm"] * np.cos(start["va"])
+        v2 = start["vm"] * np.sin(start["va"])
+    # pairs of variables after the voltages and the generation
+    pairs = {
+        "polar_aux": [("p", "q"), ("wr", "wi")],
+        "iv": [("csr", "csi"), ("ir", "ii")],
+    }.get(method, [("p", "q")])
+    blocks = [(v1, v2), (start["pg"], start["qg"])]
+    blocks += [(start[a], start[b]) for a, b in pairs]
+    if vectorized:
+        return np.concatenate([v for pair in blocks for v in pair])
+    # the scalar builders interleave the variables of every element
+    if method in polar_methods:
+        blocks[0] = (v2, v1)
+    return np.concatenate([np.column_stack(pair).ravel() for pair in blocks])
+
+
+def solution_values(x, data, method, vectorized=False):
+    # vm, va, pg, qg of a solution in the variable order of the builders
+    x = np.asarray(x).ravel()
+    Nbus, Ngen = data.Nbus, data.Ngen
+    if vectorized:
+        v1, v2 = x[:Nbus], x[Nbus : 2 * Nbus]
+        pg, qg = x[2 * Nbus : 2 * Nbus + Ngen], x[2 * Nbus + Ngen : 2 * Nbus + 2 * Ngen]
+    else:
+        v1, v2 = x[: 2 * Nbus : 2], x[1 : 2 * Nbus : 2]
+        pg = x[2 * Nbus : 2 * Nbus + 2 * Ngen : 2]
+        qg = x[2 * Nbus + 1 : 2 * Nbus + 2 * Ngen : 2]
+        if method in polar_methods:
+            v1, v2 = v2, v1
+    if method in polar_methods:
+        vm, va = v1, v2
+    else:
+        vm, va = np.hypot(v1, v2), np.arctan2(v2, v1)
+    return dict(vm=vm, va=va, pg=pg, qg=qg)
+
+
+def solve_opf_codegen(
+    data,
+    filename,
+    method,
+    options,
+    vectorized=False,
+    timer=None,
+    trace_allocations=False,
+    start=None,
+    reduced=False,
+):
+    # the NLP is generated as C and compiled once, later runs of the same case
+    # skip the model build and load the library from cache/casadi
+    if timer is None:
+        timer = PhaseTimer()
+    directory = casadi_codegen.artifact_dir(
+        filename, method, vectorized, reduced=reduced
+    )
+    if not directory.exists():
+        # stale libraries of the same problem are replaced
+        for old in directory.parent.glob(directory.name.rsplit("-", 1)[0] + "-*"):
+            shutil.rmtree(old, ignore_errors=True)
+        with traced_allocations(timer, enabled=trace_allocations):
+            nlp, bounds = builder(method, vectorized)(data, timer)
+        casadi_codegen.build_library(nlp, bounds, directory, timer=timer)
+    bounds = casadi_codegen.read_bounds(directory)
+    if start is not None:
+        bounds["x0"] = start_vector(start, method, vectorized)
+    library = casadi_codegen.library_path(directory)
+    return solve_nlp(str(library), bounds, options, timer)
+
+
+def casadi_main(
+    logdir,
+    filename,
+    method,
+    jit=False,
+    vectorized=False,
+    codegen=False,
+    threads=None,
+    ipopt_options=None,
+    trace_allocations=False,
+    init="flat",
+    reduce=False,
+):
     # filename = "pglib_opf_case30000_goc"
     # filename = "pglib_opf_case78484_epigrids"
     # filename = "pglib_opf_case10480_goc"
     # filename = "pglib_opf_case19402_goc"
 
-    json_path = Path(__file__).parent / "json" / f"{filename}.json"
-    json_path = json_path.resolve()
-    with open(json_path, "r") as f:
-        data = json.load(f)
+    if threads is not None and (codegen or not vectorized):
+        raise ValueError("threads need the vectorized model without codegen")
+    if method not in ["polar", "polar_aux", "rect", "iv"]:
+        raise ValueError(f"CasADi has no {method} formulation")
+    if threads is not None and method == "iv":
+        raise ValueError("the IV model has no mapped functions to thread")
+    if init not in ["flat", "dc", "soc", "pf"]:
+        raise ValueError(f"Unknown initialization: {init}")
+
+    timer = PhaseTimer(memory=True)
+    with timer.phase("load"):
+        data = load_case(filename)
+    original, sizes = data, None
+    if reduce:
+        with timer.phase("reduce"):
+            data, reduction = reduce_network(original)
+        sizes = reduction_sizes(original, data, reduction)
 
-    logpath = str(logdir / f"{filename}_casadi.log")
+    solver = "casadi_vectorized" if vectorized else "casadi"
+    if codegen:
+        solver += "_codegen"
+    if threads is not None:
+        solver += f"_thread{threads}"
+    if init != "flat":
+        solver += f"_{init}"
+    if reduce:
+        solver += "_reduced"
+    logpath = str(logdir / f"{filename}_{solver}.log")
     options = {
         "ipopt.print_level": 5,
         "ipopt.hsllib": "libhsl.dll",
@@ -367,22 +1218,96 @@ def casadi_main(logdir, filename, method, jit=False):
         "ipopt.output_file": logpath,
         "ipopt.max_iter": 200,
     }
+    for name, value in (ipopt_options or {}).items():
+        options[f"ipopt.{name}"] = value
 
-    if jit:
+    if jit and not codegen:
         flags = ["/O2"]
         compiler = "cl"
         jit_options = {"flags": flags, "verbose": True, "compiler": compiler}
         options.update({"jit": True, "compiler": "shell", "jit_options": jit_options})
 
-    t0 = time.time()
-    if method == "polar":
-        solve_opf(data, options)
+    start = None
+    if init != "flat":
+        with timer.phase("power_flow" if init == "pf" else "init"):
+            start = relaxation_start(data, init, options)
+
+    if codegen:
+        solution = solve_opf_codegen(
+            data,
+            filename,
+            method,
+            options,
+            vectorized,
+            timer,
+            trace_allocations,
+            start,
+            reduce,
+        )
     else:
-        solve_opf_rectangular(data, options)
-    t1 = time.time()
+        with traced_allocations(timer, enabled=trace_allocations):
+            nlp, bounds = builder(method, vectorized, threads)(data, timer)
+        if start is not None:
+            bounds["x0"] = start_vector(start, method, vectorized)
+        solution = solve_nlp(nlp, bounds, options, timer)
+
+    # model build, nlpsol setup and solve like in the baseline; the whole run
+    # is recorded as wall_time
+    total_time = timer.total(exclude=SETUP_PHASES)
+    if reduce:
+        # the solution mapped back to the original case has to balance it
+        values = solution_values(solution["x"], data, method, vectorized)
+        expanded = expand_solution(original, reduction, values)
+        sizes["mismatch"] = bus_mismatch(original, expanded)
+    write_record(
+        logpath,
+        timer,
+        case=filename,
+        solver=solver,
+        method=method,
+        jit="codegen" if codegen else ("shell" if jit else None),
+        threads=threads,
+        init=init,
+        reduction=sizes,
+        ipopt_options=ipopt_options,
+        total_time=total_time,
+        wall_time=timer.total(),
+        **solver_results(solution),
+    )
+    return total_time, logpath
+
 
-    return t1 - t0, logpath
+def build_benchmark(cases, methods):
+    # model build and nlpsol setup time of the scalar and vectorized paths,
+    # Ipopt stops after evaluating the starting point
+    options = {"ipopt.print_level": 0, "ipopt.max_iter": 0, "print_time": False}
+    for case, method in itertools.product(cases, methods):
+        data = load_case(case)
+        for path, f in [
+            (
+                "scalar",
+                lambda timer: solve_nlp(*builder(method)(data, timer), options, timer),
+            ),
+            (
+                "vectorized",
+                lambda timer: solve_nlp(
+                    *builder(method, True)(data, timer), options, timer
+                ),
+            ),
+        ]:
+            timer = PhaseTimer()
+            f(timer)
+            summary = timer.summary()
+            build = summary["variables"] + summary["constraints"]
+            print(
+                f"{case} {method} {path:<10} build={build:.3f} "
+                f"setup={summary['solver_init']:.3f}"
+            )
 
 
 if __name__ == "__main__":
-    casadi_main("pglib_opf_case6495_rte")
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--method", type=str, nargs="+", default=["polar", "rect"])
+    parser.add_argument("cases", nargs="+")
+    args = parser.parse_args()
+    build_benchmark(args.cases, args.method)
@@ -0,0 +1,97 @@
+import casadi
+import numpy as np
+
+from pathlib import Path
+import hashlib
+import os
+import shutil
+import subprocess
+import sys
+
+from case_data import file_hash, source_path
+from timing import PhaseTimer
+
+root_dir = Path(__file__).parent
+codegen_cache_dir = root_dir / "cache" / "casadi"
+
+compiler = os.environ.get("CC", "gcc")
+# -O1 compiles the large generated sources much faster than -O2 for
+# nearly the same evaluation speed
+flags = ["-O1", "-shared", "-fPIC"]
+library_suffix = ".dll" if sys.platform == "win32" else ".so"
+BOUNDS = ["lbx", "ubx", "lbg", "ubg", "x0"]
+
+
+def artifact_dir(
+    filename, method, vectorized, compiler=compiler, flags=flags, reduced=False
+):
+    # one directory per case source, formulation, network reduction and
+    # toolchain
+    h = hashlib.sha1()
+    for part in [
+        file_hash(source_path(filename)),
+        method,
+        str(vectorized),
+        str(reduced),
+        compiler,
+        " ".join(flags),
+        sys.platform,
+        casadi.__version__,
+    ]:
+        h.update(part.encode())
+        h.update(b"\0")
+    build = "vectorized" if vectorized else "scalar"
+    if reduced:
+        build += "_reduced"
+    return codegen_cache_dir / f"{filename}-{method}-{build}-{h.hexdigest()[:16]}"
+
+
+def library_path(directory):
+    return directory / f"nlp{library_suffix}"
+
+
+def build_library(nlp, bounds, directory, compiler=compiler, flags=flags, timer=None):
+    # generate C for the NLP functions of the Ipopt interface, compile them
+    # into a shared library and store it with the bounds in `directory`
+    if timer is None:
+        timer = PhaseTimer()
+    tmp = directory.with_name(f"{directory.name}.{os.getpid()}.tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+
+    timer.mark()
+    solver = casadi.nlpsol("nlp", "ipopt", nlp, {})
+    # the generated file is named after the argument, it has to be relative
+    cwd = os.getcwd()
+    os.chdir(tmp)
+    try:
+        solver.generate_dependencies("nlp.c")
+    finally:
+        os.chdir(cwd)
+    timer.lap("codegen")
+
+    c_path = tmp / "nlp.c"
+    try:
+        subprocess.run(
+            [compiler, *flags, "-o", str(library_path(tmp)), str(c_path), "-lm"],
+            check=True,
+            capture_output=True,
+            text=True,
+        )
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"{compiler} failed to compile {c_path}:\n{e.stderr}")
+    c_path.unlink()
+    np.savez(tmp / "bounds.npz", **{k: np.asarray(bounds[k]) for k in BOUNDS})
+    timer.lap("compile")
+
+    # a complete cache directory appears atomically, a concurrent build of
+    # the same problem may have won the race
+    try:
+        tmp.rename(directory)
+    except OSError:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def read_bounds(directory):
+    with np.load(directory / "bounds.npz") as f:
+        return {k: f[k] for k in BOUNDS}
@@ -0,0 +1,348 @@
+import numpy as np
+
+from pathlib import Path
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import matpower
+
+CACHE_VERSION = 4
+
+root_dir = Path(__file__).parent
+case_dir = root_dir / "case"
+json_dir = root_dir / "json"
+cache_dir = root_dir / "cache"
+
+
+def source_path(filename):
+    m_path = case_dir / f"{filename}.m"
+    if m_path.exists():
+        return m_path
+    json_path = json_dir / f"{filename}.json"
+    if json_path.exists():
+        return json_path
+    raise FileNotFoundError(f"Neither {m_path} nor {json_path} exists")
+
+
+def file_hash(path):
+    h = hashlib.sha1()
+    h.update(str(CACHE_VERSION).encode())
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()[:16]
+
+
+def incidence_csr(rows, n):
+    # rows[k] is the bus of element k, returns (ptr, elements) so that
+    # elements[ptr[i]:ptr[i + 1]] are the elements at bus i in ascending order
+    elements = np.argsort(rows, kind="stable").astype(np.int64)
+    ptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n), out=ptr[1:])
+    return ptr, elements
+
+
+class CaseData:
+    # every slot is a typed NumPy array, all indices are 0-based
+    __slots__ = (
+        "bus_id",
+        "bus_pd",
+        "bus_qd",
+        "bus_gs",
+        "bus_bs",
+        "bus_type",
+        "vmin",
+        "vmax",
+        "ref_buses",
+        "gen_id",
+        "gen_bus",
+        "gen_cost1",
+        "gen_cost2",
+        "gen_cost3",
+        "gen_pg",
+        "gen_vg",
+        "pmin",
+        "pmax",
+        "qmin",
+        "qmax",
+        "arc_bus",
+        "rate_a",
+        "branch_f_idx",
+        "branch_t_idx",
+        "branch_f_bus",
+        "branch_t_bus",
+        "branch_g",
+        "branch_b",
+        "branch_g_fr",
+        "branch_b_fr",
+        "branch_g_to",
+        "branch_b_to",
+        "branch_tr",
+        "branch_ti",
+        "branch_c1",
+        "branch_c2",
+        "branch_c3",
+        "branch_c4",
+        "branch_c5",
+        "branch_c6",
+        "branch_c7",
+        "branch_c8",
+        "branch_rate_a_sq",
+        "angmin",
+        "angmax",
+        "bus_arc_ptr",
+        "bus_arcs",
+        "bus_gen_ptr",
+        "bus_gens",
+        "arc_branch",
+    )
+
+    def __init__(self, **arrays):
+        for name in self.__slots__:
+            setattr(self, name, arrays[name])
+
+    @property
+    def Nbus(self):
+        return len(self.bus_pd)
+
+    @property
+    def Ngen(self):
+        return len(self.gen_bus)
+
+    @property
+    def Narc(self):
+        return len(self.arc_bus)
+
+    @property
+    def Nbranch(self):
+        return len(self.branch_f_idx)
+
+    def bus_arc_slices(self):
+        ptr = self.bus_arc_ptr.tolist()
+        arcs = self.bus_arcs.tolist()
+        return [arcs[ptr[i] : ptr[i + 1]] for i in range(self.Nbus)]
+
+    def bus_gen_slices(self):
+        ptr = self.bus_gen_ptr.tolist()
+        gens = self.bus_gens.tolist()
+        return [gens[ptr[i] : ptr[i + 1]] for i in range(self.Nbus)]
+
+    def replace(self, **arrays):
+        # copy with some arrays replaced, the other arrays are shared
+        values = {name: getattr(self, name) for name in self.__slots__}
+        values.update(arrays)
+        return CaseData(**values)
+
+    def branch_coefficients(self):
+        return [getattr(self, f"branch_c{i}") for i in range(1, 9)]
+
+    @classmethod
+    def from_columns(cls, columns):
+        bus = columns["bus"]
+        gen = columns["gen"]
+        arc = columns["arc"]
+        branch = columns["branch"]
+
+        # rows are stored in the order of their 1-based "i" index
+        bus = {k: v[np.argsort(bus["i"])] for k, v in bus.items()}
+        gen = {k: v[np.argsort(gen["i"])] for k, v in gen.items()}
+        arc = {k: v[np.argsort(arc["i"])] for k, v in arc.items()}
+        branch = {k: v[np.argsort(branch["i"])] for k, v in branch.items()}
+
+        def index(a):
+            return np.asarray(a, dtype=np.int64) - 1
+
+        def value(a):
+            return np.asarray(a, dtype=np.float64)
+
+        arrays = dict(
+            bus_id=np.asarray(bus["j"], dtype=np.int64),
+            bus_pd=value(bus["pd"]),
+            bus_qd=value(bus["qd"]),
+            bus_gs=value(bus["gs"]),
+            bus_bs=value(bus["bs"]),
+            vmin=value(columns["vmin"]),
+            vmax=value(columns["vmax"]),
+            ref_buses=index(columns["ref_buses"]),
+            gen_id=np.asarray(gen["j"], dtype=np.int64),
+            gen_bus=index(gen["bus"]),
+            gen_cost1=value(gen["cost1"]),
+            gen_cost2=value(gen["cost2"]),
+            gen_cost3=value(gen["cost3"]),
+            pmin=value(columns["pmin"]),
+            pmax=value(columns["pmax"]),
+            qmin=value(columns["qmin"]),
+            qmax=value(columns["qmax"]),
+            arc_bus=index(arc["bus"]),
+            rate_a=value(columns["rate_a"]),
+            branch_f_idx=index(branch["f_idx"]),
+            branch_t_idx=index(branch["t_idx"]),
+            branch_f_bus=index(branch["f_bus"]),
+            branch_t_bus=index(branch["t_bus"]),
+            angmin=value(columns["angmin"]),
+            angmax=value(columns["angmax"]),
+        )
+        for field in [
+            "g",
+            "b",
+            "g_fr",
+            "b_fr",
+            "g_to",
+            "b_to",
+            "tr",
+            "ti",
+            "c1",
+            "c2",
+            "c3",
+            "c4",
+            "c5",
+            "c6",
+            "c7",
+            "c8",
+            "rate_a_sq",
+        ]:
+            arrays[f"branch_{field}"] = value(branch[field])
+
+        Nbus = len(arrays["bus_pd"])
+        Narc = len(arrays["arc_bus"])
+        # bus types and generator setpoints are missing from the Julia export,
+        # buses with generators are taken as PV at 1.0 p.u. and mid dispatch
+        if "type" in bus:
+            arrays["bus_type"] = np.asarray(bus["type"], dtype=np.int64)
+        else:
+            bus_type = np.ones(Nbus, dtype=np.int64)
+            bus_type[arrays["gen_bus"]] = 2
+            bus_type[arrays["ref_buses"]] = 3
+            arrays["bus_type"] = bus_type
+        if "pg" in gen:
+            arrays["gen_pg"] = value(gen["pg"])
+            arrays["gen_vg"] = value(gen["vg"])
+        else:
+            arrays["gen_pg"] = (arrays["pmin"] + arrays["pmax"]) / 2
+            arrays["gen_vg"] = np.ones(len(arrays["gen_bus"]))
+        arrays["bus_arc_ptr"], arrays["bus_arcs"] = incidence_csr(
+            arrays["arc_bus"], Nbus
+        )
+        arrays["bus_gen_ptr"], arrays["bus_gens"] = incidence_csr(
+            arrays["gen_bus"], Nbus
+        )
+        arc_branch = np.full(Narc, -1, dtype=np.int64)
+        branches = np.arange(len(arrays["branch_f_idx"]), dtype=np.int64)
+        arc_branch[arrays["branch_f_idx"]] = branches
+        arc_branch[arrays["branch_t_idx"]] = branches
+        arrays["arc_branch"] = arc_branch
+        return cls(**arrays)
+
+
+def columns_from_records(data):
+    columns = {}
+    for key, value in data.items():
+        if len(value) > 0 and isinstance(value[0], dict):
+            fields = list(value[0].keys())
+            columns[key] = {k: np.array([row[k] for row in value]) for k in fields}
+        else:
+            columns[key] = np.array(value)
+    return columns
+
+
+def read_source(path):
+    if path.suffix == ".m":
+        return matpower.build_case_columns(matpower.parse_matpower(path))
+    with open(path, "r") as f:
+        return columns_from_records(json.load(f))
+
+
+def cache_path(filename, path):
+    return cache_dir / f"{filename}-{file_hash(path)}"
+
+
+def write_cache(directory, case):
+    tmp = directory.with_name(f"{directory.name}.{os.getpid()}.tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    for name in CaseData.__slots__:
+        np.save(tmp / f"{name}.npy", np.ascontiguousarray(getattr(case, name)))
+    # a complete cache directory appears atomically, a concurrent write of
+    # the same case may have won the race
+    try:
+        tmp.rename(directory)
+    except OSError:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def read_cache(directory, mmap=True):
+    mmap_mode = "r" if mmap else None
+    arrays = {
+        name: np.load(directory / f"{name}.npy", mmap_mode=mmap_mode)
+        for name in CaseData.__slots__
+    }
+    return CaseData(**arrays)
+
+
+def load_case(filename, mmap=True):
+    path = source_path(filename)
+    directory = cache_path(filename, path)
+    if not directory.exists():
+        # stale caches of the same case are replaced, the current one and
+        # the temporary directories of concurrent writers are kept
+        for old in cache_dir.glob(f"{filename}-*"):
+            if old.name != directory.name and not old.name.endswith(".tmp"):
+                shutil.rmtree(old, ignore_errors=True)
+        write_cache(directory, CaseData.from_columns(read_source(path)))
+    return read_cache(directory, mmap=mmap)
+
+
+def load_json(filename):
+    with open(json_dir / f"{filename}.json", "r") as f:
+        return json.load(f)
+
+
+def benchmark(cases, repeat):
+    print(f"{'case':<32} {'json.load':>10} {'cache':>10} {'cache(nommap)':>14}")
+    for case in cases:
+        load_case(case)
+        t_json = t_cache = t_nommap = float("inf")
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            load_json(case)
+            t1 = time.perf_counter()
+            load_case(case)
+            t2 = time.perf_counter()
+            load_case(case, mmap=False)
+            t3 = time.perf_counter()
+            t_json = min(t_json, t1 - t0)
+            t_cache = min(t_cache, t2 - t1)
+            t_nommap = min(t_nommap, t3 - t2)
+        print(f"{case:<32} {t_json:>10.4f} {t_cache:>10.4f} {t_nommap:>14.4f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bench", action="store_true")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("cases", nargs="*")
+    args = parser.parse_args()
+
+    cases = args.cases
+    if len(cases) == 0:
+        with open(root_dir / "test_cases.json", "r") as f:
+            cases = json.load(f)
+        cases = [c for c in cases if (case_dir / f"{c}.m").exists()]
+
+    if args.bench:
+        cases = [c for c in cases if (json_dir / f"{c}.json").exists()]
+        benchmark(cases, args.repeat)
+    else:
+        for case in cases:
+            t0 = time.perf_counter()
+            load_case(case)
+            t1 = time.perf_counter()
+            print(f"{case}: {t1 - t0:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,26 +4,7 @@ from pathlib import Path
 
 import pandas as pd
 
-
-def extract_timing(f):
-    total_time = None
-    ipopt_time = None
-    ad_time = None
-    n_iter = None
-    with open(f, "r") as f:
-        lines = f.readlines()
-    for line in reversed(lines):
-        if total_time and ipopt_time and ad_time and n_iter:
-            break
-        if "OverallAlgorithm" in line:
-            ipopt_time = float(line.split()[1])
-        elif "Function Evaluations" in line:
-            ad_time = float(line.split()[2])
-        elif "Total time" in line:
-            total_time = float(line.split()[2])
-        elif "Number of Iterations....:" in line:
-            n_iter = int(line.split()[3])
-    return total_time, ipopt_time, ad_time, n_iter
+from results_store import run_table
 
 
 def main():
@@ -51,21 +32,24 @@ def main():
     for solver in solvers:
         for i in range(3):
             solvers_details.append(f"{solver}.{i}")
-    wide_df_polar = pd.DataFrame(columns=solvers_details, index=test_cases)
-    wide_df_cartesian = pd.DataFrame(columns=solvers_details, index=test_cases)
-
-    logdir_polar = Path(__file__).parent / "log"
-    logdir_cartesian = Path(__file__).parent / "log_rect"
-
-    def f(logdir, wide_df):
+    # output file of every formulation, the quadratic-only rectangular model
+    # is run by PyOptInterface only
+    outputs = {
+        "polar": "wide_df_polar.csv",
+        "polar_aux": "wide_df_polar_aux.csv",
+        "rect": "wide_df_cartesian.csv",
+        "rect_qcqp": "wide_df_rect_qcqp.csv",
+        "iv": "wide_df_iv.csv",
+    }
+
+    def f(method, wide_df):
+        runs = run_table(method)
         for case, solver in product(test_cases, solvers):
-            suffix = solver
-            if solver == "poi":
-                suffix = "poi_LLVM"
-            
-            logpath = logdir / f"{case}_{suffix}.log"
-            with open(logpath, "r") as f:
-                total_time, ipopt_time, ad_time, n_iter = extract_timing(logpath)
+            run = runs.get((case, solver), {})
+            total_time = run.get("total_time")
+            ipopt_time = run.get("ipopt_time")
+            ad_time = run.get("ad_time")
+            n_iter = run.get("iterations")
 
             if total_time:
                 wide_df.at[case, f"{solver}.0"] = f"{n_iter}"
@@ -76,11 +60,10 @@ def main():
                 wide_df.at[case, f"{solver}.1"] = "NA"
                 wide_df.at[case, f"{solver}.2"] = "NA"
 
-    f(logdir_polar, wide_df_polar)
-    f(logdir_cartesian, wide_df_cartesian)
-
-    wide_df_polar.to_csv("wide_df_polar.csv")
-    wide_df_cartesian.to_csv("wide_df_cartesian.csv")
+    for method, output in outputs.items():
+        wide_df = pd.DataFrame(columns=solvers_details, index=test_cases)
+        f(method, wide_df)
+        wide_df.to_csv(output)
 
 
 if __name__ == "__main__":
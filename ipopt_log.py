@@ -0,0 +1,197 @@
+from pathlib import Path
+import argparse
+import json
+import os
+
+root_dir = Path(__file__).parent
+cache_path = root_dir / "cache" / "ipopt_logs.json"
+
+FIELDS = [
+    "total_time",
+    "ipopt_time",
+    "ad_time",
+    "linear_solver_time",
+    "iterations",
+    "objective",
+    "status",
+    "n_variables",
+    "n_equality",
+    "n_inequality",
+    "nnz_jac_equality",
+    "nnz_jac_inequality",
+    "nnz_hessian",
+]
+# the model sizes are printed before the iterations, every other field
+# after the "Number of Iterations" line of the final summary
+HEAD_FIELDS = [
+    "n_variables",
+    "n_equality",
+    "n_inequality",
+    "nnz_jac_equality",
+    "nnz_jac_inequality",
+    "nnz_hessian",
+]
+TAIL_FIELDS = [k for k in FIELDS if k not in HEAD_FIELDS]
+
+# EXIT messages of the Ipopt log by ApplicationReturnStatus name, the status
+# reported by the solver APIs is stored as the message of the log
+EXIT_MESSAGES = {
+    "Solve_Succeeded": "Optimal Solution Found.",
+    "Solved_To_Acceptable_Level": "Solved To Acceptable Level.",
+    "Feasible_Point_Found": "Feasible point for square problem found.",
+    "Infeasible_Problem_Detected": "Converged to a point of local infeasibility. "
+    "Problem may be infeasible.",
+    "Search_Direction_Becomes_Too_Small": "Search Direction is becoming Too Small.",
+    "Diverging_Iterates": "Iterates diverging; problem might be unbounded.",
+    "User_Requested_Stop": "Stopping optimization at current point as requested "
+    "by user.",
+    "Maximum_Iterations_Exceeded": "Maximum Number of Iterations Exceeded.",
+    "Maximum_CpuTime_Exceeded": "Maximum CPU time exceeded.",
+    "Maximum_WallTime_Exceeded": "Maximum wallclock time exceeded.",
+    "Restoration_Failed": "Restoration Failed!",
+    "Error_In_Step_Computation": "Error in step computation!",
+    "Not_Enough_Degrees_Of_Freedom": "Problem has too few degrees of freedom.",
+    "Invalid_Number_Detected": "Invalid number in NLP function or derivative "
+    "detected.",
+}
+
+
+def exit_message(status):
+    # EXIT message of an ApplicationReturnStatus name, or the name itself
+    return EXIT_MESSAGES.get(status, status)
+
+
+def parse_line(line):
+    # returns (field, value) or None
+    if "OverallAlgorithm" in line:
+        return "ipopt_time", float(line.split()[1])
+    elif "PDSystemSolverTotal" in line:
+        return "linear_solver_time", float(line.split()[1])
+    elif "Function Evaluations" in line:
+        return "ad_time", float(line.split()[2])
+    elif line.startswith("Total time"):
+        return "total_time", float(line.split()[2])
+    elif "Number of Iterations....:" in line:
+        return "iterations", int(line.split()[3])
+    elif "Objective...............:" in line:
+        return "objective", float(line.split()[2])
+    elif line.startswith("EXIT:"):
+        return "status", line[len("EXIT:") :].strip()
+    elif "Total number of variables" in line:
+        return "n_variables", int(line.split()[-1])
+    elif "Total number of equality constraints" in line:
+        return "n_equality", int(line.split()[-1])
+    elif "Total number of inequality constraints" in line:
+        return "n_inequality", int(line.split()[-1])
+    elif "Number of nonzeros in equality constraint Jacobian" in line:
+        return "nnz_jac_equality", int(line.split()[-1])
+    elif "Number of nonzeros in inequality constraint Jacobian" in line:
+        return "nnz_jac_inequality", int(line.split()[-1])
+    elif "Number of nonzeros in Lagrangian Hessian" in line:
+        return "nnz_hessian", int(line.split()[-1])
+    return None
+
+
+def reversed_lines(f, block_size=1 << 16):
+    # lines of a binary file from the last to the first
+    f.seek(0, os.SEEK_END)
+    position = f.tell()
+    rest = b""
+    while position > 0:
+        size = min(block_size, position)
+        position -= size
+        f.seek(position)
+        lines = (f.read(size) + rest).split(b"\n")
+        rest = lines[0]
+        for line in reversed(lines[1:]):
+            yield line.decode(errors="replace")
+    yield rest.decode(errors="replace")
+
+
+def parse_log(path):
+    # fields of an Ipopt log (print_level 5 with timing statistics) and the
+    # "Total time" line appended by test_driver, missing fields are None
+    result = dict.fromkeys(FIELDS)
+    with open(path, "rb") as f:
+        for line in reversed_lines(f):
+            parsed = parse_line(line.strip())
+            if parsed is None:
+                continue
+            field, value = parsed
+            # the last value in the file wins
+            if field in TAIL_FIELDS and result[field] is None:
+                result[field] = value
+            if field == "iterations":
+                break
+            if all(result[k] is not None for k in TAIL_FIELDS):
+                break
+
+        f.seek(0)
+        for line in f:
+            line = line.decode(errors="replace").strip()
+            if line.startswith("iter") or line.startswith("EXIT:"):
+                break
+            parsed = parse_line(line)
+            if parsed is not None and parsed[0] in HEAD_FIELDS:
+                result[parsed[0]] = parsed[1]
+                if all(result[k] is not None for k in HEAD_FIELDS):
+                    break
+    return result
+
+
+_cache = None
+
+
+def load_cache():
+    global _cache
+    if _cache is None:
+        _cache = {}
+        if cache_path.exists():
+            try:
+                with open(cache_path, "r") as f:
+                    _cache = json.load(f)
+            except ValueError:
+                pass
+    return _cache
+
+
+def save_cache():
+    cache_path.parent.mkdir(exist_ok=True)
+    tmp = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+    with open(tmp, "w") as f:
+        json.dump(_cache, f)
+    os.replace(tmp, cache_path)
+
+
+def read_log(path):
+    # parse_log cached by path and mtime, in memory and in cache/ipopt_logs.json
+    path = Path(path).resolve()
+    stat = path.stat()
+    key = str(path)
+    stamp = [stat.st_mtime_ns, stat.st_size]
+    cache = load_cache()
+    entry = cache.get(key)
+    # entries written before a field was added are parsed again
+    if (
+        entry is not None
+        and entry["stamp"] == stamp
+        and entry["fields"].keys() == set(FIELDS)
+    ):
+        return dict(entry["fields"])
+    fields = parse_log(path)
+    cache[key] = {"stamp": stamp, "fields": fields}
+    save_cache()
+    return dict(fields)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("logs", nargs="+")
+    args = parser.parse_args()
+
+    for path in args.logs:
+        print(path, read_log(path))
+
+
+if __name__ == "__main__":
+    main()
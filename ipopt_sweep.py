@@ -0,0 +1,152 @@
+import pandas as pd
+
+from pathlib import Path
+import argparse
+import itertools
+import json
+
+from casadi_ import casadi_main
+from ipopt_log import read_log
+from poi import poi_main
+from test_driver import case_size
+
+root_dir = Path(__file__).parent
+sweep_dir = root_dir / "log_sweep"
+result_path = root_dir / "sweep.csv"
+
+# option name: values, every combination is one configuration; HSL solvers
+# that are not installed show up as failed runs
+DEFAULT_GRID = {
+    "linear_solver": ["ma27", "ma57", "mumps"],
+    "mu_strategy": ["monotone", "adaptive"],
+    "nlp_scaling_method": ["gradient-based", "none"],
+}
+# upper bounds of the number of buses
+SIZE_CLASSES = [(1000, "small"), (10000, "medium"), (float("inf"), "large")]
+SOLVED = ["Optimal Solution Found.", "Solved To Acceptable Level."]
+
+
+def option_sets(grid):
+    # a grid is a list of option dicts or a dict of option value lists
+    if isinstance(grid, list):
+        return grid
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*grid.values())]
+
+
+def label(options):
+    return ",".join(f"{k}={v}" for k, v in options.items())
+
+
+def size_class(case):
+    n = case_size(case)
+    for bound, name in SIZE_CLASSES:
+        if n < bound:
+            return name
+
+
+def run_configuration(solver, method, case, options, jit="LLVM", batch=False):
+    logdir = sweep_dir / method / label(options)
+    logdir.mkdir(parents=True, exist_ok=True)
+    if solver == "poi":
+        f = lambda: poi_main(logdir, case, method, jit, batch, options)
+    elif solver == "casadi":
+        f = lambda: casadi_main(
+            logdir, case, method, vectorized=batch, ipopt_options=options
+        )
+    else:
+        raise ValueError(f"Unknown solver: {solver}")
+
+    row = {
+        "case": case,
+        "size_class": size_class(case),
+        "solver": solver,
+        "method": method,
+        "configuration": label(options),
+    }
+    try:
+        total_time, logpath = f()
+    except Exception as e:
+        row.update(status=f"error: {e}", total_time=None)
+        return row
+    fields = read_log(logpath)
+    row.update(
+        {
+            "status": fields["status"],
+            "total_time": total_time,
+            "ipopt_time": fields["ipopt_time"],
+            "linear_solver_time": fields["linear_solver_time"],
+            "ad_time": fields["ad_time"],
+            "iterations": fields["iterations"],
+        }
+    )
+    return row
+
+
+def sweep(grid, solvers, methods, cases, jit="LLVM", batch=False):
+    rows = []
+    for options, solver, method, case in itertools.product(
+        option_sets(grid), solvers, methods, cases
+    ):
+        row = run_configuration(solver, method, case, options, jit, batch)
+        print(
+            f"{row['status']:<28} {solver:<6} {method:<5} {case} "
+            f"{row['configuration']}",
+            flush=True,
+        )
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def best_configurations(df):
+    # per size class and backend the configuration with the least total time
+    # among those that solve every case of the class
+    df = df.assign(solved=df["status"].isin(SOLVED))
+    best = []
+    for (size, solver, method), group in df.groupby(["size_class", "solver", "method"]):
+        by_configuration = group.groupby("configuration").agg(
+            solved=("solved", "all"),
+            total_time=("total_time", "sum"),
+            iterations=("iterations", "sum"),
+        )
+        solved = by_configuration[by_configuration["solved"]]
+        if len(solved) == 0:
+            continue
+        configuration = solved["total_time"].idxmin()
+        best.append(
+            {
+                "size_class": size,
+                "solver": solver,
+                "method": method,
+                "configuration": configuration,
+                "total_time": solved.at[configuration, "total_time"],
+                "iterations": int(solved.at[configuration, "iterations"]),
+            }
+        )
+    return pd.DataFrame(best)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    # JSON file with a list of option dicts or a dict of option value lists
+    parser.add_argument("--grid", type=str, default=None)
+    parser.add_argument("--solver", type=str, nargs="+", default=["poi", "casadi"])
+    parser.add_argument("--method", type=str, nargs="+", default=["polar"])
+    parser.add_argument("--jit", type=str, default="LLVM")
+    parser.add_argument("--batch", action="store_true")
+    parser.add_argument("--output", type=str, default=str(result_path))
+    parser.add_argument("cases", nargs="+")
+    args = parser.parse_args()
+
+    grid = DEFAULT_GRID
+    if args.grid is not None:
+        with open(args.grid, "r") as f:
+            grid = json.load(f)
+
+    df = sweep(grid, args.solver, args.method, args.cases, args.jit, args.batch)
+    df.to_csv(args.output, index=False)
+    print(best_configurations(df).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
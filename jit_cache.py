@@ -0,0 +1,144 @@
+from io import StringIO
+from pathlib import Path
+import ctypes
+import hashlib
+import os
+import subprocess
+import sys
+
+from poi_compat import (
+    AutodiffEvaluator,
+    generate_csrc_from_graph,
+    generate_csrc_prelude,
+)
+
+root_dir = Path(__file__).parent
+jit_cache_dir = root_dir / "cache" / "jit"
+
+compiler = os.environ.get("CC", "gcc")
+flags = ["-O2", "-shared", "-fPIC"]
+library_suffix = ".dll" if sys.platform == "win32" else ".so"
+
+# loaded shared objects stay alive for the lifetime of the process
+_libraries = {}
+
+
+def c_source(model, function_indices):
+    # the same C code that PyOptInterface compiles with TCC
+    io = StringIO()
+    generate_csrc_prelude(io)
+    for function_index in function_indices:
+        name = model.function_names[function_index]
+        structure = model.function_autodiff_structures[function_index]
+        graph = model.function_cppad_autodiff_graphs[function_index]
+        np = structure.np
+
+        generate_csrc_from_graph(
+            io, graph.f, name, np=np, indirect_x=True, indirect_p=True, add_y=True
+        )
+        if structure.has_jacobian:
+            generate_csrc_from_graph(
+                io,
+                graph.jacobian,
+                name + "_jacobian",
+                np=np,
+                indirect_x=True,
+                indirect_p=True,
+            )
+            generate_csrc_from_graph(
+                io,
+                graph.jacobian,
+                name + "_gradient",
+                np=np,
+                indirect_x=True,
+                indirect_p=True,
+                indirect_y=True,
+                add_y=True,
+            )
+        if structure.has_hessian:
+            generate_csrc_from_graph(
+                io,
+                graph.hessian,
+                name + "_hessian",
+                np=np,
+                hessian_lagrange=True,
+                nw=structure.ny,
+                indirect_x=True,
+                indirect_p=True,
+                indirect_y=True,
+                add_y=True,
+            )
+    return io.getvalue()
+
+
+def artifact_path(source, engine="C", compiler=compiler, flags=flags):
+    h = hashlib.sha1()
+    for part in [engine, compiler, " ".join(flags), sys.platform, source]:
+        h.update(part.encode())
+        h.update(b"\0")
+    return jit_cache_dir / f"{h.hexdigest()[:20]}{library_suffix}"
+
+
+def build_library(source, path, compiler=compiler, flags=flags):
+    # compile into a private file first, a complete library appears atomically
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = f"{path.stem}.{os.getpid()}"
+    c_path = path.with_name(f"{tmp}.c")
+    lib_path = path.with_name(f"{tmp}{library_suffix}")
+    c_path.write_text(source)
+    try:
+        subprocess.run(
+            [compiler, *flags, "-o", str(lib_path), str(c_path), "-lm"],
+            check=True,
+            capture_output=True,
+            text=True,
+        )
+        os.replace(lib_path, path)
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"{compiler} failed to compile {path.stem}:\n{e.stderr}")
+    finally:
+        # neither the source nor a partial library is left in the cache
+        c_path.unlink(missing_ok=True)
+        lib_path.unlink(missing_ok=True)
+
+
+def load_library(path):
+    key = str(path)
+    if key not in _libraries:
+        _libraries[key] = ctypes.CDLL(key)
+    return _libraries[key]
+
+
+def symbol(library, name):
+    return ctypes.cast(getattr(library, name), ctypes.c_void_p).value
+
+
+def compile_functions_cached(model, compiler=compiler, flags=flags):
+    # like compile_functions_c, but the library is built by an external
+    # compiler once and reused from cache/jit by later runs and processes
+    function_indices = [
+        i for i in model.function_indices if not model._has_function_evaluator(i)
+    ]
+    if len(function_indices) == 0:
+        return None
+
+    source = c_source(model, function_indices)
+    path = artifact_path(source, compiler=compiler, flags=flags)
+    if not path.exists():
+        build_library(source, path, compiler, flags)
+    library = load_library(path)
+
+    for function_index in function_indices:
+        name = model.function_names[function_index]
+        structure = model.function_autodiff_structures[function_index]
+        jacobian = gradient = hessian = 0
+        if structure.has_jacobian:
+            jacobian = symbol(library, name + "_jacobian")
+            gradient = symbol(library, name + "_gradient")
+        if structure.has_hessian:
+            hessian = symbol(library, name + "_hessian")
+        evaluator = AutodiffEvaluator(
+            structure, symbol(library, name), jacobian, gradient, hessian
+        )
+        model._set_function_evaluator(function_index, evaluator)
+    return path
@@ -0,0 +1,390 @@
+import numpy as np
+
+from pathlib import Path
+import argparse
+import json
+import math
+import re
+import time
+
+# same default as PowerModels.correct_voltage_angle_differences!
+ANGLE_PAD = 1.0472
+
+_matrix_re = re.compile(r"mpc\.(\w+)\s*=\s*\[(.*?)\]\s*;", re.S)
+_scalar_re = re.compile(r"mpc\.(\w+)\s*=\s*([-+0-9.eE]+)\s*;")
+_comment_re = re.compile(r"%[^\n]*")
+
+
+def _parse_matrix(text):
+    text = _comment_re.sub("", text)
+    rows = [r for r in re.split(r"[;\n]", text) if r.strip()]
+    if len(rows) == 0:
+        return np.zeros((0, 0))
+    tokens = text.replace(";", " ").split()
+    ncols = len(rows[0].split())
+    if len(tokens) == len(rows) * ncols:
+        return np.array(tokens, dtype=np.float64).reshape(len(rows), ncols)
+    # rows of different length (e.g. gencost with mixed ncost)
+    rows = [r.split() for r in rows]
+    ncols = max(len(r) for r in rows)
+    matrix = np.zeros((len(rows), ncols))
+    for k, r in enumerate(rows):
+        matrix[k, : len(r)] = np.array(r, dtype=np.float64)
+    return matrix
+
+
+def parse_matpower(path):
+    with open(path, "r") as f:
+        text = f.read()
+
+    mpc = {}
+    for name, value in _scalar_re.findall(text):
+        mpc[name] = float(value)
+    for name, body in _matrix_re.findall(text):
+        mpc[name] = _parse_matrix(body)
+    return mpc
+
+
+def _standardize_cost(gencost, baseMVA, ngen):
+    gencost = gencost[:ngen]
+    if np.any(gencost[:, 0] != 2):
+        raise ValueError("Only polynomial (model 2) generator costs are supported")
+
+    ncost = gencost[:, 3].astype(np.int64)
+    cost = np.zeros((ngen, 3))
+    for n in np.unique(ncost):
+        rows = np.flatnonzero(ncost == n)
+        coef = gencost[rows, 4 : 4 + n]
+        # per-unit scaling, coefficients are ordered from highest degree
+        degree = np.arange(n - 1, -1, -1)
+        coef = coef * baseMVA**degree
+        if n > 3:
+            if np.any(coef[:, : n - 3] != 0.0):
+                raise ValueError("Generator cost of order higher than 2 is found")
+            coef = coef[:, n - 3 :]
+        cost[rows, 3 - min(n, 3) :] = coef
+    return cost
+
+
+def _correct_branch_directions(
+    f_bus, t_bus, r, x, g_fr, b_fr, g_to, b_to, tap, shift, angmin, angmax
+):
+    orientations = set()
+    reverse = np.zeros(len(f_bus), dtype=bool)
+    for k, (f, t) in enumerate(zip(f_bus.tolist(), t_bus.tolist())):
+        if (t, f) in orientations:
+            reverse[k] = True
+        else:
+            orientations.add((f, t))
+    if not reverse.any():
+        return
+
+    k = reverse
+    tap2 = tap[k] ** 2
+    f_bus[k], t_bus[k] = t_bus[k].copy(), f_bus[k].copy()
+    g_fr[k], g_to[k] = g_to[k] / tap2, g_fr[k] * tap2
+    b_fr[k], b_to[k] = b_to[k] / tap2, b_fr[k] * tap2
+    r[k] = r[k] * tap2
+    x[k] = x[k] * tap2
+    tap[k] = 1.0 / tap[k]
+    shift[k] = -shift[k]
+    angmin[k], angmax[k] = -angmax[k], -angmin[k]
+
+
+def build_case_columns(mpc):
+    baseMVA = mpc["baseMVA"]
+    bus = mpc["bus"]
+    gen = mpc["gen"]
+    branch = mpc["branch"]
+
+    # active buses, generators and branches as in PowerModels.build_ref
+    bus = bus[bus[:, 1] != 4]
+    bus_ids = bus[:, 0].astype(np.int64)
+    bus_lookup = {b: k for k, b in enumerate(bus_ids.tolist())}
+    Nbus = len(bus_ids)
+
+    def to_bus_index(ids):
+        ids = ids.astype(np.int64).tolist()
+        return np.array([bus_lookup.get(b, -1) for b in ids], dtype=np.int64)
+
+    gen_ids = np.arange(1, gen.shape[0] + 1)
+    cost = _standardize_cost(mpc["gencost"], baseMVA, gen.shape[0])
+    gen_bus = to_bus_index(gen[:, 0])
+    gen_active = (gen[:, 7] > 0) & (gen_bus >= 0)
+    gen, gen_ids, gen_bus, cost = (
+        gen[gen_active],
+        gen_ids[gen_active],
+        gen_bus[gen_active],
+        cost[gen_active],
+    )
+    Ngen = len(gen_ids)
+
+    f_bus = to_bus_index(branch[:, 0])
+    t_bus = to_bus_index(branch[:, 1])
+    branch_active = (branch[:, 10] > 0) & (f_bus >= 0) & (t_bus >= 0)
+    branch, f_bus, t_bus = (
+        branch[branch_active],
+        f_bus[branch_active],
+        t_bus[branch_active],
+    )
+    Nbranch = branch.shape[0]
+
+    r = branch[:, 2].copy()
+    x = branch[:, 3].copy()
+    g_fr = np.zeros(Nbranch)
+    g_to = np.zeros(Nbranch)
+    b_fr = branch[:, 4] / 2
+    b_to = branch[:, 4] / 2
+    tap = np.where(branch[:, 8] == 0.0, 1.0, branch[:, 8])
+    shift = np.deg2rad(branch[:, 9])
+    angmin = np.deg2rad(branch[:, 11])
+    angmax = np.deg2rad(branch[:, 12])
+    rate_a = branch[:, 5] / baseMVA
+
+    _correct_branch_directions(
+        f_bus, t_bus, r, x, g_fr, b_fr, g_to, b_to, tap, shift, angmin, angmax
+    )
+
+    angmin[angmin <= -math.pi / 2] = -ANGLE_PAD
+    angmax[angmax >= math.pi / 2] = ANGLE_PAD
+    both_zero = (angmin == 0.0) & (angmax == 0.0)
+    angmin[both_zero] = -ANGLE_PAD
+    angmax[both_zero] = ANGLE_PAD
+
+    # branch series admittance, pinv of zero impedance is zero
+    z_sq = r**2 + x**2
+    nonzero = z_sq > 0.0
+    g = np.divide(r, z_sq, out=np.zeros(Nbranch), where=nonzero)
+    b = np.divide(-x, z_sq, out=np.zeros(Nbranch), where=nonzero)
+    tr = tap * np.cos(shift)
+    ti = tap * np.sin(shift)
+    ttm = tr**2 + ti**2
+
+    vmax = bus[:, 11]
+    vmin = bus[:, 12]
+
+    # thermal limits, as in PowerModels.calc_thermal_limits!
+    missing = rate_a <= 0.0
+    if missing.any():
+        theta_max = np.maximum(np.abs(angmin), np.abs(angmax))
+        fr_vmax = vmax[f_bus]
+        to_vmax = vmax[t_bus]
+        m_vmax = np.maximum(fr_vmax, to_vmax)
+        c_max = np.sqrt(
+            fr_vmax**2 + to_vmax**2 - 2 * fr_vmax * to_vmax * np.cos(theta_max)
+        )
+        y_mag = np.sqrt(g**2 + b**2)
+        rate_a = np.where(missing, y_mag * m_vmax * c_max, rate_a)
+
+    c1 = (-g * tr - b * ti) / ttm
+    c2 = (-b * tr + g * ti) / ttm
+    c3 = (-g * tr + b * ti) / ttm
+    c4 = (-b * tr - g * ti) / ttm
+    c5 = (g + g_fr) / ttm
+    c6 = (b + b_fr) / ttm
+    c7 = g + g_to
+    c8 = b + b_to
+
+    pd = bus[:, 2] / baseMVA
+    qd = bus[:, 3] / baseMVA
+    gs = bus[:, 4] / baseMVA
+    bs = bus[:, 5] / baseMVA
+
+    # arcs_from followed by arcs_to, indices are 1-based as in the Julia export
+    arc_bus = np.concatenate([f_bus, t_bus]) + 1
+    arc_rate_a = np.concatenate([rate_a, rate_a])
+    f_idx = np.arange(1, Nbranch + 1)
+    t_idx = f_idx + Nbranch
+
+    Narc = 2 * Nbranch
+    columns = {
+        "bus": {
+            "i": np.arange(1, Nbus + 1),
+            "j": bus_ids,
+            "pd": pd,
+            "gs": gs,
+            "qd": qd,
+            "bs": bs,
+            "type": bus[:, 1].astype(np.int64),
+        },
+        "gen": {
+            "i": np.arange(1, Ngen + 1),
+            "j": gen_ids,
+            "cost1": cost[:, 0].copy(),
+            "cost2": cost[:, 1].copy(),
+            "cost3": cost[:, 2].copy(),
+            "bus": gen_bus + 1,
+            "pg": gen[:, 1] / baseMVA,
+            "vg": gen[:, 5],
+        },
+        "arc": {
+            "i": np.arange(1, Narc + 1),
+            "rate_a": arc_rate_a,
+            "bus": arc_bus,
+        },
+        "branch": {
+            "i": f_idx,
+            "j": np.ones(Nbranch, dtype=np.int64),
+            "f_idx": f_idx,
+            "t_idx": t_idx,
+            "f_bus": f_bus + 1,
+            "t_bus": t_bus + 1,
+            "g": g,
+            "b": b,
+            "g_fr": g_fr,
+            "b_fr": b_fr,
+            "g_to": g_to,
+            "b_to": b_to,
+            "tr": tr,
+            "ti": ti,
+            "c1": c1,
+            "c2": c2,
+            "c3": c3,
+            "c4": c4,
+            "c5": c5,
+            "c6": c6,
+            "c7": c7,
+            "c8": c8,
+            "rate_a_sq": rate_a**2,
+        },
+        "ref_buses": np.flatnonzero(bus[:, 1] == 3) + 1,
+        "vmax": vmax,
+        "vmin": vmin,
+        "vmax_sq": vmax**2,
+        "vmin_sq": vmin**2,
+        "pmax": gen[:, 8] / baseMVA,
+        "pmin": gen[:, 9] / baseMVA,
+        "qmax": gen[:, 3] / baseMVA,
+        "qmin": gen[:, 4] / baseMVA,
+        "rate_a": arc_rate_a,
+        "angmax": angmax,
+        "angmin": angmin,
+    }
+    return columns
+
+
+def columns_to_records(columns):
+    data = {}
+    for key, value in columns.items():
+        if isinstance(value, dict):
+            fields = list(value.keys())
+            rows = zip(*[value[k].tolist() for k in fields])
+            data[key] = [dict(zip(fields, row)) for row in rows]
+        else:
+            data[key] = value.tolist()
+    return data
+
+
+def build_case_data(mpc):
+    return columns_to_records(build_case_columns(mpc))
+
+
+def parse_case_data(path):
+    return build_case_data(parse_matpower(path))
+
+
+def _canonical(data):
+    # the Julia export numbers buses/gens/branches in Dict iteration order,
+    # so everything is keyed by the original MATPOWER ids before comparing
+    bus_j = [b["j"] for b in data["bus"]]
+    gen_j = [g["j"] for g in data["gen"]]
+
+    tables = {}
+    tables["bus"] = {
+        j: (b["pd"], b["gs"], b["qd"], b["bs"], data["vmin"][k], data["vmax"][k])
+        for k, (j, b) in enumerate(zip(bus_j, data["bus"]))
+    }
+    tables["gen"] = {
+        j: (
+            g["cost1"],
+            g["cost2"],
+            g["cost3"],
+            bus_j[g["bus"] - 1],
+            data["pmin"][k],
+            data["pmax"][k],
+            data["qmin"][k],
+            data["qmax"][k],
+        )
+        for k, (j, g) in enumerate(zip(gen_j, data["gen"]))
+    }
+    branches = {}
+    for k, b in enumerate(data["branch"]):
+        f_arc = data["arc"][b["f_idx"] - 1]
+        t_arc = data["arc"][b["t_idx"] - 1]
+        key = (bus_j[b["f_bus"] - 1], bus_j[b["t_bus"] - 1])
+        value = tuple(b[f"c{i}"] for i in range(1, 9)) + (
+            b["g"],
+            b["b"],
+            b["tr"],
+            b["ti"],
+            b["g_fr"],
+            b["b_fr"],
+            b["g_to"],
+            b["b_to"],
+            b["rate_a_sq"],
+            data["angmin"][k],
+            data["angmax"][k],
+            bus_j[f_arc["bus"] - 1],
+            bus_j[t_arc["bus"] - 1],
+            f_arc["rate_a"],
+            t_arc["rate_a"],
+        )
+        branches.setdefault(key, []).append(value)
+    tables["branch"] = {k: tuple(sorted(v)) for k, v in branches.items()}
+    tables["ref_buses"] = {bus_j[i - 1]: () for i in data["ref_buses"]}
+    return tables
+
+
+def compare_case_data(data, reference, rtol=1e-9, atol=1e-9):
+    ours = _canonical(data)
+    theirs = _canonical(reference)
+
+    mismatches = []
+    for table in ours:
+        a, b = ours[table], theirs[table]
+        if a.keys() != b.keys():
+            mismatches.append(f"{table}: keys differ ({len(a)} vs {len(b)})")
+            continue
+        for key in a:
+            x = np.array(a[key], dtype=np.float64).ravel()
+            y = np.array(b[key], dtype=np.float64).ravel()
+            if x.shape != y.shape or not np.allclose(x, y, rtol=rtol, atol=atol):
+                mismatches.append(f"{table} {key}: {a[key]} != {b[key]}")
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--check", action="store_true")
+    parser.add_argument("cases", nargs="*")
+    args = parser.parse_args()
+
+    case_dir = Path(__file__).parent / "case"
+    json_dir = Path(__file__).parent / "json"
+    json_dir.mkdir(exist_ok=True)
+
+    files = sorted(case_dir.glob("*.m"))
+    if args.cases:
+        files = [f for f in files if f.stem in args.cases]
+
+    for case_file in files:
+        json_file = json_dir / f"{case_file.stem}.json"
+        t0 = time.time()
+        data = parse_case_data(case_file)
+        t1 = time.time()
+        if args.check:
+            with open(json_file, "r") as f:
+                reference = json.load(f)
+            mismatches = compare_case_data(data, reference)
+            status = "OK" if len(mismatches) == 0 else f"{len(mismatches)} mismatches"
+            print(f"{case_file.stem}: {status} (parsed in {t1 - t0:.2f}s)")
+            for m in mismatches[:10]:
+                print(f"  {m}")
+        else:
+            with open(json_file, "w") as f:
+                json.dump(data, f)
+            print(f"exported {json_file} (parsed in {t1 - t0:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
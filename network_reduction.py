@@ -0,0 +1,319 @@
+import numpy as np
+
+import argparse
+import time
+
+from case_data import CaseData, incidence_csr, load_case
+from power_flow import branch_admittances, branch_flows, power_flow
+
+BRANCH_FIELDS = ["g", "b", "g_fr", "b_fr", "g_to", "b_to", "tr", "ti"]
+# series and shunt admittances, multiplied when parallel copies are merged
+SCALED_FIELDS = ["g", "b", "g_fr", "b_fr", "g_to", "b_to"] + [
+    f"c{i}" for i in range(1, 9)
+]
+
+
+def subset_case(data, buses, branches, scale=None, **arrays):
+    # CaseData of the buses and branches with the given indices, branch k
+    # stands for scale[k] identical copies; arrays replaces bus arrays of
+    # data before the subset is taken. All generators are kept
+    if scale is None:
+        scale = np.ones(len(branches))
+    values = {name: getattr(data, name) for name in CaseData.__slots__}
+    values.update(arrays)
+    bus_index = np.full(data.Nbus, -1, dtype=np.int64)
+    bus_index[buses] = np.arange(len(buses))
+    Nbus, Nbranch = len(buses), len(branches)
+
+    reduced = {
+        name: np.asarray(values[name])[buses]
+        for name in ["bus_id", "bus_pd", "bus_qd", "bus_gs", "bus_bs", "bus_type"]
+        + ["vmin", "vmax"]
+    }
+    reduced["ref_buses"] = bus_index[data.ref_buses]
+    for name in ["gen_id", "gen_cost1", "gen_cost2", "gen_cost3", "gen_pg", "gen_vg"]:
+        reduced[name] = values[name]
+    for name in ["pmin", "pmax", "qmin", "qmax"]:
+        reduced[name] = values[name]
+    reduced["gen_bus"] = bus_index[data.gen_bus]
+
+    f_bus = bus_index[data.branch_f_bus[branches]]
+    t_bus = bus_index[data.branch_t_bus[branches]]
+    for field in BRANCH_FIELDS + [f"c{i}" for i in range(1, 9)]:
+        column = getattr(data, f"branch_{field}")[branches]
+        reduced[f"branch_{field}"] = (
+            column * scale if field in SCALED_FIELDS else column
+        )
+    reduced["branch_rate_a_sq"] = data.branch_rate_a_sq[branches] * scale**2
+    reduced["angmin"] = data.angmin[branches]
+    reduced["angmax"] = data.angmax[branches]
+    reduced["branch_f_bus"] = f_bus
+    reduced["branch_t_bus"] = t_bus
+    reduced["branch_f_idx"] = np.arange(Nbranch, dtype=np.int64)
+    reduced["branch_t_idx"] = np.arange(Nbranch, 2 * Nbranch, dtype=np.int64)
+
+    # arcs_from followed by arcs_to as in the case files
+    reduced["arc_bus"] = np.concatenate([f_bus, t_bus])
+    reduced["rate_a"] = np.concatenate(
+        [
+            data.rate_a[data.branch_f_idx[branches]] * scale,
+            data.rate_a[data.branch_t_idx[branches]] * scale,
+        ]
+    )
+    reduced["arc_branch"] = np.tile(np.arange(Nbranch, dtype=np.int64), 2)
+    reduced["bus_arc_ptr"], reduced["bus_arcs"] = incidence_csr(
+        reduced["arc_bus"], Nbus
+    )
+    reduced["bus_gen_ptr"], reduced["bus_gens"] = incidence_csr(
+        reduced["gen_bus"], Nbus
+    )
+    return CaseData(**reduced)
+
+
+def merge_parallel(data):
+    # identical branches between the same buses carry identical flows, so
+    # they are replaced by one branch with the admittances and the rating
+    # multiplied by their number; returns the merged case and the merged
+    # branch of every branch
+    keys = np.column_stack(
+        [data.branch_f_bus, data.branch_t_bus]
+        + [getattr(data, f"branch_{field}") for field in BRANCH_FIELDS]
+        + [data.branch_rate_a_sq, data.angmin, data.angmax]
+    )
+    _, first, inverse, counts = np.unique(
+        keys, axis=0, return_index=True, return_inverse=True, return_counts=True
+    )
+    # merged branches keep the order of their first copy
+    order = np.argsort(first)
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    merged = subset_case(
+        data, np.arange(data.Nbus), first[order], counts[order].astype(np.float64)
+    )
+    return merged, rank[inverse.ravel()]
+
+
+def remove_dead_ends(data):
+    # removes buses without load and generation that hang off a single
+    # branch, repeatedly, and isolated ones without shunt. The voltage of a
+    # removed bus i is ratio * V_j of its neighbour j, so the branch and the
+    # shunt of i become a shunt at j, and the voltage limits of i and the
+    # thermal and angle limits of the branch become voltage limits of j.
+    # Returns the reduced case, the kept buses and the removed buses with
+    # their neighbour and ratio in the order of removal
+    n = data.Nbus
+    y_ff, y_ft, y_tf, y_tt = branch_admittances(data)
+    f_bus = data.branch_f_bus.tolist()
+    t_bus = data.branch_t_bus.tolist()
+    rate = np.sqrt(data.branch_rate_a_sq)
+    shunt = data.bus_gs + 1j * data.bus_bs
+    vmin = data.vmin.copy()
+    vmax = data.vmax.copy()
+
+    fixed = (data.bus_pd != 0) | (data.bus_qd != 0) | (np.diff(data.bus_gen_ptr) > 0)
+    fixed[data.ref_buses] = True
+    bus_active = np.ones(n, dtype=bool)
+    branch_active = np.ones(data.Nbranch, dtype=bool)
+    branches_at = [[] for _ in range(n)]
+    for k, (f, t) in enumerate(zip(f_bus, t_bus)):
+        branches_at[f].append(k)
+        branches_at[t].append(k)
+
+    stubs = []
+    stack = [i for i in range(n) if not fixed[i] and len(branches_at[i]) <= 1]
+    while stack:
+        i = stack.pop()
+        live = [k for k in branches_at[i] if branch_active[k]]
+        if not bus_active[i] or len(live) > 1:
+            continue
+        if len(live) == 0:
+            if shunt[i] == 0:
+                bus_active[i] = False
+                stubs.append((i, -1, 0.0))
+            continue
+        k = live[0]
+        if i == t_bus[k]:
+            j, y_ii, y_ij, y_ji, y_jj = f_bus[k], y_tt[k], y_tf[k], y_ft[k], y_ff[k]
+        else:
+            j, y_ii, y_ij, y_ji, y_jj = t_bus[k], y_ff[k], y_ft[k], y_tf[k], y_tt[k]
+        # no current leaves bus i through anything but its shunt
+        y_ii = y_ii + shunt[i]
+        if y_ii == 0 or y_ij == 0:
+            continue
+        ratio = -y_ij / y_ii
+        angle = np.angle(ratio) if i == f_bus[k] else -np.angle(ratio)
+        if not data.angmin[k] <= angle <= data.angmax[k]:
+            continue
+        r = abs(ratio)
+        y_eq = y_jj + y_ji * ratio
+        lo = max(vmin[j], vmin[i] / r)
+        hi = min(vmax[j], vmax[i] / r)
+        # |S| is vm_j^2 |y_eq| at j and vm_i^2 |shunt_i| at i
+        if y_eq != 0:
+            hi = min(hi, np.sqrt(rate[k] / abs(y_eq)))
+        if shunt[i] != 0:
+            hi = min(hi, np.sqrt(rate[k] / abs(shunt[i])) / r)
+        if lo > hi:
+            continue
+        vmin[j], vmax[j] = lo, hi
+        shunt[j] += y_eq
+        bus_active[i] = False
+        branch_active[k] = False
+        stubs.append((i, j, ratio))
+        if not fixed[j]:
+            stack.append(j)
+
+    buses = np.flatnonzero(bus_active)
+    branches = np.flatnonzero(branch_active)
+    reduced = subset_case(
+        data,
+        buses,
+        branches,
+        bus_gs=shunt.real,
+        bus_bs=shunt.imag,
+        vmin=vmin,
+        vmax=vmax,
+    )
+    branch_map = np.full(data.Nbranch, -1, dtype=np.int64)
+    branch_map[branches] = np.arange(len(branches))
+    return reduced, buses, branch_map, stubs
+
+
+def flow_bound(a, alpha, beta, v1, v2, angmin, angmax):
+    # max |a v1^2 + v1 v2 (alpha cos(t) + beta sin(t))| over the voltage
+    # boxes v1, v2 and t in [angmin, angmax]. The maximum has every variable
+    # at an end of its range or, for v1, at its stationary point
+    R = np.hypot(alpha, beta)
+    phi = np.arctan2(beta, alpha)
+    thetas = [angmin, angmax] + [
+        np.clip(phi + k * np.pi, angmin, angmax) for k in range(-2, 3)
+    ]
+    c = np.array([R * np.cos(t - phi) for t in thetas])
+    bound = np.zeros_like(a)
+    for c_ in [c.min(axis=0), c.max(axis=0)]:
+        for v2_ in v2:
+            stationary = np.divide(-v2_ * c_, 2 * a, out=np.zeros_like(a), where=a != 0)
+            for v1_ in [v1[0], v1[1], np.clip(stationary, v1[0], v1[1])]:
+                bound = np.maximum(bound, np.abs(a * v1_**2 + v1_ * v2_ * c_))
+    return bound
+
+
+def tighten_flow_bounds(data):
+    # bounds of the arc flows p, q implied by the voltage and angle limits,
+    # where they are tighter than the rating
+    c1, c2, c3, c4, c5, c6, c7, c8 = data.branch_coefficients()
+    v_f = (data.vmin[data.branch_f_bus], data.vmax[data.branch_f_bus])
+    v_t = (data.vmin[data.branch_t_bus], data.vmax[data.branch_t_bus])
+    angles = (data.angmin, data.angmax)
+    bound_f = np.maximum(
+        flow_bound(c5, c3, c4, v_f, v_t, *angles),
+        flow_bound(-c6, -c4, c3, v_f, v_t, *angles),
+    )
+    bound_t = np.maximum(
+        flow_bound(c7, c1, -c2, v_t, v_f, *angles),
+        flow_bound(-c8, -c2, -c1, v_t, v_f, *angles),
+    )
+    rate_a = data.rate_a.copy()
+    rate_a[data.branch_f_idx] = np.minimum(rate_a[data.branch_f_idx], bound_f)
+    rate_a[data.branch_t_idx] = np.minimum(rate_a[data.branch_t_idx], bound_t)
+    return data.replace(rate_a=rate_a), int(np.sum(rate_a < data.rate_a))
+
+
+def reduce_network(data):
+    # exact reduction of the case: merged parallel branches, removed dead-end
+    # and isolated buses and tightened flow bounds. The reduction maps a
+    # solution back to the original buses with expand_solution
+    merged, merge_map = merge_parallel(data)
+    reduced, buses, branch_map, stubs = remove_dead_ends(merged)
+    reduced, tightened = tighten_flow_bounds(reduced)
+    reduction = {
+        "bus": buses,
+        "branch": branch_map[merge_map],
+        "stub_bus": np.array([s[0] for s in stubs], dtype=np.int64),
+        "stub_parent": np.array([s[1] for s in stubs], dtype=np.int64),
+        "stub_ratio": np.array([s[2] for s in stubs], dtype=complex),
+        "tightened_arcs": tightened,
+    }
+    return reduced, reduction
+
+
+def reduction_sizes(data, reduced, reduction):
+    # sizes of the original and the reduced case for the run records
+    return {
+        "buses": [data.Nbus, reduced.Nbus],
+        "branches": [data.Nbranch, reduced.Nbranch],
+        "arcs": [data.Narc, reduced.Narc],
+        "tightened_arcs": reduction["tightened_arcs"],
+    }
+
+
+def expand_voltages(data, reduction, vm, va):
+    # bus voltages of the original case from those of the reduced case,
+    # isolated buses get the flat voltage
+    v = np.zeros(data.Nbus, dtype=complex)
+    v[reduction["bus"]] = vm * np.exp(1j * va)
+    for i, j, ratio in reversed(
+        list(
+            zip(
+                reduction["stub_bus"], reduction["stub_parent"], reduction["stub_ratio"]
+            )
+        )
+    ):
+        v[i] = ratio * v[j] if j >= 0 else np.clip(1.0, data.vmin[i], data.vmax[i])
+    return np.abs(v), np.angle(v)
+
+
+def expand_solution(data, reduction, solution):
+    # solution of the reduced case as vm, va, pg, qg in the original
+    # indexing, the generators are the same and the arc flows follow from
+    # the voltages
+    vm, va = expand_voltages(data, reduction, solution["vm"], solution["va"])
+    p, q = branch_flows(data, vm, va)
+    return dict(vm=vm, va=va, pg=solution["pg"], qg=solution["qg"], p=p, q=q)
+
+
+def bus_mismatch(data, solution):
+    # largest violation of the bus balances of the case
+    vm, gen_bus = solution["vm"], data.gen_bus
+    p_balance = (
+        data.bus_pd
+        + data.bus_gs * vm**2
+        + np.bincount(data.arc_bus, solution["p"], data.Nbus)
+        - np.bincount(gen_bus, solution["pg"], data.Nbus)
+    )
+    q_balance = (
+        data.bus_qd
+        - data.bus_bs * vm**2
+        + np.bincount(data.arc_bus, solution["q"], data.Nbus)
+        - np.bincount(gen_bus, solution["qg"], data.Nbus)
+    )
+    return max(np.max(np.abs(p_balance)), np.max(np.abs(q_balance)))
+
+
+def main():
+    # size of the reduced cases, and the power flow of a reduced case mapped
+    # back to the original one, which has to balance every original bus
+    parser = argparse.ArgumentParser()
+    parser.add_argument("cases", nargs="+")
+    args = parser.parse_args()
+
+    for case in args.cases:
+        data = load_case(case)
+        t0 = time.perf_counter()
+        reduced, reduction = reduce_network(data)
+        t1 = time.perf_counter()
+        sizes = reduction_sizes(data, reduced, reduction)
+        print(
+            f"{case}: buses {sizes['buses'][0]} -> {sizes['buses'][1]}, "
+            f"branches {sizes['branches'][0]} -> {sizes['branches'][1]}, "
+            f"{sizes['tightened_arcs']} tightened arc bounds in {t1 - t0:.3f}s"
+        )
+        vm, va, pg, qg, converged = power_flow(reduced)
+        if converged:
+            solution = dict(vm=vm, va=va, pg=pg, qg=qg)
+            mismatch = bus_mismatch(data, expand_solution(data, reduction, solution))
+            print(f"  power flow mapped back, largest bus mismatch {mismatch:.2e}")
+
+
+if __name__ == "__main__":
+    main()
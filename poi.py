@@ -1,14 +1,28 @@
 import pyoptinterface as poi
-from pyoptinterface import ipopt, nlfunc
+from pyoptinterface import ipopt, nlfunc, ScalarAffineFunction, ScalarQuadraticFunction
 
 sin = nlfunc.sin
 cos = nlfunc.cos
 
+import numpy as np
 
-from pathlib import Path
-import json
-import time
+from itertools import repeat
+import argparse
 import math
+import time
+
+from case_data import incidence_csr, load_case
+from ipopt_log import exit_message
+from jit_cache import compile_functions_cached
+from network_reduction import (
+    bus_mismatch,
+    expand_solution,
+    reduce_network,
+    reduction_sizes,
+)
+from poi_compat import check_model, compile_functions_c, compile_functions_llvm
+from power_flow import ac_start, current_coefficients, power_flow_start
+from timing import SETUP_PHASES, PhaseTimer, traced_allocations, write_record
 
 libipopt_path = r"D:\Ipopt\bin\ipopt-3.dll"
 
@@ -16,112 +30,204 @@ ipopt.load_library(libipopt_path)
 
 
 def get_ipopt_model(jit):
-    model = ipopt.Model(jit=jit)
+    # "C-cached" compiles the C code of PyOptInterface with an external
+    # compiler into a shared library cached on disk, see jit_cache.py
+    model = ipopt.Model(jit="C" if jit == "C-cached" else jit)
+    model.jit_engine = jit
     model.set_raw_parameter("print_level", 5)
     model.set_raw_parameter("hsllib", "libhsl.dll")
     model.set_raw_parameter("linear_solver", "ma27")
     model.set_raw_parameter("print_timing_statistics", "yes")
     model.set_raw_parameter("max_iter", 200)
 
-    return model
+    return check_model(model)
+
+
+def branch_flow_polar(vars, params):
+    p_from, p_to = vars.p_from, vars.p_to
+    q_from, q_to = vars.q_from, vars.q_to
+    vm_from, vm_to = vars.vm_from, vars.vm_to
+    va_from, va_to = vars.va_from, vars.va_to
+    c1, c2, c3, c4, c5, c6, c7, c8 = (
+        params.c1,
+        params.c2,
+        params.c3,
+        params.c4,
+        params.c5,
+        params.c6,
+        params.c7,
+        params.c8,
+    )
+
+    va_delta = va_from - va_to
+    sin_ft = sin(va_delta)
+    cos_ft = cos(va_delta)
+    sin_tf = -sin_ft
+    cos_tf = cos_ft
+
+    pij = (
+        p_from
+        - c5 * vm_from * vm_from
+        - c3 * vm_from * vm_to * cos_ft
+        - c4 * vm_from * vm_to * sin_ft
+    )
+    qij = (
+        q_from
+        + c6 * vm_from * vm_from
+        + c4 * vm_from * vm_to * cos_ft
+        - c3 * vm_from * vm_to * sin_ft
+    )
+    pji = (
+        p_to
+        - c7 * vm_to * vm_to
+        - c1 * vm_from * vm_to * cos_tf
+        - c2 * vm_from * vm_to * sin_tf
+    )
+    qji = (
+        q_to
+        + c8 * vm_to * vm_to
+        + c2 * vm_from * vm_to * cos_tf
+        - c1 * vm_from * vm_to * sin_tf
+    )
+
+    return [pij, qij, pji, qji]
+
+
+def branch_flow_rectangular(vars, params):
+    p_fr, p_to = vars.p_from, vars.p_to
+    q_fr, q_to = vars.q_from, vars.q_to
+    vr_fr, vr_to = vars.vr_from, vars.vr_to
+    vi_fr, vi_to = vars.vi_from, vars.vi_to
+    c1, c2, c3, c4, c5, c6, c7, c8 = (
+        params.c1,
+        params.c2,
+        params.c3,
+        params.c4,
+        params.c5,
+        params.c6,
+        params.c7,
+        params.c8,
+    )
+
+    vfr_sq = vr_fr * vr_fr + vi_fr * vi_fr
+    vto_sq = vr_to * vr_to + vi_to * vi_to
+    re_vfr_vto = vr_fr * vr_to + vi_fr * vi_to
+    im_vfr_vto = vi_fr * vr_to - vr_fr * vi_to
+    re_vto_vfr = re_vfr_vto
+    im_vto_vfr = -im_vfr_vto
+
+    pij = p_fr - c5 * vfr_sq - c3 * re_vfr_vto - c4 * im_vfr_vto
+    qij = q_fr + c6 * vfr_sq + c4 * re_vfr_vto - c3 * im_vfr_vto
+    pji = p_to - c7 * vto_sq - c1 * re_vto_vfr - c2 * im_vto_vfr
+    qji = q_to + c8 * vto_sq + c2 * re_vto_vfr - c1 * im_vto_vfr
+
+    return [pij, qij, pji, qji]
+
+
+def branch_angle_rectangular(vars):
+    vr_fr, vr_to = vars.vr_from, vars.vr_to
+    vi_fr, vi_to = vars.vi_from, vars.vi_to
+
+    re_vfr_vto = vr_fr * vr_to + vi_fr * vi_to
+    im_vfr_vto = vi_fr * vr_to - vr_fr * vi_to
+
+    angdiff = im_vfr_vto / re_vfr_vto
+
+    return [angdiff]
+
+
+def branch_product_polar(vars):
+    # wr, wi of a branch as the real and imaginary part of V_f conj(V_t)
+    vm_from, vm_to = vars.vm_from, vars.vm_to
+    va_from, va_to = vars.va_from, vars.va_to
+
+    va_delta = va_from - va_to
+
+    # vm_from * vm_to is written out in both results, the traced function
+    # evaluated wrong values when they shared the product
+    wr = vars.wr - vm_from * vm_to * cos(va_delta)
+    wi = vars.wi - vm_from * vm_to * sin(va_delta)
+
+    return [wr, wi]
 
 
-def solve_opf(model, data):
-    Nbus = len(data["bus"])
+def arc_power_iv(vars, params):
+    # |V|^2 |I|^2 = p^2 + q^2 of an arc, its current is I = k_s I_s + k_v V
+    vr, vi = vars.vr, vars.vi
+    csr, csi = vars.csr, vars.csi
+    ksr, ksi, kvr, kvi = params.ksr, params.ksi, params.kvr, params.kvi
+
+    cr = ksr * csr - ksi * csi + kvr * vr - kvi * vi
+    ci = ksi * csr + ksr * csi + kvi * vr + kvr * vi
+
+    return [(vr * vr + vi * vi) * (cr * cr + ci * ci)]
+
+
+def build_opf(model, data, timer=None):
+    if timer is None:
+        timer = PhaseTimer()
+    timer.mark()
+
+    Nbus = data.Nbus
     va = [model.add_variable() for _ in range(Nbus)]
 
-    vmin = data["vmin"]
-    vmax = data["vmax"]
+    vmin = data.vmin.tolist()
+    vmax = data.vmax.tolist()
     vm = [model.add_variable(lb=vmin[i], ub=vmax[i], start=1.0) for i in range(Nbus)]
 
-    Ngen = len(data["gen"])
-    pmin = data["pmin"]
-    pmax = data["pmax"]
+    Ngen = data.Ngen
+    pmin = data.pmin.tolist()
+    pmax = data.pmax.tolist()
     pg = [model.add_variable(lb=pmin[i], ub=pmax[i]) for i in range(Ngen)]
-    qmin = data["qmin"]
-    qmax = data["qmax"]
+    qmin = data.qmin.tolist()
+    qmax = data.qmax.tolist()
     qg = [model.add_variable(lb=qmin[i], ub=qmax[i]) for i in range(Ngen)]
 
-    Narc = len(data["arc"])
-    rate_a = data["rate_a"]
+    Narc = data.Narc
+    rate_a = data.rate_a.tolist()
     p = [model.add_variable(lb=-rate_a[i], ub=rate_a[i]) for i in range(Narc)]
     q = [model.add_variable(lb=-rate_a[i], ub=rate_a[i]) for i in range(Narc)]
+    timer.lap("variables")
 
-    for g in data["gen"]:
+    for i, (cost1, cost2, cost3) in enumerate(
+        zip(data.gen_cost1.tolist(), data.gen_cost2.tolist(), data.gen_cost3.tolist())
+    ):
         expr = poi.ExprBuilder()
-        v = pg[g["i"] - 1]
-        expr += g["cost1"] * v * v + g["cost2"] * v + g["cost3"]
+        v = pg[i]
+        expr += cost1 * v * v + cost2 * v + cost3
         model.add_objective(expr)
+    timer.lap("objective")
 
-    for i in data["ref_buses"]:
-        model.add_linear_constraint(1.0 * va[i - 1], poi.Eq, 0.0)
-
-    def branch_flow(vars, params):
-        p_from, p_to = vars.p_from, vars.p_to
-        q_from, q_to = vars.q_from, vars.q_to
-        vm_from, vm_to = vars.vm_from, vars.vm_to
-        va_from, va_to = vars.va_from, vars.va_to
-        c1, c2, c3, c4, c5, c6, c7, c8 = (
-            params.c1,
-            params.c2,
-            params.c3,
-            params.c4,
-            params.c5,
-            params.c6,
-            params.c7,
-            params.c8,
-        )
-
-        va_delta = va_from - va_to
-        sin_ft = sin(va_delta)
-        cos_ft = cos(va_delta)
-        sin_tf = -sin_ft
-        cos_tf = cos_ft
-
-        pij = (
-            p_from
-            - c5 * vm_from * vm_from
-            - c3 * vm_from * vm_to * cos_ft
-            - c4 * vm_from * vm_to * sin_ft
-        )
-        qij = (
-            q_from
-            + c6 * vm_from * vm_from
-            + c4 * vm_from * vm_to * cos_ft
-            - c3 * vm_from * vm_to * sin_ft
-        )
-        pji = (
-            p_to
-            - c7 * vm_to * vm_to
-            - c1 * vm_from * vm_to * cos_tf
-            - c2 * vm_from * vm_to * sin_tf
-        )
-        qji = (
-            q_to
-            + c8 * vm_to * vm_to
-            + c2 * vm_from * vm_to * cos_tf
-            - c1 * vm_from * vm_to * sin_tf
-        )
-
-        return [pij, qij, pji, qji]
+    for i in data.ref_buses.tolist():
+        model.add_linear_constraint(1.0 * va[i], poi.Eq, 0.0)
+    timer.lap("reference")
 
     branch_flow_f = model.register_function(
-        branch_flow,
+        branch_flow_polar,
         name="flow",
     )
+    timer.lap("register")
+
+    Nbranch = data.Nbranch
+    branch_f_idx = data.branch_f_idx.tolist()
+    branch_t_idx = data.branch_t_idx.tolist()
+    branch_f_bus = data.branch_f_bus.tolist()
+    branch_t_bus = data.branch_t_bus.tolist()
+    branch_rate_a_sq = data.branch_rate_a_sq.tolist()
 
     branch_parameters = []
-    for b in data["branch"]:
+    coefficients = [c.tolist() for c in data.branch_coefficients()]
+    for cs in zip(*coefficients):
         d = nlfunc.Params()
-        for i in range(1, 9):
-            setattr(d, f"c{i}", b[f"c{i}"])
+        for i, c in enumerate(cs, 1):
+            setattr(d, f"c{i}", c)
         branch_parameters.append(d)
 
-    for b, bp in zip(data["branch"], branch_parameters):
-        f_idx = b["f_idx"] - 1
-        t_idx = b["t_idx"] - 1
-        f_bus = b["f_bus"] - 1
-        t_bus = b["t_bus"] - 1
+    for k, bp in enumerate(branch_parameters):
+        f_idx = branch_f_idx[k]
+        t_idx = branch_t_idx[k]
+        f_bus = branch_f_bus[k]
+        t_bus = branch_t_bus[k]
         vars = nlfunc.Vars(
             p_from=p[f_idx],
             q_from=q[f_idx],
@@ -135,15 +241,16 @@ def solve_opf(model, data):
         con = model.add_nl_constraint(
             branch_flow_f, vars=vars, params=bp, eq=[0.0, 0.0, 0.0, 0.0]
         )
+    timer.lap("flow")
 
-    angmin = data["angmin"]
-    angmax = data["angmax"]
-    for i, b in enumerate(data["branch"]):
-        f_idx = b["f_idx"] - 1
-        t_idx = b["t_idx"] - 1
-        f_bus = b["f_bus"] - 1
-        t_bus = b["t_bus"] - 1
-        rate_a_sq = b["rate_a_sq"]
+    angmin = data.angmin.tolist()
+    angmax = data.angmax.tolist()
+    for i in range(Nbranch):
+        f_idx = branch_f_idx[i]
+        t_idx = branch_t_idx[i]
+        f_bus = branch_f_bus[i]
+        t_bus = branch_t_bus[i]
+        rate_a_sq = branch_rate_a_sq[i]
         model.add_linear_constraint(va[f_bus] - va[t_bus], poi.In, angmin[i], angmax[i])
         model.add_quadratic_constraint(
             p[f_idx] * p[f_idx] + q[f_idx] * q[f_idx], poi.Leq, rate_a_sq
@@ -151,113 +258,104 @@ def solve_opf(model, data):
         model.add_quadratic_constraint(
             p[t_idx] * p[t_idx] + q[t_idx] * q[t_idx], poi.Leq, rate_a_sq
         )
+    timer.lap("branch_limits")
 
     # bus balance constraint
-    p_balance_expr = [poi.ExprBuilder() for _ in range(Nbus)]
-    q_balance_expr = [poi.ExprBuilder() for _ in range(Nbus)]
-    for i, b in enumerate(data["bus"]):
-        p_balance_expr[i] += b["pd"] + b["gs"] * vm[i] * vm[i]
-        q_balance_expr[i] += b["qd"] - b["bs"] * vm[i] * vm[i]
-    for a in data["arc"]:
-        bus = a["bus"] - 1
-        i = a["i"] - 1
-        p_balance_expr[bus] += p[i]
-        q_balance_expr[bus] += q[i]
-    for g in data["gen"]:
-        bus = g["bus"] - 1
-        i = g["i"] - 1
-        p_balance_expr[bus] -= pg[i]
-        q_balance_expr[bus] -= qg[i]
-
+    bus_pd = data.bus_pd.tolist()
+    bus_qd = data.bus_qd.tolist()
+    bus_gs = data.bus_gs.tolist()
+    bus_bs = data.bus_bs.tolist()
+    bus_arcs = data.bus_arc_slices()
+    bus_gens = data.bus_gen_slices()
     for i in range(Nbus):
-        model.add_quadratic_constraint(p_balance_expr[i], poi.Eq, 0.0)
-        model.add_quadratic_constraint(q_balance_expr[i], poi.Eq, 0.0)
+        p_balance_expr = poi.ExprBuilder()
+        q_balance_expr = poi.ExprBuilder()
+        p_balance_expr += bus_pd[i] + bus_gs[i] * vm[i] * vm[i]
+        q_balance_expr += bus_qd[i] - bus_bs[i] * vm[i] * vm[i]
+        for a in bus_arcs[i]:
+            p_balance_expr += p[a]
+            q_balance_expr += q[a]
+        for g in bus_gens[i]:
+            p_balance_expr -= pg[g]
+            q_balance_expr -= qg[g]
+        model.add_quadratic_constraint(p_balance_expr, poi.Eq, 0.0)
+        model.add_quadratic_constraint(q_balance_expr, poi.Eq, 0.0)
+    timer.lap("balance")
+
+    return dict(va=va, vm=vm, pg=pg, qg=qg, p=p, q=q)
 
-    model.optimize()
 
+def build_opf_rectangular(model, data, timer=None):
+    if timer is None:
+        timer = PhaseTimer()
+    timer.mark()
 
-def solve_opf_rectangular(model, data):
-    Nbus = len(data["bus"])
+    Nbus = data.Nbus
 
-    vmin = data["vmin"]
-    vmax = data["vmax"]
+    vmin = data.vmin.tolist()
+    vmax = data.vmax.tolist()
     vr = [model.add_variable(lb=-vmax[i], ub=vmax[i], start=1.0) for i in range(Nbus)]
     vi = [model.add_variable(lb=-vmax[i], ub=vmax[i], start=0.0) for i in range(Nbus)]
 
-    Ngen = len(data["gen"])
-    pmin = data["pmin"]
-    pmax = data["pmax"]
+    Ngen = data.Ngen
+    pmin = data.pmin.tolist()
+    pmax = data.pmax.tolist()
     pg = [model.add_variable(lb=pmin[i], ub=pmax[i]) for i in range(Ngen)]
-    qmin = data["qmin"]
-    qmax = data["qmax"]
+    qmin = data.qmin.tolist()
+    qmax = data.qmax.tolist()
     qg = [model.add_variable(lb=qmin[i], ub=qmax[i]) for i in range(Ngen)]
 
-    Narc = len(data["arc"])
-    rate_a = data["rate_a"]
+    Narc = data.Narc
+    rate_a = data.rate_a.tolist()
     p = [model.add_variable(lb=-rate_a[i], ub=rate_a[i]) for i in range(Narc)]
     q = [model.add_variable(lb=-rate_a[i], ub=rate_a[i]) for i in range(Narc)]
+    timer.lap("variables")
 
-    for g in data["gen"]:
+    for i, (cost1, cost2, cost3) in enumerate(
+        zip(data.gen_cost1.tolist(), data.gen_cost2.tolist(), data.gen_cost3.tolist())
+    ):
         expr = poi.ExprBuilder()
-        v = pg[g["i"] - 1]
-        expr += g["cost1"] * v * v + g["cost2"] * v + g["cost3"]
+        v = pg[i]
+        expr += cost1 * v * v + cost2 * v + cost3
         model.add_objective(expr)
+    timer.lap("objective")
 
-    for i in data["ref_buses"]:
-        model.add_linear_constraint(1.0 * vi[i - 1], poi.Eq, 0.0)
+    for i in data.ref_buses.tolist():
+        model.add_linear_constraint(1.0 * vi[i], poi.Eq, 0.0)
+    timer.lap("reference")
 
-    for i, b in enumerate(data["bus"]):
+    for i in range(Nbus):
         model.add_quadratic_constraint(
             vr[i] * vr[i] + vi[i] * vi[i], poi.In, vmin[i] * vmin[i], vmax[i] * vmax[i]
         )
-
-    def branch_flow(vars, params):
-        p_fr, p_to = vars.p_from, vars.p_to
-        q_fr, q_to = vars.q_from, vars.q_to
-        vr_fr, vr_to = vars.vr_from, vars.vr_to
-        vi_fr, vi_to = vars.vi_from, vars.vi_to
-        c1, c2, c3, c4, c5, c6, c7, c8 = (
-            params.c1,
-            params.c2,
-            params.c3,
-            params.c4,
-            params.c5,
-            params.c6,
-            params.c7,
-            params.c8,
-        )
-
-        vfr_sq = vr_fr * vr_fr + vi_fr * vi_fr
-        vto_sq = vr_to * vr_to + vi_to * vi_to
-        re_vfr_vto = vr_fr * vr_to + vi_fr * vi_to
-        im_vfr_vto = vi_fr * vr_to - vr_fr * vi_to
-        re_vto_vfr = re_vfr_vto
-        im_vto_vfr = -im_vfr_vto
-
-        pij = p_fr - c5 * vfr_sq - c3 * re_vfr_vto - c4 * im_vfr_vto
-        qij = q_fr + c6 * vfr_sq + c4 * re_vfr_vto - c3 * im_vfr_vto
-        pji = p_to - c7 * vto_sq - c1 * re_vto_vfr - c2 * im_vto_vfr
-        qji = q_to + c8 * vto_sq + c2 * re_vto_vfr - c1 * im_vto_vfr
-
-        return [pij, qij, pji, qji]
+    timer.lap("voltage")
 
     branch_flow_f = model.register_function(
-        branch_flow,
+        branch_flow_rectangular,
         name="flow",
     )
+    timer.lap("register")
+
+    Nbranch = data.Nbranch
+    branch_f_idx = data.branch_f_idx.tolist()
+    branch_t_idx = data.branch_t_idx.tolist()
+    branch_f_bus = data.branch_f_bus.tolist()
+    branch_t_bus = data.branch_t_bus.tolist()
+    branch_rate_a_sq = data.branch_rate_a_sq.tolist()
 
     branch_parameters = []
-    for k, b in enumerate(data["branch"]):
+    coefficients = [c.tolist() for c in data.branch_coefficients()]
+    for cs in zip(*coefficients):
         d = nlfunc.Params()
-        for i in range(1, 9):
-            setattr(d, f"c{i}", b[f"c{i}"])
+        for i, c in enumerate(cs, 1):
+            setattr(d, f"c{i}", c)
         branch_parameters.append(d)
 
-    for b, bp in zip(data["branch"], branch_parameters):
-        f_idx = b["f_idx"] - 1
-        t_idx = b["t_idx"] - 1
-        f_bus = b["f_bus"] - 1
-        t_bus = b["t_bus"] - 1
+    for k, bp in enumerate(branch_parameters):
+        f_idx = branch_f_idx[k]
+        t_idx = branch_t_idx[k]
+        f_bus = branch_f_bus[k]
+        t_bus = branch_t_bus[k]
         vars = [
             p[f_idx],
             q[f_idx],
@@ -281,29 +379,18 @@ def solve_opf_rectangular(model, data):
         con = model.add_nl_constraint(
             branch_flow_f, vars=vars, params=bp, eq=[0.0, 0.0, 0.0, 0.0]
         )
-
-    def branch_angle(vars):
-        vr_fr, vr_to = vars.vr_from, vars.vr_to
-        vi_fr, vi_to = vars.vi_from, vars.vi_to
-
-        re_vfr_vto = vr_fr * vr_to + vi_fr * vi_to
-        im_vfr_vto = vi_fr * vr_to - vr_fr * vi_to
-
-        angdiff = im_vfr_vto / re_vfr_vto
-
-        return [angdiff]
+    timer.lap("flow")
 
     branch_angle_f = model.register_function(
-        branch_angle,
+        branch_angle_rectangular,
         name="angle",
     )
-    angmin = data["angmin"]
-    angmax = data["angmax"]
-    for i, b in enumerate(data["branch"]):
-        f_idx = b["f_idx"] - 1
-        t_idx = b["t_idx"] - 1
-        f_bus = b["f_bus"] - 1
-        t_bus = b["t_bus"] - 1
+    timer.lap("register")
+    angmin = data.angmin.tolist()
+    angmax = data.angmax.tolist()
+    for i in range(Nbranch):
+        f_bus = branch_f_bus[i]
+        t_bus = branch_t_bus[i]
         vars = nlfunc.Vars(
             vr_from=vr[f_bus],
             vr_to=vr[t_bus],
@@ -317,69 +404,1123 @@ def solve_opf_rectangular(model, data):
             ub=[math.tan(angmax[i])],
         )
 
-    for i, b in enumerate(data["branch"]):
-        f_idx = b["f_idx"] - 1
-        t_idx = b["t_idx"] - 1
-        f_bus = b["f_bus"] - 1
-        t_bus = b["t_bus"] - 1
-        rate_a_sq = b["rate_a_sq"]
+    for i in range(Nbranch):
+        f_idx = branch_f_idx[i]
+        t_idx = branch_t_idx[i]
+        f_bus = branch_f_bus[i]
+        t_bus = branch_t_bus[i]
+        rate_a_sq = branch_rate_a_sq[i]
         model.add_quadratic_constraint(
             p[f_idx] * p[f_idx] + q[f_idx] * q[f_idx], poi.Leq, rate_a_sq
         )
         model.add_quadratic_constraint(
             p[t_idx] * p[t_idx] + q[t_idx] * q[t_idx], poi.Leq, rate_a_sq
         )
+    timer.lap("branch_limits")
 
     # bus balance constraint
-    p_balance_expr = [poi.ExprBuilder() for _ in range(Nbus)]
-    q_balance_expr = [poi.ExprBuilder() for _ in range(Nbus)]
-    for i, b in enumerate(data["bus"]):
-        p_balance_expr[i] += b["pd"] + b["gs"] * (vr[i] * vr[i] + vi[i] * vi[i])
-        q_balance_expr[i] += b["qd"] - b["bs"] * (vr[i] * vr[i] + vi[i] * vi[i])
-    for a in data["arc"]:
-        bus = a["bus"] - 1
-        i = a["i"] - 1
-        p_balance_expr[bus] += p[i]
-        q_balance_expr[bus] += q[i]
-    for g in data["gen"]:
-        bus = g["bus"] - 1
-        i = g["i"] - 1
-        p_balance_expr[bus] -= pg[i]
-        q_balance_expr[bus] -= qg[i]
+    bus_pd = data.bus_pd.tolist()
+    bus_qd = data.bus_qd.tolist()
+    bus_gs = data.bus_gs.tolist()
+    bus_bs = data.bus_bs.tolist()
+    bus_arcs = data.bus_arc_slices()
+    bus_gens = data.bus_gen_slices()
+    for i in range(Nbus):
+        p_balance_expr = poi.ExprBuilder()
+        q_balance_expr = poi.ExprBuilder()
+        p_balance_expr += bus_pd[i] + bus_gs[i] * (vr[i] * vr[i] + vi[i] * vi[i])
+        q_balance_expr += bus_qd[i] - bus_bs[i] * (vr[i] * vr[i] + vi[i] * vi[i])
+        for a in bus_arcs[i]:
+            p_balance_expr += p[a]
+            q_balance_expr += q[a]
+        for g in bus_gens[i]:
+            p_balance_expr -= pg[g]
+            q_balance_expr -= qg[g]
+        model.add_quadratic_constraint(p_balance_expr, poi.Eq, 0.0)
+        model.add_quadratic_constraint(q_balance_expr, poi.Eq, 0.0)
+    timer.lap("balance")
 
+    return dict(vr=vr, vi=vi, pg=pg, qg=qg, p=p, q=q)
+
+
+def add_variable_block(model, lb, ub, start=0.0):
+    if not isinstance(start, list):
+        start = [start] * len(lb)
+    return list(map(model.add_variable, lb, ub, start))
+
+
+def add_load_block(model, data):
+    # bus demands as fixed variables, their bounds are updated per scenario
+    pd = data.bus_pd.tolist()
+    qd = data.bus_qd.tolist()
+    return add_variable_block(model, pd, pd, pd), add_variable_block(model, qd, qd, qd)
+
+
+def variable_indices(variables):
+    return [v.index for v in variables]
+
+
+def add_square_sum_block(model, xs, ys, sense, lb, ub=None):
+    # x[k] * x[k] + y[k] * y[k] for every k, xs/ys are variable indices
+    ones = [1.0, 1.0]
+    functions = [ScalarQuadraticFunction(ones, [x, y], [x, y]) for x, y in zip(xs, ys)]
+    if ub is None:
+        return list(map(model.add_quadratic_constraint, functions, repeat(sense), lb))
+    return list(map(model.add_quadratic_constraint, functions, repeat(sense), lb, ub))
+
+
+def add_nl_constraint_block(
+    model, function_index, vars, params, eq=None, lb=None, ub=None
+):
+    # vars/params map every name of the registered function to one column,
+    # the results equal eq or lie within the rows of lb and ub
+    tracing_result = model.function_tracing_results[function_index]
+    var_columns = [vars[name] for name in tracing_result.variable_names]
+    param_columns = [params[name] for name in tracing_result.parameter_names]
+    n_params = len(param_columns)
+
+    param_values = (
+        np.column_stack(param_columns).ravel().tolist() if n_params > 0 else []
+    )
+    param_indices = list(map(model.add_parameter, param_values))
+
+    if eq is not None:
+        add = model._add_nl_constraint_eq
+        bounds = repeat([eq])
+    else:
+        add = model._add_nl_constraint_bounds
+        bounds = zip(lb, ub)
+    constraints = []
+    for k, (var_values, bound) in enumerate(zip(zip(*var_columns), bounds)):
+        constraints.append(
+            add(
+                function_index,
+                list(var_values),
+                param_indices[k * n_params : (k + 1) * n_params],
+                *bound,
+            )
+        )
+    return constraints
+
+
+def objective_function(pg, cost1, cost2, cost3):
+    pg = variable_indices(pg)
+    affine = ScalarAffineFunction(cost2.tolist(), pg, float(cost3.sum()))
+    objective = ScalarQuadraticFunction(cost1.tolist(), pg, pg, affine)
+    return poi.ExprBuilder(objective)
+
+
+def add_objective_block(model, pg, data):
+    model.add_objective(
+        objective_function(pg, data.gen_cost1, data.gen_cost2, data.gen_cost3)
+    )
+
+
+def add_balance_block(model, data, shunt_vars, p, q, pg, qg, loads=None):
+    # shunt_vars are the variables whose squares sum to vm^2 at each bus,
+    # loads are optional (pd, qd) variables replacing the constant demand
+    p = np.asarray(variable_indices(p))
+    q = np.asarray(variable_indices(q))
+    pg = np.asarray(variable_indices(pg))
+    qg = np.asarray(variable_indices(qg))
+    shunt_vars = [variable_indices(v) for v in shunt_vars]
+    n_shunt = len(shunt_vars)
+
+    bus_arc_ptr = data.bus_arc_ptr.tolist()
+    bus_gen_ptr = data.bus_gen_ptr.tolist()
+    # variables of each bus balance, arcs first and generators second
+    p_vars = np.concatenate([p[data.bus_arcs], pg[data.bus_gens]])
+    q_vars = np.concatenate([q[data.bus_arcs], qg[data.bus_gens]])
+    gen_offset = data.Narc
+    coefs = [1.0] * data.Narc + [-1.0] * data.Ngen
+    p_vars = p_vars.tolist()
+    q_vars = q_vars.tolist()
+
+    bus_pd = data.bus_pd.tolist()
+    bus_qd = data.bus_qd.tolist()
+    bus_gs = data.bus_gs.tolist()
+    bus_bs = data.bus_bs.tolist()
+    if loads is not None:
+        pd_vars, qd_vars = [variable_indices(v) for v in loads]
+    else:
+        pd_vars = qd_vars = [None] * data.Nbus
+    for i in range(data.Nbus):
+        a0, a1 = bus_arc_ptr[i], bus_arc_ptr[i + 1]
+        g0, g1 = gen_offset + bus_gen_ptr[i], gen_offset + bus_gen_ptr[i + 1]
+        shunt = [v[i] for v in shunt_vars]
+        for vars, shunt_coef, constant, load in [
+            (p_vars, bus_gs[i], bus_pd[i], pd_vars[i]),
+            (q_vars, -bus_bs[i], bus_qd[i], qd_vars[i]),
+        ]:
+            affine_coefs = coefs[a0:a1] + coefs[g0:g1]
+            affine_vars = vars[a0:a1] + vars[g0:g1]
+            if load is not None:
+                affine_coefs.append(1.0)
+                affine_vars.append(load)
+                constant = 0.0
+            affine = ScalarAffineFunction(affine_coefs, affine_vars, constant)
+            function = ScalarQuadraticFunction(
+                [shunt_coef] * n_shunt, shunt, shunt, affine
+            )
+            model.add_quadratic_constraint(function, poi.Eq, 0.0)
+
+
+def branch_flow_columns(data, p, q, v1, v2, names):
+    # columns of the branch flow function arguments, v1/v2 are the two
+    # voltage variables (vm/va or vr/vi) with their names in `names`
+    f_idx, t_idx = data.branch_f_idx, data.branch_t_idx
+    f_bus, t_bus = data.branch_f_bus, data.branch_t_bus
+    p = np.array(p, dtype=object)
+    q = np.array(q, dtype=object)
+    v1 = np.array(v1, dtype=object)
+    v2 = np.array(v2, dtype=object)
+    vars = {
+        "p_from": p[f_idx],
+        "q_from": q[f_idx],
+        "p_to": p[t_idx],
+        "q_to": q[t_idx],
+        f"{names[0]}_from": v1[f_bus],
+        f"{names[0]}_to": v1[t_bus],
+        f"{names[1]}_from": v2[f_bus],
+        f"{names[1]}_to": v2[t_bus],
+    }
+    vars = {k: v.tolist() for k, v in vars.items()}
+    params = {f"c{i}": c for i, c in enumerate(data.branch_coefficients(), 1)}
+    return vars, params
+
+
+def add_thermal_limit_block(model, data, p, q):
+    p_idx = variable_indices(p)
+    q_idx = variable_indices(q)
+    # interleave from and to arcs to keep the per-branch constraint order
+    arcs = np.column_stack([data.branch_f_idx, data.branch_t_idx]).ravel()
+    rate_a_sq = np.repeat(data.branch_rate_a_sq, 2).tolist()
+    xs = np.asarray(p_idx)[arcs].tolist()
+    ys = np.asarray(q_idx)[arcs].tolist()
+    add_square_sum_block(model, xs, ys, poi.Leq, rate_a_sq)
+
+
+def add_angle_limit_block(model, function_index, data, vr, vi):
+    # tan(angmin) <= im / re <= tan(angmax) of V_f conj(V_t) of every branch,
+    # function_index is the registered branch_angle_rectangular
+    vr = np.array(vr, dtype=object)
+    vi = np.array(vi, dtype=object)
+    f_bus, t_bus = data.branch_f_bus, data.branch_t_bus
+    vars = {
+        "vr_from": vr[f_bus].tolist(),
+        "vr_to": vr[t_bus].tolist(),
+        "vi_from": vi[f_bus].tolist(),
+        "vi_to": vi[t_bus].tolist(),
+    }
+    lb = np.tan(data.angmin)[:, None].tolist()
+    ub = np.tan(data.angmax)[:, None].tolist()
+    add_nl_constraint_block(model, function_index, vars, {}, lb=lb, ub=ub)
+
+
+def build_opf_batched(model, data, timer=None, parametric=False):
+    if timer is None:
+        timer = PhaseTimer()
+    timer.mark()
+
+    Nbus = data.Nbus
+    va = add_variable_block(model, [-math.inf] * Nbus, [math.inf] * Nbus)
+    vm = add_variable_block(model, data.vmin.tolist(), data.vmax.tolist(), 1.0)
+    pg = add_variable_block(model, data.pmin.tolist(), data.pmax.tolist())
+    qg = add_variable_block(model, data.qmin.tolist(), data.qmax.tolist())
+    rate_a = data.rate_a.tolist()
+    neg_rate_a = (-data.rate_a).tolist()
+    p = add_variable_block(model, neg_rate_a, rate_a)
+    q = add_variable_block(model, neg_rate_a, rate_a)
+    loads = add_load_block(model, data) if parametric else None
+    timer.lap("variables")
+
+    add_objective_block(model, pg, data)
+    timer.lap("objective")
+
+    for i in data.ref_buses.tolist():
+        model.add_linear_constraint(va[i], poi.Eq, 0.0)
+    timer.lap("reference")
+
+    branch_flow_f = model.register_function(branch_flow_polar, name="flow")
+    timer.lap("register")
+    vars, params = branch_flow_columns(data, p, q, vm, va, ["vm", "va"])
+    add_nl_constraint_block(model, branch_flow_f, vars, params, [0.0] * 4)
+    timer.lap("flow")
+
+    va_idx = np.asarray(variable_indices(va))
+    angle_functions = [
+        ScalarAffineFunction([1.0, -1.0], [f, t])
+        for f, t in zip(
+            va_idx[data.branch_f_bus].tolist(), va_idx[data.branch_t_bus].tolist()
+        )
+    ]
+    list(
+        map(
+            model.add_linear_constraint,
+            angle_functions,
+            repeat(poi.In),
+            data.angmin.tolist(),
+            data.angmax.tolist(),
+        )
+    )
+    add_thermal_limit_block(model, data, p, q)
+    timer.lap("branch_limits")
+
+    add_balance_block(model, data, [vm], p, q, pg, qg, loads)
+    timer.lap("balance")
+
+    return dict(va=va, vm=vm, pg=pg, qg=qg, p=p, q=q, loads=loads)
+
+
+def build_opf_rectangular_batched(model, data, timer=None, parametric=False):
+    if timer is None:
+        timer = PhaseTimer()
+    timer.mark()
+
+    vmax = data.vmax.tolist()
+    neg_vmax = (-data.vmax).tolist()
+    vr = add_variable_block(model, neg_vmax, vmax, 1.0)
+    vi = add_variable_block(model, neg_vmax, vmax, 0.0)
+    pg = add_variable_block(model, data.pmin.tolist(), data.pmax.tolist())
+    qg = add_variable_block(model, data.qmin.tolist(), data.qmax.tolist())
+    rate_a = data.rate_a.tolist()
+    neg_rate_a = (-data.rate_a).tolist()
+    p = add_variable_block(model, neg_rate_a, rate_a)
+    q = add_variable_block(model, neg_rate_a, rate_a)
+    loads = add_load_block(model, data) if parametric else None
+    timer.lap("variables")
+
+    add_objective_block(model, pg, data)
+    timer.lap("objective")
+
+    for i in data.ref_buses.tolist():
+        model.add_linear_constraint(vi[i], poi.Eq, 0.0)
+    timer.lap("reference")
+
+    add_square_sum_block(
+        model,
+        variable_indices(vr),
+        variable_indices(vi),
+        poi.In,
+        (data.vmin**2).tolist(),
+        (data.vmax**2).tolist(),
+    )
+    timer.lap("voltage")
+
+    branch_flow_f = model.register_function(branch_flow_rectangular, name="flow")
+    timer.lap("register")
+    vars, params = branch_flow_columns(data, p, q, vr, vi, ["vr", "vi"])
+    add_nl_constraint_block(model, branch_flow_f, vars, params, [0.0] * 4)
+    timer.lap("flow")
+
+    branch_angle_f = model.register_function(branch_angle_rectangular, name="angle")
+    timer.lap("register")
+    add_angle_limit_block(model, branch_angle_f, data, vr, vi)
+    add_thermal_limit_block(model, data, p, q)
+    timer.lap("branch_limits")
+
+    add_balance_block(model, data, [vr, vi], p, q, pg, qg, loads)
+    timer.lap("balance")
+
+    return dict(vr=vr, vi=vi, pg=pg, qg=qg, p=p, q=q, loads=loads)
+
+
+def add_quadratic_rows(model, coefs, rows, cols, affine_coefs, affine_vars, sense, lb):
+    # one quadratic constraint per row of the (n, k) arrays of monomial
+    # coefficients and variable pairs and the (n, m) arrays of affine terms
+    affine = map(
+        ScalarAffineFunction, affine_coefs.tolist(), affine_vars.tolist(), repeat(0.0)
+    )
+    functions = map(
+        ScalarQuadraticFunction, coefs.tolist(), rows.tolist(), cols.tolist(), affine
+    )
+    return list(map(model.add_quadratic_constraint, functions, repeat(sense), lb))
+
+
+def build_opf_rect_qcqp(model, data, timer=None, parametric=False):
+    # the rectangular model with the branch flows and angle limits written as
+    # quadratic constraints, it has no registered functions to JIT compile
+    if timer is None:
+        timer = PhaseTimer()
+    timer.mark()
+
+    vmax = data.vmax.tolist()
+    neg_vmax = (-data.vmax).tolist()
+    vr = add_variable_block(model, neg_vmax, vmax, 1.0)
+    vi = add_variable_block(model, neg_vmax, vmax, 0.0)
+    pg = add_variable_block(model, data.pmin.tolist(), data.pmax.tolist())
+    qg = add_variable_block(model, data.qmin.tolist(), data.qmax.tolist())
+    rate_a = data.rate_a.tolist()
+    neg_rate_a = (-data.rate_a).tolist()
+    p = add_variable_block(model, neg_rate_a, rate_a)
+    q = add_variable_block(model, neg_rate_a, rate_a)
+    loads = add_load_block(model, data) if parametric else None
+    timer.lap("variables")
+
+    add_objective_block(model, pg, data)
+    timer.lap("objective")
+
+    for i in data.ref_buses.tolist():
+        model.add_linear_constraint(vi[i], poi.Eq, 0.0)
+    timer.lap("reference")
+
+    add_square_sum_block(
+        model,
+        variable_indices(vr),
+        variable_indices(vi),
+        poi.In,
+        (data.vmin**2).tolist(),
+        (data.vmax**2).tolist(),
+    )
+    timer.lap("voltage")
+
+    vr_idx = np.asarray(variable_indices(vr))
+    vi_idx = np.asarray(variable_indices(vi))
+    p_idx = np.asarray(variable_indices(p))
+    q_idx = np.asarray(variable_indices(q))
+    vr_fr, vr_to = vr_idx[data.branch_f_bus], vr_idx[data.branch_t_bus]
+    vi_fr, vi_to = vi_idx[data.branch_f_bus], vi_idx[data.branch_t_bus]
+    c1, c2, c3, c4, c5, c6, c7, c8 = data.branch_coefficients()
+    ones = np.ones((data.Nbranch, 1))
+
+    # monomials of the flows: the squared magnitude of the arc's own bus,
+    # vr_fr * vr_to + vi_fr * vi_to, vi_fr * vr_to and vr_fr * vi_to
+    cross_rows = [vr_fr, vi_fr, vi_fr, vr_fr]
+    cross_cols = [vr_to, vi_to, vr_to, vi_to]
+    for arc, bus_r, bus_i, sq, re, im, vars in [
+        (data.branch_f_idx, vr_fr, vi_fr, -c5, -c3, -c4, p_idx),
+        (data.branch_f_idx, vr_fr, vi_fr, c6, c4, -c3, q_idx),
+        (data.branch_t_idx, vr_to, vi_to, -c7, -c1, c2, p_idx),
+        (data.branch_t_idx, vr_to, vi_to, c8, c2, c1, q_idx),
+    ]:
+        coefs = np.column_stack([sq, sq, re, re, im, -im])
+        rows = np.column_stack([bus_r, bus_i] + cross_rows)
+        cols = np.column_stack([bus_r, bus_i] + cross_cols)
+        affine_vars = vars[arc][:, None]
+        add_quadratic_rows(
+            model, coefs, rows, cols, ones, affine_vars, poi.Eq, [0.0] * data.Nbranch
+        )
+    timer.lap("flow")
+
+    # tan(angmin) <= im / re <= tan(angmax) as im - tan(angmax) * re <= 0 and
+    # im - tan(angmin) * re >= 0, re > 0 within the angle limits
+    no_affine = np.empty((data.Nbranch, 0))
+    for tan, sense in [(np.tan(data.angmax), poi.Leq), (np.tan(data.angmin), poi.Geq)]:
+        coefs = np.column_stack([-tan, -tan, ones[:, 0], -ones[:, 0]])
+        rows = np.column_stack(cross_rows)
+        cols = np.column_stack(cross_cols)
+        add_quadratic_rows(
+            model, coefs, rows, cols, no_affine, no_affine, sense, [0.0] * data.Nbranch
+        )
+    add_thermal_limit_block(model, data, p, q)
+    timer.lap("branch_limits")
+
+    add_balance_block(model, data, [vr, vi], p, q, pg, qg, loads)
+    timer.lap("balance")
+
+    return dict(vr=vr, vi=vi, pg=pg, qg=qg, p=p, q=q, loads=loads)
+
+
+def build_opf_polar_aux(model, data, timer=None, parametric=False):
+    # the polar model with the voltage products wr, wi of every branch as
+    # variables, defined once by a registered function, so that the flows are
+    # linear in them and quadratic constraints
+    if timer is None:
+        timer = PhaseTimer()
+    timer.mark()
+
+    Nbus, Nbranch = data.Nbus, data.Nbranch
+    va = add_variable_block(model, [-math.inf] * Nbus, [math.inf] * Nbus)
+    vm = add_variable_block(model, data.vmin.tolist(), data.vmax.tolist(), 1.0)
+    pg = add_variable_block(model, data.pmin.tolist(), data.pmax.tolist())
+    qg = add_variable_block(model, data.qmin.tolist(), data.qmax.tolist())
+    rate_a = data.rate_a.tolist()
+    neg_rate_a = (-data.rate_a).tolist()
+    p = add_variable_block(model, neg_rate_a, rate_a)
+    q = add_variable_block(model, neg_rate_a, rate_a)
+    w_max = data.vmax[data.branch_f_bus] * data.vmax[data.branch_t_bus]
+    wr = add_variable_block(model, (-w_max).tolist(), w_max.tolist(), 1.0)
+    wi = add_variable_block(model, (-w_max).tolist(), w_max.tolist(), 0.0)
+    loads = add_load_block(model, data) if parametric else None
+    timer.lap("variables")
+
+    add_objective_block(model, pg, data)
+    timer.lap("objective")
+
+    for i in data.ref_buses.tolist():
+        model.add_linear_constraint(va[i], poi.Eq, 0.0)
+    timer.lap("reference")
+
+    branch_product_f = model.register_function(branch_product_polar, name="product")
+    timer.lap("register")
+    vm_obj = np.array(vm, dtype=object)
+    va_obj = np.array(va, dtype=object)
+    f_bus, t_bus = data.branch_f_bus, data.branch_t_bus
+    vars = {
+        "vm_from": vm_obj[f_bus].tolist(),
+        "vm_to": vm_obj[t_bus].tolist(),
+        "va_from": va_obj[f_bus].tolist(),
+        "va_to": va_obj[t_bus].tolist(),
+        "wr": wr,
+        "wi": wi,
+    }
+    add_nl_constraint_block(model, branch_product_f, vars, {}, [0.0] * 2)
+
+    # p and q of both arcs minus their vm^2 term, linear in wr, wi
+    vm_idx = np.asarray(variable_indices(vm))
+    p_idx = np.asarray(variable_indices(p))
+    q_idx = np.asarray(variable_indices(q))
+    wr_idx = np.asarray(variable_indices(wr))
+    wi_idx = np.asarray(variable_indices(wi))
+    c1, c2, c3, c4, c5, c6, c7, c8 = data.branch_coefficients()
+    ones = np.ones(Nbranch)
+    for arc, bus, sq, re, im, arc_vars in [
+        (data.branch_f_idx, f_bus, -c5, -c3, -c4, p_idx),
+        (data.branch_f_idx, f_bus, c6, c4, -c3, q_idx),
+        (data.branch_t_idx, t_bus, -c7, -c1, c2, p_idx),
+        (data.branch_t_idx, t_bus, c8, c2, c1, q_idx),
+    ]:
+        bus_vm = vm_idx[bus][:, None]
+        add_quadratic_rows(
+            model,
+            sq[:, None],
+            bus_vm,
+            bus_vm,
+            np.column_stack([ones, re, im]),
+            np.column_stack([arc_vars[arc], wr_idx, wi_idx]),
+            poi.Eq,
+            [0.0] * Nbranch,
+        )
+    timer.lap("flow")
+
+    va_idx = np.asarray(variable_indices(va))
+    rows = zip(
+        repeat([1.0, -1.0]),
+        np.column_stack([va_idx[f_bus], va_idx[t_bus]]).tolist(),
+        repeat(0.0),
+    )
+    affine_rows(model, rows, poi.In, data.angmin.tolist(), data.angmax.tolist())
+    add_thermal_limit_block(model, data, p, q)
+    timer.lap("branch_limits")
+
+    add_balance_block(model, data, [vm], p, q, pg, qg, loads)
+    timer.lap("balance")
+
+    return dict(va=va, vm=vm, pg=pg, qg=qg, p=p, q=q, wr=wr, wi=wi, loads=loads)
+
+
+def grouped_rows(n, rows, vars, coefs):
+    # n affine rows from (row, variable index, coefficient) terms, terms with
+    # a zero coefficient are dropped
+    keep = coefs != 0
+    ptr, order = incidence_csr(rows[keep], n)
+    ptr = ptr.tolist()
+    vars = vars[keep][order].tolist()
+    coefs = coefs[keep][order].tolist()
+    return [
+        (coefs[ptr[i] : ptr[i + 1]], vars[ptr[i] : ptr[i + 1]], 0.0) for i in range(n)
+    ]
+
+
+def build_opf_iv(model, data, timer=None, parametric=False):
+    # current-voltage model: rectangular voltages, the series current of every
+    # branch and the net current injection of every bus as variables, linear
+    # current balances and the bus power balances as quadratic constraints
+    if timer is None:
+        timer = PhaseTimer()
+    timer.mark()
+
+    Nbus, Nbranch = data.Nbus, data.Nbranch
+    vmax = data.vmax.tolist()
+    neg_vmax = (-data.vmax).tolist()
+    vr = add_variable_block(model, neg_vmax, vmax, 1.0)
+    vi = add_variable_block(model, neg_vmax, vmax, 0.0)
+    pg = add_variable_block(model, data.pmin.tolist(), data.pmax.tolist())
+    qg = add_variable_block(model, data.qmin.tolist(), data.qmax.tolist())
+    free = [-math.inf] * Nbranch, [math.inf] * Nbranch
+    csr = add_variable_block(model, *free)
+    csi = add_variable_block(model, *free)
+    free = [-math.inf] * Nbus, [math.inf] * Nbus
+    ir = add_variable_block(model, *free)
+    ii = add_variable_block(model, *free)
+    loads = add_load_block(model, data) if parametric else None
+    timer.lap("variables")
+
+    add_objective_block(model, pg, data)
+    timer.lap("objective")
+
+    for i in data.ref_buses.tolist():
+        model.add_linear_constraint(vi[i], poi.Eq, 0.0)
+    timer.lap("reference")
+
+    add_square_sum_block(
+        model,
+        variable_indices(vr),
+        variable_indices(vi),
+        poi.In,
+        (data.vmin**2).tolist(),
+        (data.vmax**2).tolist(),
+    )
+    timer.lap("voltage")
+
+    vr_idx = np.asarray(variable_indices(vr))
+    vi_idx = np.asarray(variable_indices(vi))
+    csr_idx = np.asarray(variable_indices(csr))
+    csi_idx = np.asarray(variable_indices(csi))
+    ir_idx = np.asarray(variable_indices(ir))
+    ii_idx = np.asarray(variable_indices(ii))
+    f_bus, t_bus = data.branch_f_bus, data.branch_t_bus
+    s_f, s_t, k_f, y_f, y_t, y_bus = current_coefficients(data)
+
+    # I_s - s_f V_f - s_t V_t = 0, real and imaginary part
+    v_vars = np.column_stack(
+        [vr_idx[f_bus], vi_idx[f_bus], vr_idx[t_bus], vi_idx[t_bus]]
+    )
+    for cs, coefs in [
+        (csr_idx, [-s_f.real, s_f.imag, -s_t.real, s_t.imag]),
+        (csi_idx, [-s_f.imag, -s_f.real, -s_t.imag, -s_t.real]),
+    ]:
+        ones = np.ones(Nbranch)
+        rows = zip(
+            np.column_stack([ones] + coefs).tolist(),
+            np.column_stack([cs, v_vars]).tolist(),
+            repeat(0.0),
+        )
+        affine_rows(model, rows, poi.Eq, [0.0] * Nbranch)
+    timer.lap("flow")
+
+    # the arc currents k_f I_s + y_f V_f and -I_s + y_t V_t of every bus plus
+    # its shunt current equal its injection, y_bus holds the y_f and y_t
+    buses = np.arange(Nbus)
+    rows = np.concatenate([f_bus, f_bus, t_bus, buses, buses, buses])
+    ones = np.ones(Nbus)
+    for coefs, vars in [
+        (
+            [k_f.real, -k_f.imag, -np.ones(Nbranch), y_bus.real, -y_bus.imag, -ones],
+            [csr_idx, csi_idx, csr_idx, vr_idx, vi_idx, ir_idx],
+        ),
+        (
+            [k_f.imag, k_f.real, -np.ones(Nbranch), y_bus.imag, y_bus.real, -ones],
+            [csr_idx, csi_idx, csi_idx, vr_idx, vi_idx, ii_idx],
+        ),
+    ]:
+        current_rows = grouped_rows(
+            Nbus, rows, np.concatenate(vars), np.concatenate(coefs)
+        )
+        affine_rows(model, current_rows, poi.Eq, [0.0] * Nbus)
+
+    # V conj(I) of every bus is its generation minus its load
+    pg_idx = np.asarray(variable_indices(pg))[data.bus_gens].tolist()
+    qg_idx = np.asarray(variable_indices(qg))[data.bus_gens].tolist()
+    bus_gen_ptr = data.bus_gen_ptr.tolist()
+    bus_pd = data.bus_pd.tolist()
+    bus_qd = data.bus_qd.tolist()
+    if loads is not None:
+        pd_vars, qd_vars = [variable_indices(v) for v in loads]
+    else:
+        pd_vars = qd_vars = [None] * Nbus
+    vr_idx, vi_idx = vr_idx.tolist(), vi_idx.tolist()
+    ir_idx, ii_idx = ir_idx.tolist(), ii_idx.tolist()
     for i in range(Nbus):
-        model.add_quadratic_constraint(p_balance_expr[i], poi.Eq, 0.0)
-        model.add_quadratic_constraint(q_balance_expr[i], poi.Eq, 0.0)
+        g0, g1 = bus_gen_ptr[i], bus_gen_ptr[i + 1]
+        v, c = [vr_idx[i], vi_idx[i]], [ir_idx[i], ii_idx[i]]
+        for coefs, cols, gen_vars, constant, load in [
+            ([1.0, 1.0], c, pg_idx[g0:g1], bus_pd[i], pd_vars[i]),
+            ([-1.0, 1.0], c[::-1], qg_idx[g0:g1], bus_qd[i], qd_vars[i]),
+        ]:
+            affine_coefs = [-1.0] * (g1 - g0)
+            affine_vars = list(gen_vars)
+            if load is not None:
+                affine_coefs.append(1.0)
+                affine_vars.append(load)
+                constant = 0.0
+            affine = ScalarAffineFunction(affine_coefs, affine_vars, constant)
+            function = ScalarQuadraticFunction(coefs, v, cols, affine)
+            model.add_quadratic_constraint(function, poi.Eq, 0.0)
+    timer.lap("balance")
+
+    branch_angle_f = model.register_function(branch_angle_rectangular, name="angle")
+    arc_power_f = model.register_function(arc_power_iv, name="arc_power")
+    timer.lap("register")
+    add_angle_limit_block(model, branch_angle_f, data, vr, vi)
+
+    # p^2 + q^2 <= rate_a^2 as |V|^2 |I|^2 of both arcs of every branch
+    arcs = np.column_stack([data.branch_f_idx, data.branch_t_idx]).ravel()
+    arc_bus = data.arc_bus[arcs]
+    arc_branch = data.arc_branch[arcs]
+    k_s = np.column_stack([k_f, -np.ones(Nbranch)]).ravel()
+    k_v = np.column_stack([y_f, y_t]).ravel()
+    vr_obj = np.array(vr, dtype=object)
+    vi_obj = np.array(vi, dtype=object)
+    csr_obj = np.array(csr, dtype=object)
+    csi_obj = np.array(csi, dtype=object)
+    vars = {
+        "vr": vr_obj[arc_bus].tolist(),
+        "vi": vi_obj[arc_bus].tolist(),
+        "csr": csr_obj[arc_branch].tolist(),
+        "csi": csi_obj[arc_branch].tolist(),
+    }
+    params = {"ksr": k_s.real, "ksi": k_s.imag, "kvr": k_v.real, "kvi": k_v.imag}
+    rate_a_sq = np.repeat(data.branch_rate_a_sq, 2)
+    lb = [[-math.inf]] * len(arcs)
+    add_nl_constraint_block(
+        model, arc_power_f, vars, params, lb=lb, ub=rate_a_sq[:, None].tolist()
+    )
+    timer.lap("branch_limits")
+
+    return dict(vr=vr, vi=vi, pg=pg, qg=qg, csr=csr, csi=csi, ir=ir, ii=ii, loads=loads)
+
+
+def affine_rows(model, rows, sense, lb, ub=None):
+    # one linear constraint per row of (coefficients, variable indices, constant)
+    functions = [ScalarAffineFunction(c, v, constant) for c, v, constant in rows]
+    if ub is None:
+        return list(map(model.add_linear_constraint, functions, repeat(sense), lb))
+    return list(map(model.add_linear_constraint, functions, repeat(sense), lb, ub))
+
+
+def bus_balance_rows(
+    data, arc_vars, arc_coefs, gen_vars, loads, shunt_coefs, shunt=None
+):
+    # sum of arc_coefs * arc flows minus the generation at every bus plus the
+    # load and shunt_coefs * shunt, or the constant shunt_coefs for vm = 1
+    arc_vars = np.asarray(arc_vars)[data.bus_arcs].tolist()
+    arc_coefs = np.asarray(arc_coefs, dtype=np.float64)[data.bus_arcs].tolist()
+    gen_vars = np.asarray(gen_vars)[data.bus_gens].tolist()
+    bus_arc_ptr = data.bus_arc_ptr.tolist()
+    bus_gen_ptr = data.bus_gen_ptr.tolist()
+    loads = loads.tolist()
+    shunt_coefs = shunt_coefs.tolist()
+    rows = []
+    for i in range(data.Nbus):
+        a0, a1 = bus_arc_ptr[i], bus_arc_ptr[i + 1]
+        g0, g1 = bus_gen_ptr[i], bus_gen_ptr[i + 1]
+        coefs = arc_coefs[a0:a1] + [-1.0] * (g1 - g0)
+        vars = arc_vars[a0:a1] + gen_vars[g0:g1]
+        constant = loads[i]
+        if shunt is None:
+            constant += shunt_coefs[i]
+        else:
+            coefs.append(shunt_coefs[i])
+            vars.append(shunt[i])
+        rows.append((coefs, vars, constant))
+    return rows
+
+
+def build_dc_opf(model, data, timer=None):
+    # lossless linearized OPF with voltage magnitudes fixed at 1, a QP
+    if timer is None:
+        timer = PhaseTimer()
+    timer.mark()
+
+    Nbus, Nbranch = data.Nbus, data.Nbranch
+    va = add_variable_block(model, [-math.inf] * Nbus, [math.inf] * Nbus)
+    pg = add_variable_block(model, data.pmin.tolist(), data.pmax.tolist())
+    rate_a = data.rate_a[data.branch_f_idx]
+    pf = add_variable_block(model, (-rate_a).tolist(), rate_a.tolist())
+    timer.lap("variables")
+
+    add_objective_block(model, pg, data)
+    for i in data.ref_buses.tolist():
+        model.add_linear_constraint(va[i], poi.Eq, 0.0)
+
+    va_idx = np.asarray(variable_indices(va))
+    pf_idx = variable_indices(pf)
+    va_f = va_idx[data.branch_f_bus].tolist()
+    va_t = va_idx[data.branch_t_bus].tolist()
+    b = data.branch_b.tolist()
+    # pf = -b (va_f - va_t)
+    rows = [
+        ([1.0, b[k], -b[k]], [pf_idx[k], va_f[k], va_t[k]], 0.0) for k in range(Nbranch)
+    ]
+    affine_rows(model, rows, poi.Eq, [0.0] * Nbranch)
+    rows = [([1.0, -1.0], [va_f[k], va_t[k]], 0.0) for k in range(Nbranch)]
+    affine_rows(model, rows, poi.In, data.angmin.tolist(), data.angmax.tolist())
 
+    # the to arc carries -pf
+    arc_vars = np.empty(data.Narc, dtype=np.int64)
+    arc_vars[data.branch_f_idx] = pf_idx
+    arc_vars[data.branch_t_idx] = pf_idx
+    arc_coefs = np.empty(data.Narc)
+    arc_coefs[data.branch_f_idx] = 1.0
+    arc_coefs[data.branch_t_idx] = -1.0
+    rows = bus_balance_rows(
+        data, arc_vars, arc_coefs, variable_indices(pg), data.bus_pd, data.bus_gs
+    )
+    affine_rows(model, rows, poi.Eq, [0.0] * Nbus)
+    timer.lap("constraints")
+
+    return dict(va=va, pg=pg, pf=pf)
+
+
+def build_soc_opf(model, data, timer=None):
+    # second-order cone relaxation of the AC OPF in the variables
+    # w = vm^2, wr = vm_f vm_t cos(va_f - va_t) and wi = vm_f vm_t sin(...)
+    if timer is None:
+        timer = PhaseTimer()
+    timer.mark()
+
+    Nbus, Nbranch = data.Nbus, data.Nbranch
+    f_bus, t_bus = data.branch_f_bus, data.branch_t_bus
+    w = add_variable_block(model, (data.vmin**2).tolist(), (data.vmax**2).tolist(), 1.0)
+    w_max = data.vmax[f_bus] * data.vmax[t_bus]
+    wr = add_variable_block(model, [0.0] * Nbranch, w_max.tolist(), 1.0)
+    wi = add_variable_block(model, (-w_max).tolist(), w_max.tolist())
+    pg = add_variable_block(model, data.pmin.tolist(), data.pmax.tolist())
+    qg = add_variable_block(model, data.qmin.tolist(), data.qmax.tolist())
+    rate_a = data.rate_a.tolist()
+    neg_rate_a = (-data.rate_a).tolist()
+    p = add_variable_block(model, neg_rate_a, rate_a)
+    q = add_variable_block(model, neg_rate_a, rate_a)
+    timer.lap("variables")
+
+    add_objective_block(model, pg, data)
+
+    w_idx = np.asarray(variable_indices(w))
+    wr_idx = variable_indices(wr)
+    wi_idx = variable_indices(wi)
+    p_idx = np.asarray(variable_indices(p))
+    q_idx = np.asarray(variable_indices(q))
+    w_f = w_idx[f_bus].tolist()
+    w_t = w_idx[t_bus].tolist()
+    p_f, p_t = p_idx[data.branch_f_idx].tolist(), p_idx[data.branch_t_idx].tolist()
+    q_f, q_t = q_idx[data.branch_f_idx].tolist(), q_idx[data.branch_t_idx].tolist()
+    c1, c2, c3, c4, c5, c6, c7, c8 = [c.tolist() for c in data.branch_coefficients()]
+
+    # the branch flows of the polar model are linear in w, wr and wi
+    rows = []
+    for k in range(Nbranch):
+        v = [w_f[k], w_t[k], wr_idx[k], wi_idx[k]]
+        rows.append(([1.0, -c5[k], -c3[k], -c4[k]], [p_f[k]] + v[0:1] + v[2:], 0.0))
+        rows.append(([1.0, c6[k], c4[k], -c3[k]], [q_f[k]] + v[0:1] + v[2:], 0.0))
+        rows.append(([1.0, -c7[k], -c1[k], c2[k]], [p_t[k]] + v[1:], 0.0))
+        rows.append(([1.0, c8[k], c2[k], c1[k]], [q_t[k]] + v[1:], 0.0))
+    affine_rows(model, rows, poi.Eq, [0.0] * len(rows))
+
+    # wr^2 + wi^2 <= w_f w_t
+    functions = [
+        ScalarQuadraticFunction(
+            [1.0, 1.0, -1.0],
+            [wr_idx[k], wi_idx[k], w_f[k]],
+            [wr_idx[k], wi_idx[k], w_t[k]],
+        )
+        for k in range(Nbranch)
+    ]
+    list(map(model.add_quadratic_constraint, functions, repeat(poi.Leq), repeat(0.0)))
+
+    # tan(angmin) wr <= wi <= tan(angmax) wr
+    tan_min, tan_max = np.tan(data.angmin).tolist(), np.tan(data.angmax).tolist()
+    rows = [([1.0, -tan_max[k]], [wi_idx[k], wr_idx[k]], 0.0) for k in range(Nbranch)]
+    affine_rows(model, rows, poi.Leq, [0.0] * Nbranch)
+    rows = [([1.0, -tan_min[k]], [wi_idx[k], wr_idx[k]], 0.0) for k in range(Nbranch)]
+    affine_rows(model, rows, poi.Geq, [0.0] * Nbranch)
+    add_thermal_limit_block(model, data, p, q)
+
+    w_idx = w_idx.tolist()
+    ones = np.ones(data.Narc)
+    for flows, gens, loads, coefs in [
+        (p_idx, pg, data.bus_pd, data.bus_gs),
+        (q_idx, qg, data.bus_qd, -data.bus_bs),
+    ]:
+        gens = variable_indices(gens)
+        rows = bus_balance_rows(data, flows, ones, gens, loads, coefs, w_idx)
+        affine_rows(model, rows, poi.Eq, [0.0] * Nbus)
+    timer.lap("constraints")
+
+    return dict(w=w, wr=wr, wi=wi, pg=pg, qg=qg, p=p, q=q)
+
+
+def values(model, variables):
+    return np.array(list(map(model.get_value, variables)))
+
+
+def relaxation_start(data, init, jit_engine="LLVM"):
+    # AC starting point from the solution of the DC or SOC relaxation or from
+    # the AC power flow, see power_flow.ac_start
+    if init == "pf":
+        return power_flow_start(data)
+    model = get_ipopt_model(jit_engine)
+    model.set_raw_parameter("print_level", 0)
+    if init == "dc":
+        variables = build_dc_opf(model, data)
+        model.optimize()
+        vm = np.ones(data.Nbus)
+        va = values(model, variables["va"])
+        pg = values(model, variables["pg"])
+        qg = np.clip(0.0, data.qmin, data.qmax)
+    elif init == "soc":
+        variables = build_soc_opf(model, data)
+        model.optimize()
+        # angles recovered from wr, wi along a spanning tree accumulate the
+        # error of the loose cones and start Ipopt further away than flat ones
+        vm = np.sqrt(values(model, variables["w"]))
+        va = np.zeros(data.Nbus)
+        pg = values(model, variables["pg"])
+        qg = values(model, variables["qg"])
+    else:
+        raise ValueError(f"Unknown initialization: {init}")
+    # arc flows consistent with the voltages rather than the relaxed flows
+    return ac_start(data, vm, va, pg, qg)
+
+
+def set_start(model, variables, start):
+    # variables of a polar or rectangular AC model, start from relaxation_start
+    if "vm" in variables:
+        voltages = [("vm", start["vm"]), ("va", start["va"])]
+    else:
+        voltages = [
+            ("vr", start["vm"] * np.cos(start["va"])),
+            ("vi", start["vm"] * np.sin(start["va"])),
+        ]
+    names = ["pg", "qg", "p", "q", "wr", "wi", "csr", "csi", "ir", "ii"]
+    names = [k for k in names if k in variables]
+    for name, value in voltages + [(k, start[k]) for k in names]:
+        list(map(model.set_variable_start, variables[name], value.tolist()))
+
+
+def solution_values(model, variables):
+    # vm, va, pg, qg of the solution of a polar or rectangular AC model
+    if "vm" in variables:
+        vm, va = values(model, variables["vm"]), values(model, variables["va"])
+    else:
+        v = values(model, variables["vr"]) + 1j * values(model, variables["vi"])
+        vm, va = np.abs(v), np.angle(v)
+    pg, qg = values(model, variables["pg"]), values(model, variables["qg"])
+    return dict(vm=vm, va=va, pg=pg, qg=qg)
+
+
+def compile_functions(model):
+    # JIT compile the registered functions, optimize() skips compiled ones
+    if getattr(model, "jit_engine", None) == "C-cached":
+        compile_functions_cached(model)
+    elif model.jit == "C":
+        compile_functions_c(model, model.jit_compiler)
+    elif model.jit == "LLVM":
+        compile_functions_llvm(model, model.jit_compiler)
+
+
+def solve_opf(model, data, timer=None):
+    build_opf(model, data, timer)
     model.optimize()
 
 
-def poi_main(logdir, filename, method, jit_engine="LLVM"):
+def solve_opf_rectangular(model, data, timer=None):
+    build_opf_rectangular(model, data, timer)
+    model.optimize()
+
+
+builders = {
+    ("polar", False): build_opf,
+    ("polar", True): build_opf_batched,
+    ("rect", False): build_opf_rectangular,
+    ("rect", True): build_opf_rectangular_batched,
+    # built from arrays only, the same model on both paths
+    ("rect_qcqp", False): build_opf_rect_qcqp,
+    ("rect_qcqp", True): build_opf_rect_qcqp,
+    ("polar_aux", False): build_opf_polar_aux,
+    ("polar_aux", True): build_opf_polar_aux,
+    ("iv", False): build_opf_iv,
+    ("iv", True): build_opf_iv,
+}
+
+
+class ParametricOPF:
+    # the model and its compiled functions are built once, a scenario only
+    # changes variable bounds, the objective and the starting point
+    def __init__(self, model, data, method="polar", timer=None):
+        self.model = model
+        self.data = data
+        self.variables = builders[method, True](model, data, timer, parametric=True)
+        self.pd, self.qd = self.variables.pop("loads")
+        self.start_variables = [v for vs in self.variables.values() for v in vs]
+        compile_functions(model)
+
+    def update(self, scenario):
+        # scenario maps CaseData names (bus_pd, bus_qd, pmin, pmax, qmin, qmax,
+        # gen_cost1, gen_cost2, gen_cost3) to their new values
+        model = self.model
+        data = self.data.replace(**scenario)
+        for vars, lb, ub in [
+            (self.pd, data.bus_pd, data.bus_pd),
+            (self.qd, data.bus_qd, data.bus_qd),
+            (self.variables["pg"], data.pmin, data.pmax),
+            (self.variables["qg"], data.qmin, data.qmax),
+        ]:
+            list(map(model.set_variable_bounds, vars, lb.tolist(), ub.tolist()))
+        list(map(model.set_variable_start, self.pd, data.bus_pd.tolist()))
+        list(map(model.set_variable_start, self.qd, data.bus_qd.tolist()))
+        if any(k.startswith("gen_cost") for k in scenario):
+            model.set_objective(
+                objective_function(
+                    self.variables["pg"],
+                    data.gen_cost1,
+                    data.gen_cost2,
+                    data.gen_cost3,
+                )
+            )
+        self.data = data
+
+    def solve(self):
+        model = self.model
+        model.optimize()
+        # the next scenario starts from this solution, PyOptInterface has no
+        # API for dual starting values so only the primal point is kept
+        values = list(map(model.get_value, self.start_variables))
+        list(map(model.set_variable_start, self.start_variables, values))
+        return model.get_model_attribute(poi.ModelAttribute.ObjectiveValue)
+
+
+def make_scenarios(data, n, spread=0.1, seed=0):
+    # random bus demands, generator capacities and costs around the base case
+    rng = np.random.default_rng(seed)
+    for _ in range(n):
+        load = rng.uniform(1 - spread, 1 + spread, data.Nbus)
+        cost = rng.uniform(1 - spread, 1 + spread, data.Ngen)
+        capacity = rng.uniform(1 - spread, 1, data.Ngen)
+        yield dict(
+            bus_pd=data.bus_pd * load,
+            bus_qd=data.bus_qd * load,
+            pmax=np.maximum(data.pmin, data.pmax * capacity),
+            gen_cost1=data.gen_cost1 * cost,
+            gen_cost2=data.gen_cost2 * cost,
+        )
+
+
+def scenario_benchmark(filename, method, n, jit_engine="LLVM"):
+    # solves per minute of rebuilding the model for each scenario and of
+    # updating one ParametricOPF model
+    data = load_case(filename)
+    scenarios = list(make_scenarios(data, n))
+
+    def new_model():
+        model = get_ipopt_model(jit_engine)
+        model.set_raw_parameter("print_level", 0)
+        return model
+
+    t0 = time.perf_counter()
+    rebuild = []
+    for scenario in scenarios:
+        model = new_model()
+        builders[method, True](model, data.replace(**scenario))
+        model.optimize()
+        rebuild.append(model.get_model_attribute(poi.ModelAttribute.ObjectiveValue))
+    t1 = time.perf_counter()
+    opf = ParametricOPF(new_model(), data, method)
+    parametric = []
+    for scenario in scenarios:
+        opf.update(scenario)
+        parametric.append(opf.solve())
+    t2 = time.perf_counter()
+
+    difference = np.max(np.abs(np.subtract(rebuild, parametric)) / np.abs(rebuild))
+    print(f"{filename} {method} {n} scenarios")
+    print(f"rebuild    {n / (t1 - t0) * 60:8.1f} solves/min")
+    print(f"parametric {n / (t2 - t1) * 60:8.1f} solves/min")
+    print(f"max relative objective difference {difference:.2e}")
+
+
+def build_benchmark(cases, method, jit_engine="LLVM"):
+    # build time per component of the per-element and the batched path
+    for case in cases:
+        data = load_case(case)
+        for batch in [False, True]:
+            timer = PhaseTimer()
+            builders[method, batch](ipopt.Model(jit=jit_engine), data, timer)
+            phases = " ".join(f"{k}={v:.3f}" for k, v in timer.phases.items())
+            path = "batched" if batch else "element"
+            print(f"{case} {method} {path:<8} total={timer.total():.3f} {phases}")
+
+
+def poi_main(
+    logdir,
+    filename,
+    method,
+    jit_engine="LLVM",
+    batch=False,
+    ipopt_options=None,
+    trace_allocations=False,
+    init="flat",
+    reduce=False,
+):
     # filename = "pglib_opf_case30000_goc"
     # filename = "pglib_opf_case78484_epigrids"
     # filename = "pglib_opf_case10480_goc"
     # filename = "pglib_opf_case19402_goc"
-    model = get_ipopt_model(jit_engine)
-    logpath = str(logdir / f"{filename}_poi_{jit_engine}.log")
-    model.set_raw_parameter("output_file", logpath)
-
-    json_path = Path(__file__).parent / "json" / f"{filename}.json"
-    json_path = json_path.resolve()
-    with open(json_path, "r") as f:
-        data = json.load(f)
+    timer = PhaseTimer(memory=True)
+    with timer.phase("solver_init"):
+        model = get_ipopt_model(jit_engine)
+        # runs from a relaxation or power flow start are reported as poi_dc,
+        # poi_soc or poi_pf, runs on the reduced network as poi_reduced
+        suffix = "" if init == "flat" else f"_{init}"
+        if reduce:
+            suffix += "_reduced"
+        logpath = str(logdir / f"{filename}_poi_{jit_engine}{suffix}.log")
+        model.set_raw_parameter("output_file", logpath)
+        for name, value in (ipopt_options or {}).items():
+            model.set_raw_parameter(name, value)
 
-    t0 = time.time()
-    if method == "polar":
-        solve_opf(model, data)
-    else:
-        solve_opf_rectangular(model, data)
-    t1 = time.time()
+    with timer.phase("load"):
+        data = load_case(filename)
+    original, sizes = data, None
+    if reduce:
+        with timer.phase("reduce"):
+            data, reduction = reduce_network(original)
+        sizes = reduction_sizes(original, data, reduction)
 
-    # with open("jit.c", "w") as f:
-    #     f.write(model.jit_compiler.source_code)
+    timer.mark()
+    with traced_allocations(timer, enabled=trace_allocations):
+        variables = builders[method, batch](model, data, timer)
+    if init != "flat":
+        with timer.phase("power_flow" if init == "pf" else "init"):
+            set_start(model, variables, relaxation_start(data, init, jit_engine))
+    with timer.phase("jit"):
+        compile_functions(model)
+    with timer.phase("optimize"):
+        model.optimize()
+    # PyOptInterface does not report the iterations and the times of Ipopt,
+    # those are read from the log
+    results = dict(
+        status=exit_message(
+            model.get_model_attribute(poi.ModelAttribute.RawStatusString)
+        ),
+        objective=model.get_model_attribute(poi.ModelAttribute.ObjectiveValue),
+    )
 
-    return t1 - t0, logpath
+    # model build, JIT and solve, the Ipopt model is created before the build
+    # like in the baseline; the whole run is recorded as wall_time
+    total_time = timer.total(exclude=SETUP_PHASES + ["solver_init"])
+    if reduce:
+        # the solution mapped back to the original case has to balance it
+        solution = expand_solution(
+            original, reduction, solution_values(model, variables)
+        )
+        sizes["mismatch"] = bus_mismatch(original, solution)
+    write_record(
+        logpath,
+        timer,
+        case=filename,
+        solver=f"poi{suffix}",
+        method=method,
+        jit=jit_engine,
+        batch=batch,
+        init=init,
+        reduction=sizes,
+        ipopt_options=ipopt_options,
+        total_time=total_time,
+        wall_time=timer.total(),
+        **results,
+    )
+    return total_time, logpath
 
 
 if __name__ == "__main__":
-    poi_main("pglib_opf_case5_pjm", "C")
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--method", type=str, default="polar")
+    parser.add_argument("--scenarios", type=int, default=0)
+    parser.add_argument("cases", nargs="+")
+    args = parser.parse_args()
+    if args.scenarios > 0:
+        for case in args.cases:
+            scenario_benchmark(case, args.method, args.scenarios)
+    else:
+        build_benchmark(args.cases, args.method)
@@ -0,0 +1,46 @@
+# Private PyOptInterface internals used by the batched model build and the
+# separate JIT phase of poi.py and by the cached C JIT of jit_cache.py. They
+# are not part of its public API and may change in any release, so the
+# benchmark is pinned to the version below and stops with a clear message
+# when they are missing.
+from importlib.metadata import version
+
+PINNED_VERSION = "0.3.0"
+
+# attributes of an Ipopt model
+MODEL_ATTRIBUTES = [
+    "function_tracing_results",
+    "_add_nl_constraint_eq",
+    "_add_nl_constraint_bounds",
+    "function_indices",
+    "function_names",
+    "function_autodiff_structures",
+    "function_cppad_autodiff_graphs",
+    "_has_function_evaluator",
+    "_set_function_evaluator",
+]
+
+
+def internals_error(names):
+    return ImportError(
+        f"PyOptInterface {version('pyoptinterface')} has no {names}, "
+        f"the benchmark needs pyoptinterface=={PINNED_VERSION}"
+    )
+
+
+try:
+    from pyoptinterface._src.ipopt import compile_functions_c, compile_functions_llvm
+    from pyoptinterface._src.codegen_c import (
+        generate_csrc_from_graph,
+        generate_csrc_prelude,
+    )
+    from pyoptinterface._src.nleval_ext import AutodiffEvaluator
+except ImportError as e:
+    raise internals_error(f"{e.name or 'internal'} ({e})") from e
+
+
+def check_model(model):
+    missing = [name for name in MODEL_ATTRIBUTES if not hasattr(model, name)]
+    if missing:
+        raise internals_error(", ".join(f"Model.{name}" for name in missing))
+    return model
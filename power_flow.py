@@ -0,0 +1,254 @@
+import numpy as np
+import scipy.sparse as sp
+import scipy.sparse.linalg as spla
+
+
+def branch_products(data, vm, va):
+    # real and imaginary part of V_f conj(V_t) of every branch, the wr, wi
+    # variables of the auxiliary polar models
+    f_bus, t_bus = data.branch_f_bus, data.branch_t_bus
+    vm_ft = vm[f_bus] * vm[t_bus]
+    return vm_ft * np.cos(va[f_bus] - va[t_bus]), vm_ft * np.sin(va[f_bus] - va[t_bus])
+
+
+def branch_flows(data, vm, va):
+    # AC power flows (p, q) of every arc for the bus voltages vm, va, the same
+    # expressions as the flow constraints of the polar models
+    c1, c2, c3, c4, c5, c6, c7, c8 = data.branch_coefficients()
+    vfr_sq = vm[data.branch_f_bus] ** 2
+    vto_sq = vm[data.branch_t_bus] ** 2
+    re_vfr_vto, im_vfr_vto = branch_products(data, vm, va)
+
+    p = np.empty(data.Narc)
+    q = np.empty(data.Narc)
+    p[data.branch_f_idx] = c5 * vfr_sq + c3 * re_vfr_vto + c4 * im_vfr_vto
+    q[data.branch_f_idx] = -c6 * vfr_sq - c4 * re_vfr_vto + c3 * im_vfr_vto
+    p[data.branch_t_idx] = c7 * vto_sq + c1 * re_vfr_vto - c2 * im_vfr_vto
+    q[data.branch_t_idx] = -c8 * vto_sq - c2 * re_vfr_vto - c1 * im_vfr_vto
+    return p, q
+
+
+def branch_admittances(data):
+    # y_ff, y_ft, y_tf, y_tt of the branch pi models, the currents into a
+    # branch are y_ff V_f + y_ft V_t and y_tf V_f + y_tt V_t
+    y = data.branch_g + 1j * data.branch_b
+    t = data.branch_tr + 1j * data.branch_ti
+    y_ff = (y + data.branch_g_fr + 1j * data.branch_b_fr) / np.abs(t) ** 2
+    y_ft = -y / np.conj(t)
+    y_tf = -y / t
+    y_tt = y + data.branch_g_to + 1j * data.branch_b_to
+    return y_ff, y_ft, y_tf, y_tt
+
+
+def admittance_matrix(data):
+    # sparse bus admittance matrix of the branch pi models and bus shunts,
+    # its injections V * conj(Y V) match the flow constraints of the models
+    y_ff, y_ft, y_tf, y_tt = branch_admittances(data)
+    f_bus, t_bus = data.branch_f_bus, data.branch_t_bus
+    buses = np.arange(data.Nbus)
+    rows = np.concatenate([f_bus, f_bus, t_bus, t_bus, buses])
+    cols = np.concatenate([f_bus, t_bus, f_bus, t_bus, buses])
+    y_sh = data.bus_gs + 1j * data.bus_bs
+    entries = np.concatenate([y_ff, y_ft, y_tf, y_tt, y_sh])
+    # duplicates of parallel branches are summed by the conversion
+    return sp.coo_matrix((entries, (rows, cols)), shape=(data.Nbus,) * 2).tocsr()
+
+
+def current_coefficients(data):
+    # complex coefficients of the current-voltage models: the series current
+    # I_s = s_f V_f + s_t V_t of every branch, the arc currents
+    # I_f = k_f I_s + y_f V_f and I_t = -I_s + y_t V_t, and the shunt
+    # admittance of every bus together with the shunts of its branches
+    y = data.branch_g + 1j * data.branch_b
+    t = data.branch_tr + 1j * data.branch_ti
+    s_f, s_t = y / t, -y
+    k_f = 1 / np.conj(t)
+    y_f = (data.branch_g_fr + 1j * data.branch_b_fr) / np.abs(t) ** 2
+    y_t = data.branch_g_to + 1j * data.branch_b_to
+    y_bus = data.bus_gs + 1j * data.bus_bs
+    np.add.at(y_bus, data.branch_f_bus, y_f)
+    np.add.at(y_bus, data.branch_t_bus, y_t)
+    return s_f, s_t, k_f, y_f, y_t, y_bus
+
+
+def branch_currents(data, v):
+    # series currents of the branches and net current injections of the buses
+    # for the complex bus voltages v
+    s_f, s_t, _, _, _, _ = current_coefficients(data)
+    i_s = s_f * v[data.branch_f_bus] + s_t * v[data.branch_t_bus]
+    return i_s, admittance_matrix(data) @ v
+
+
+def ac_start(data, vm, va, pg, qg, flows=True):
+    # starting point of every AC formulation from the bus voltages and the
+    # generation. The branch products wr, wi follow from the voltages, and so
+    # do the arc flows p, q and the series and bus injection currents, or
+    # they start at zero without flows
+    wr, wi = branch_products(data, vm, va)
+    if flows:
+        p, q = branch_flows(data, vm, va)
+        i_s, i_bus = branch_currents(data, vm * np.exp(1j * va))
+    else:
+        p, q = np.zeros(data.Narc), np.zeros(data.Narc)
+        i_s, i_bus = np.zeros(data.Nbranch), np.zeros(data.Nbus)
+    return dict(
+        vm=vm,
+        va=va,
+        pg=pg,
+        qg=qg,
+        p=p,
+        q=q,
+        wr=wr,
+        wi=wi,
+        csr=i_s.real,
+        csi=i_s.imag,
+        ir=i_bus.real,
+        ii=i_bus.imag,
+    )
+
+
+def bus_types(data):
+    # reference, PV and PQ bus indices, PV buses need an active generator
+    has_gen = np.diff(data.bus_gen_ptr) > 0
+    ref = np.unique(data.ref_buses)
+    pv = np.flatnonzero((data.bus_type == 2) & has_gen)
+    pv = np.setdiff1d(pv, ref)
+    pq = np.setdiff1d(np.arange(data.Nbus), np.concatenate([ref, pv]))
+    return ref, pv, pq
+
+
+def balanced_dispatch(data, losses=0.0):
+    # generator setpoints within their limits, shifted in proportion to the
+    # headroom so that they cover the demand and the losses; the setpoints of
+    # some cases are far from it and would leave the whole mismatch to the
+    # reference bus
+    pg = np.clip(data.gen_pg, data.pmin, data.pmax)
+    mismatch = np.sum(data.bus_pd) + losses - np.sum(pg)
+    headroom = data.pmax - pg if mismatch > 0 else pg - data.pmin
+    if np.sum(headroom) > 0:
+        pg += np.sign(mismatch) * headroom * min(1.0, abs(mismatch) / np.sum(headroom))
+    return pg
+
+
+def share_limits(total, gen_bus, lb, ub, n):
+    # splits the bus totals over the generators of every bus at the same
+    # fraction of their ranges, within the limits if the total is
+    lb_bus = np.bincount(gen_bus, lb, n)
+    ub_bus = np.bincount(gen_bus, ub, n)
+    width = ub_bus - lb_bus
+    fraction = np.divide(total - lb_bus, width, out=np.zeros(n), where=width > 0)[
+        gen_bus
+    ]
+    count = np.bincount(gen_bus, minlength=n)[gen_bus]
+    equal = (total - lb_bus)[gen_bus] / count
+    return np.where(width[gen_bus] > 0, lb + (ub - lb) * fraction, lb + equal)
+
+
+def newton_raphson(Y, s_bus, v, pv, pq, tol=1e-8, max_iter=20):
+    # solves V * conj(Y V) = s_bus for the angles of the PV and PQ buses and
+    # the magnitudes of the PQ buses, returns v, the number of iterations and
+    # whether the mismatch dropped below tol
+    pvpq = np.concatenate([pv, pq])
+    n_pvpq = len(pvpq)
+
+    def mismatch(v):
+        s = v * np.conj(Y @ v) - s_bus
+        return np.concatenate([s.real[pvpq], s.imag[pq]])
+
+    f = mismatch(v)
+    for iteration in range(max_iter + 1):
+        if not np.all(np.isfinite(f)):
+            break
+        if np.max(np.abs(f), initial=0.0) < tol:
+            return v, iteration, True
+        if iteration == max_iter:
+            break
+        # derivatives of the bus injections as in MATPOWER dSbus_dV
+        i_bus = Y @ v
+        diag_v = sp.diags(v)
+        diag_v_norm = sp.diags(v / np.abs(v))
+        ds_dvm = diag_v @ np.conj(Y @ diag_v_norm) + sp.diags(
+            np.conj(i_bus) * v / np.abs(v)
+        )
+        ds_dva = 1j * diag_v @ np.conj(sp.diags(i_bus) - Y @ diag_v)
+        J = sp.bmat(
+            [
+                [ds_dva[pvpq][:, pvpq].real, ds_dvm[pvpq][:, pq].real],
+                [ds_dva[pq][:, pvpq].imag, ds_dvm[pq][:, pq].imag],
+            ],
+            format="csc",
+        )
+        dx = spla.spsolve(J, -f)
+        va = np.angle(v)
+        vm = np.abs(v)
+        va[pvpq] += dx[:n_pvpq]
+        vm[pq] += dx[n_pvpq:]
+        v = vm * np.exp(1j * va)
+        f = mismatch(v)
+    return v, iteration, False
+
+
+def power_flow(data, max_rounds=10):
+    # AC power flow of the generator setpoints of the case, returns vm, va,
+    # pg, qg and whether it converged. The losses are redistributed over all
+    # generators instead of being left to the reference bus, and PV buses
+    # whose generators hit a reactive limit become PQ buses at that limit
+    n = data.Nbus
+    Y = admittance_matrix(data)
+    ref, pv, pq = bus_types(data)
+    gen_bus = data.gen_bus
+
+    # voltage setpoint of the first generator at every reference and PV bus
+    vm = np.ones(n)
+    regulated = np.concatenate([ref, pv])
+    vm[regulated] = data.gen_vg[data.bus_gens[data.bus_gen_ptr[:-1][regulated]]]
+    v = np.clip(vm, data.vmin, data.vmax).astype(complex)
+
+    at_ref = np.isin(gen_bus, ref)
+    pmin_ref = np.bincount(gen_bus, data.pmin, n)[ref]
+    pmax_ref = np.bincount(gen_bus, data.pmax, n)[ref]
+    qmin_bus = np.bincount(gen_bus, data.qmin, n)
+    qmax_bus = np.bincount(gen_bus, data.qmax, n)
+    q_fixed = np.zeros(n)
+    losses = np.sum(data.bus_gs)
+    for _ in range(max_rounds):
+        pg = balanced_dispatch(data, losses)
+        s_bus = np.bincount(gen_bus, pg, n) - data.bus_pd + 1j * (q_fixed - data.bus_qd)
+        v, _, converged = newton_raphson(Y, s_bus, v, pv, pq)
+        if not converged:
+            return np.abs(v), np.angle(v), pg, None, False
+        s = v * np.conj(Y @ v) + data.bus_pd + 1j * data.bus_qd
+        losses = np.sum(s.real) - np.sum(data.bus_pd)
+        # done once the reference buses generate within their limits and no
+        # PV bus exceeds its reactive limits
+        p_ref = s.real[ref]
+        within = np.all((p_ref >= pmin_ref - 1e-6) & (p_ref <= pmax_ref + 1e-6))
+        violated = pv[(s.imag[pv] < qmin_bus[pv]) | (s.imag[pv] > qmax_bus[pv])]
+        if len(violated) > 0:
+            q_fixed[violated] = np.clip(
+                s.imag[violated], qmin_bus[violated], qmax_bus[violated]
+            )
+            pv = np.setdiff1d(pv, violated)
+            pq = np.union1d(pq, violated)
+        elif within:
+            break
+
+    pg[at_ref] = share_limits(s.real, gen_bus, data.pmin, data.pmax, n)[at_ref]
+    qg = share_limits(s.imag, gen_bus, data.qmin, data.qmax, n)
+    return np.abs(v), np.angle(v), pg, qg, converged
+
+
+def power_flow_start(data):
+    # AC starting point from the power flow of the case setpoints, see
+    # ac_start; the flat start if it does not converge.
+    # The arc flows and currents start at zero: Ipopt took more iterations
+    # from the flows of the power flow voltages, many of them close to their
+    # ratings, and from their currents
+    vm, va, pg, qg, converged = power_flow(data)
+    if not converged:
+        print("power flow did not converge, flat start")
+        vm = np.clip(np.ones(data.Nbus), data.vmin, data.vmax)
+        va = np.zeros(data.Nbus)
+        pg = np.clip(0.0, data.pmin, data.pmax)
+        qg = np.clip(0.0, data.qmin, data.qmax)
+    return ac_start(data, vm, va, pg, qg, flows=False)
@@ -0,0 +1,270 @@
+import pandas as pd
+
+from contextlib import closing
+from pathlib import Path
+import argparse
+import re
+import sqlite3
+
+from ipopt_log import FIELDS as LOG_FIELDS, HEAD_FIELDS, read_log
+from timing import read_record, record_path
+
+root_dir = Path(__file__).parent
+db_path = root_dir / "results.sqlite"
+log_dirs = {
+    "polar": root_dir / "log",
+    "polar_aux": root_dir / "log_polar_aux",
+    "rect": root_dir / "log_rect",
+    "rect_qcqp": root_dir / "log_rect_qcqp",
+    "iv": root_dir / "log_iv",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    log_path TEXT UNIQUE NOT NULL,
+    mtime REAL NOT NULL,
+    case_name TEXT NOT NULL,
+    solver TEXT NOT NULL,
+    method TEXT NOT NULL,
+    jit TEXT,
+    total_time REAL,
+    ipopt_time REAL,
+    ad_time REAL,
+    linear_solver_time REAL,
+    iterations INTEGER,
+    objective REAL,
+    status TEXT,
+    n_variables INTEGER,
+    n_equality INTEGER,
+    n_inequality INTEGER,
+    nnz_jac_equality INTEGER,
+    nnz_jac_inequality INTEGER,
+    nnz_hessian INTEGER
+);
+CREATE TABLE IF NOT EXISTS phases (
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    phase TEXT NOT NULL,
+    seconds REAL NOT NULL,
+    PRIMARY KEY (run_id, phase)
+);
+CREATE TABLE IF NOT EXISTS memory (
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    phase TEXT NOT NULL,
+    peak_rss INTEGER,
+    delta_rss INTEGER,
+    alloc_peak INTEGER,
+    PRIMARY KEY (run_id, phase)
+);
+"""
+
+
+def parse_log_name(path):
+    # log/<case>_<solver>.log, PyOptInterface logs end with _poi_<jit>
+    m = re.match(r"(.*?case\d+_[^_]+)_(.+)$", Path(path).stem)
+    if m is None:
+        return None
+    case, solver = m.groups()
+    jit = None
+    if solver.startswith("poi_"):
+        solver, jit = "poi", solver[len("poi_") :]
+    return case, solver, jit
+
+
+def connect(path=db_path):
+    conn = sqlite3.connect(path, timeout=60)
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.executescript(SCHEMA)
+    # stores created before a log field existed gain its column, and their
+    # runs are parsed again by the next ingest
+    columns = {r[1] for r in conn.execute("PRAGMA table_info(runs)")}
+    missing = [field for field in LOG_FIELDS if field not in columns]
+    with conn:
+        for field in missing:
+            conn.execute(f"ALTER TABLE runs ADD COLUMN {field}")
+        if missing:
+            conn.execute("UPDATE runs SET mtime = -1")
+        # runs without a JIT engine were once stored as the string 'None'
+        conn.execute("UPDATE runs SET jit = NULL WHERE jit = 'None'")
+    return conn
+
+
+def file_mtime(path):
+    mtime = path.stat().st_mtime
+    record = record_path(path)
+    if record.exists():
+        mtime = max(mtime, record.stat().st_mtime)
+    return mtime
+
+
+def ingest_log(conn, path, method):
+    path = Path(path).resolve()
+    name = parse_log_name(path)
+    if name is None:
+        return False
+    mtime = file_mtime(path)
+    row = conn.execute(
+        "SELECT mtime FROM runs WHERE log_path = ?", (str(path),)
+    ).fetchone()
+    if row is not None and row[0] == mtime:
+        return False
+
+    case, solver, jit = name
+    fields = dict.fromkeys(LOG_FIELDS)
+    record = read_record(path)
+    if record is not None:
+        solver, method = record["solver"], record["method"]
+        jit = record.get("jit", jit)
+        jit = None if jit in (None, False) else str(jit)
+        # the results of the solver APIs, the log is parsed for the rest
+        fields.update({k: record[k] for k in LOG_FIELDS if record.get(k) is not None})
+    if any(v is None for v in fields.values()):
+        parsed = read_log(path)
+        fields = {k: parsed[k] if v is None else v for k, v in fields.items()}
+
+    with conn:
+        conn.execute("DELETE FROM runs WHERE log_path = ?", (str(path),))
+        cursor = conn.execute(
+            "INSERT INTO runs (log_path, mtime, case_name, solver, method, jit, "
+            + ", ".join(LOG_FIELDS)
+            + ") VALUES ("
+            + ", ".join(["?"] * (6 + len(LOG_FIELDS)))
+            + ")",
+            [str(path), mtime, case, solver, method, jit]
+            + [fields[k] for k in LOG_FIELDS],
+        )
+        if record is not None:
+            conn.executemany(
+                "INSERT INTO phases (run_id, phase, seconds) VALUES (?, ?, ?)",
+                [(cursor.lastrowid, k, v) for k, v in record["phases"].items()],
+            )
+            memory = record.get("memory", {})
+            alloc_peaks = record.get("alloc_peaks", {})
+            conn.executemany(
+                "INSERT INTO memory (run_id, phase, peak_rss, delta_rss, alloc_peak) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [
+                    (
+                        cursor.lastrowid,
+                        k,
+                        memory.get(k, {}).get("peak_rss"),
+                        memory.get(k, {}).get("delta_rss"),
+                        alloc_peaks.get(k),
+                    )
+                    for k in list(memory) + [k for k in alloc_peaks if k not in memory]
+                ],
+            )
+    return True
+
+
+def ingest(conn, dirs=log_dirs):
+    # only new or modified logs are parsed, rows of removed logs are dropped
+    n = 0
+    seen = set()
+    for method, logdir in dirs.items():
+        for path in sorted(Path(logdir).glob("*.log")):
+            seen.add(str(path.resolve()))
+            n += ingest_log(conn, path, method)
+    stored = [r[0] for r in conn.execute("SELECT log_path FROM runs")]
+    with conn:
+        for path in stored:
+            if path not in seen and not Path(path).exists():
+                conn.execute("DELETE FROM runs WHERE log_path = ?", (path,))
+    return n
+
+
+def runs(conn, method=None):
+    query = 'SELECT case_name AS "case", solver, method, jit, ' + ", ".join(LOG_FIELDS)
+    query += " FROM runs"
+    params = []
+    if method is not None:
+        query += " WHERE method = ?"
+        params.append(method)
+    return pd.read_sql_query(query, conn, params=params)
+
+
+def phases(conn, method=None):
+    query = (
+        'SELECT r.case_name AS "case", r.solver, r.method, r.jit, p.phase, p.seconds '
+        "FROM phases p JOIN runs r ON p.run_id = r.id"
+    )
+    params = []
+    if method is not None:
+        query += " WHERE r.method = ?"
+        params.append(method)
+    return pd.read_sql_query(query, conn, params=params)
+
+
+def memory(conn, method=None):
+    query = (
+        'SELECT r.case_name AS "case", r.solver, r.method, r.jit, m.phase, '
+        "m.peak_rss, m.delta_rss, m.alloc_peak "
+        "FROM memory m JOIN runs r ON m.run_id = r.id"
+    )
+    params = []
+    if method is not None:
+        query += " WHERE r.method = ?"
+        params.append(method)
+    return pd.read_sql_query(query, conn, params=params)
+
+
+def store_run(logpath, method):
+    with closing(connect()) as conn:
+        ingest_log(conn, logpath, method)
+
+
+def load_runs(method=None):
+    # ingest new logs and return the runs as a DataFrame
+    with closing(connect()) as conn:
+        ingest(conn)
+        return runs(conn, method)
+
+
+def solver_column(row):
+    # column label used by the reports, e.g. poi for the LLVM PyOptInterface runs
+    if row["solver"] == "poi" and row["jit"] not in (None, "LLVM"):
+        return f"poi_{row['jit']}"
+    return row["solver"]
+
+
+def run_table(method=None):
+    # {(case, solver column): fields} of the stored runs, missing values are None
+    df = load_runs(method)
+    if len(df) == 0:
+        return {}
+    df["column"] = df.apply(solver_column, axis=1)
+    df = df.astype(object).where(df.notna(), None)
+    table = {}
+    for r in df.to_dict("records"):
+        for k in ["iterations"] + HEAD_FIELDS:
+            if r[k] is not None:
+                r[k] = int(r[k])
+        table[r["case"], r["column"]] = r
+    return table
+
+
+def load_phases(method=None):
+    with closing(connect()) as conn:
+        ingest(conn)
+        return phases(conn, method)
+
+
+def load_memory(method=None):
+    with closing(connect()) as conn:
+        ingest(conn)
+        return memory(conn, method)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", type=str, default=str(db_path))
+    args = parser.parse_args()
+
+    with closing(connect(args.db)) as conn:
+        n = ingest(conn)
+        total = conn.execute("SELECT COUNT(*) FROM runs").fetchone()[0]
+    print(f"ingested {n} new or modified logs, {total} runs in {args.db}")
+
+
+if __name__ == "__main__":
+    main()
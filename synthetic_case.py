@@ -0,0 +1,156 @@
+import numpy as np
+
+from pathlib import Path
+import argparse
+import math
+import re
+
+from matpower import parse_matpower
+
+case_dir = Path(__file__).parent / "case"
+
+# columns of the MATPOWER matrices
+BUS_I, BUS_TYPE = 0, 1
+GEN_BUS = 0
+F_BUS, T_BUS, BR_B, TAP, SHIFT, BR_STATUS = 0, 1, 4, 8, 9, 10
+REF = 3
+PV = 2
+
+
+def tile_grid(n_tiles):
+    # (row, column) of every tile on a near square grid
+    width = math.ceil(math.sqrt(n_tiles))
+    return [divmod(t, width) for t in range(n_tiles)]
+
+
+def tie_lines(mpc, bus_offsets, n_tiles, ties, rng):
+    # `ties` lines between every pair of neighbouring tiles, each one joins a
+    # bus to its own copy in the other tile and takes the series impedance,
+    # rating and angle limits of an in-service branch at that bus, without
+    # charging or transformer. All tiles share the same optimal voltages, so
+    # the ties carry no flow there and the tiled case stays feasible
+    branch = mpc["branch"]
+    branch = branch[branch[:, BR_STATUS] > 0]
+    positions = tile_grid(n_tiles)
+    index = {p: t for t, p in enumerate(positions)}
+    candidates = rng.choice(len(branch), size=(n_tiles, 2, ties))
+
+    lines = []
+    for t, (row, col) in enumerate(positions):
+        for k, neighbour in enumerate([(row, col + 1), (row + 1, col)]):
+            u = index.get(neighbour)
+            if u is None:
+                continue
+            for b in candidates[t, k]:
+                line = branch[b].copy()
+                bus = line[F_BUS]
+                line[F_BUS] = bus + bus_offsets[t]
+                line[T_BUS] = bus + bus_offsets[u]
+                line[BR_B] = 0.0
+                line[TAP] = 0.0
+                line[SHIFT] = 0.0
+                lines.append(line)
+    return np.array(lines).reshape(-1, branch.shape[1])
+
+
+def tile_case(mpc, n_tiles, ties=2, seed=0):
+    # n_tiles copies of the case, only the first one keeps its reference bus
+    rng = np.random.default_rng(seed)
+    bus, gen, branch = mpc["bus"], mpc["gen"], mpc["branch"]
+    offset = 10 ** math.ceil(math.log10(bus[:, BUS_I].max() + 1))
+    bus_offsets = [t * offset for t in range(n_tiles)]
+
+    buses, gens, branches = [], [], []
+    for t, o in enumerate(bus_offsets):
+        b = bus.copy()
+        b[:, BUS_I] += o
+        if t > 0:
+            b[b[:, BUS_TYPE] == REF, BUS_TYPE] = PV
+        buses.append(b)
+        g = gen.copy()
+        g[:, GEN_BUS] += o
+        gens.append(g)
+        br = branch.copy()
+        br[:, [F_BUS, T_BUS]] += o
+        branches.append(br)
+    branches.append(tie_lines(mpc, bus_offsets, n_tiles, ties, rng))
+
+    tiled = dict(mpc)
+    tiled["bus"] = np.vstack(buses)
+    tiled["gen"] = np.vstack(gens)
+    # the reactive cost rows of a case with 2 * ngen rows follow all the
+    # active ones
+    ngen = len(gen)
+    gencost = mpc["gencost"]
+    tiled["gencost"] = np.vstack(
+        [gencost[:ngen]] * n_tiles + [gencost[ngen:]] * n_tiles
+    )
+    tiled["branch"] = np.vstack(branches)
+    return tiled
+
+
+def format_matrix(name, matrix, integer_columns):
+    lines = [f"mpc.{name} = ["]
+    for row in matrix:
+        values = [
+            str(int(v)) if k in integer_columns else repr(float(v))
+            for k, v in enumerate(row)
+        ]
+        lines.append("\t" + "\t".join(values) + ";")
+    lines.append("];")
+    return "\n".join(lines)
+
+
+def write_matpower(path, mpc, name):
+    text = [
+        f"function mpc = {name}",
+        "mpc.version = '2';",
+        f"mpc.baseMVA = {mpc['baseMVA']!r};",
+        "",
+        format_matrix("bus", mpc["bus"], {0, 1, 6, 10}),
+        "",
+        format_matrix("gen", mpc["gen"], {0, 7}),
+        "",
+        format_matrix("gencost", mpc["gencost"], {0, 3}),
+        "",
+        format_matrix("branch", mpc["branch"], {0, 1, 10}),
+        "",
+    ]
+    with open(path, "w") as f:
+        f.write("\n".join(text))
+
+
+def synthetic_name(base, n_buses, n_tiles):
+    # keeps the caseN_<tag> pattern of the PGLib names used by the log parser
+    m = re.search(r"case\d+_([^_]+)", base)
+    tag = m.group(1) if m else "base"
+    return f"synthetic_opf_case{n_buses}_{tag}x{n_tiles}"
+
+
+def generate(base, n_buses, ties=2, seed=0):
+    # tiles case/<base>.m up to at least n_buses buses, writes case/<name>.m
+    mpc = parse_matpower(case_dir / f"{base}.m")
+    n_tiles = max(1, math.ceil(n_buses / mpc["bus"].shape[0]))
+    tiled = tile_case(mpc, n_tiles, ties, seed)
+    name = synthetic_name(base, tiled["bus"].shape[0], n_tiles)
+    write_matpower(case_dir / f"{name}.m", tiled, name)
+    return name
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base", type=str, default="pglib_opf_case1354_pegase")
+    parser.add_argument("--ties", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "buses", type=int, nargs="+", help="e.g. 10000 20000 50000 100000 200000"
+    )
+    args = parser.parse_args()
+
+    for n in args.buses:
+        name = generate(args.base, n, args.ties, args.seed)
+        print(name)
+
+
+if __name__ == "__main__":
+    main()
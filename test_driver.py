@@ -1,41 +1,376 @@
+from case_data import load_case
 from casadi_ import casadi_main
 from poi import poi_main
+from ipopt_log import read_log
+from results_store import store_run
+from timing import (
+    median_record,
+    read_record,
+    record_path,
+    trial_statistics,
+    write_trials,
+)
 
-import json
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import argparse
+import itertools
+import json
+import os
+import queue
+import re
+import subprocess
+import sys
+import time
 
-def main():
-    json_path = Path(__file__).parent / "test_cases.json"
+root_dir = Path(__file__).parent
 
-    with open(json_path, "r") as f:
-        test_cases = json.load(f)
 
-    # select solver method
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--solver", type=str, default="poi")
-    parser.add_argument("--method", type=str, default="polar")
-    args = parser.parse_args()
+# the quadratic-only rectangular model exists in PyOptInterface only
+solver_methods = {
+    "poi": ["polar", "polar_aux", "rect", "rect_qcqp", "iv"],
+    "casadi": ["polar", "polar_aux", "rect", "iv"],
+}
+# the IV model of CasADi has no mapped functions to evaluate on threads
+thread_methods = ["polar", "polar_aux", "rect"]
+
+
+def log_dir(method):
+    if method == "polar":
+        return root_dir / "log"
+    return root_dir / f"log_{method}"
+
+
+def case_size(case):
+    # number of buses in the pglib case name, e.g. pglib_opf_case10000_goc
+    m = re.search(r"case(\d+)", case)
+    return int(m.group(1)) if m else 0
 
-    solver = args.solver
-    method = args.method
-    logdir = Path(__file__).parent / "log"
 
+def run_case(
+    solver,
+    method,
+    case,
+    jit=None,
+    batch=False,
+    warmup=0,
+    repeat=1,
+    max_spread=0.1,
+    threads=None,
+    trace_allocations=False,
+    init="flat",
+    reduce=False,
+):
+    kwargs = {"trace_allocations": trace_allocations, "init": init, "reduce": reduce}
     if solver == "casadi":
         f = casadi_main
+        kwargs["vectorized"] = batch
+        kwargs["codegen"] = jit == "codegen"
+        kwargs["threads"] = threads
     elif solver == "poi":
         f = poi_main
+        kwargs["batch"] = batch
+        if jit is not None:
+            kwargs["jit_engine"] = jit
     else:
         raise ValueError(f"Unknown solver: {solver}")
-    
-    if method == "rect":
-        logdir = Path(__file__).parent / "log_rect"
-
-    for case in test_cases:
-        print(f"Running {case}")
-        total_time, logpath = f(logdir, case, method)
-        with open(logpath, "a") as file:
-            file.write(f"Total time: {total_time}\n")
+
+    print(f"Running {case}")
+    log_dir(method).mkdir(exist_ok=True)
+    samples = []
+    for trial in range(warmup + repeat):
+        total_time, logpath = f(log_dir(method), case, method, **kwargs)
+        # warm-up runs pay the one-time library loading and JIT costs
+        if trial >= warmup:
+            samples.append(read_record(logpath))
+
+    record = samples[-1]
+    if "peak_rss" in record:
+        print(f"peak RSS {record['peak_rss'] / 2**20:.0f} MB")
+    if record["phases"].get("init"):
+        print(f"initialization {record['phases']['init']:.3f}s")
+    if record.get("reduction"):
+        sizes = record["reduction"]
+        print(
+            f"reduced buses {sizes['buses'][0]} -> {sizes['buses'][1]}, "
+            f"branches {sizes['branches'][0]} -> {sizes['branches'][1]}, "
+            f"{sizes['tightened_arcs']} tightened arc bounds, "
+            f"original bus mismatch {sizes['mismatch']:.2e}"
+        )
+    if record["phases"].get("power_flow"):
+        print(f"power flow {record['phases']['power_flow']:.3f}s")
+    for name, peak in record.get("alloc_peaks", {}).items():
+        print(f"peak Python allocations in {name} {peak / 2**20:.0f} MB")
+
+    if warmup + repeat > 1:
+        statistics = trial_statistics(samples, max_spread)
+        write_trials(logpath, samples, statistics)
+        total = statistics["total_time"]
+        print(
+            f"total median {total['median']:.3f}s iqr {total['iqr']:.3f}s "
+            f"min {total['min']:.3f}s over {repeat} trials"
+        )
+        for name, s in statistics.items():
+            if s["unstable"]:
+                print(f"unstable {name}: spread {s['spread']:.1%}")
+        total_time = total["median"]
+        # the stored run holds the medians of all trials, like the log
+        with open(record_path(logpath), "w") as f:
+            json.dump(median_record(samples), f, indent=2)
+
+    with open(logpath, "a") as file:
+        file.write(f"Total time: {total_time}\n")
+    store_run(logpath, method)
+    return logpath
+
+
+def thread_counts():
+    # 1, 2, 4, ... up to the number of usable cores
+    n = (
+        len(os.sched_getaffinity(0))
+        if hasattr(os, "sched_getaffinity")
+        else os.cpu_count()
+    )
+    counts = [1]
+    while counts[-1] * 2 < n:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != n:
+        counts.append(n)
+    return counts
+
+
+def thread_sweep(methods, cases, counts, warmup=0, repeat=1, max_spread=0.1):
+    # function evaluation time of the vectorized CasADi model with its mapped
+    # functions evaluated on a growing number of threads
+    for method in methods:
+        if method not in thread_methods:
+            print(f"skipped {method}: no mapped CasADi functions to thread")
+    methods = [method for method in methods if method in thread_methods]
+    results = []
+    for method, case, threads in itertools.product(methods, cases, counts):
+        logpath = run_case(
+            "casadi", method, case, None, True, warmup, repeat, max_spread, threads
+        )
+        fields = read_log(logpath)
+        results.append((method, case, threads, fields))
+
+    print(f"{'case':<32} {'method':<6} {'threads':>7} {'eval':>8} {'ipopt':>8}")
+    for method, case, threads, fields in results:
+        print(
+            f"{case:<32} {method:<6} {threads:>7} "
+            f"{fields['ad_time']:>8.3f} {fields['ipopt_time']:>8.3f}"
+        )
+    return results
+
+
+def set_affinity(pid, cpu):
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(pid, {cpu})
+        return
+    try:
+        import psutil
+    except ImportError:
+        print("CPU pinning needs os.sched_setaffinity or psutil, skipped")
+        return
+    psutil.Process(pid).cpu_affinity([cpu])
+
+
+def run_job(job, batch, timeout, cpus, trial_args):
+    # run one case in a separate single-job driver process
+    solver, method, case, jit = job
+    command = [
+        sys.executable,
+        str(Path(__file__).resolve()),
+        "--solver",
+        solver,
+        "--method",
+        method,
+        "--cases",
+        case,
+    ]
+    name = f"{case}_{solver}"
+    if jit == "codegen":
+        command.append("--codegen")
+        name += f"_{jit}"
+    elif jit is not None:
+        command.extend(["--jit", jit])
+        name += f"_{jit}"
+    if batch:
+        command.append("--batch")
+    command.extend(trial_args)
+
+    outdir = log_dir(method)
+    outdir.mkdir(exist_ok=True)
+    outpath = outdir / f"{name}.out"
+
+    env = dict(os.environ)
+    cpu = None
+    if cpus is not None:
+        cpu = cpus.get()
+        # keep the linear solver on the pinned core
+        env["OMP_NUM_THREADS"] = "1"
+
+    t0 = time.perf_counter()
+    try:
+        with open(outpath, "w") as out:
+            proc = subprocess.Popen(
+                command, stdout=out, stderr=subprocess.STDOUT, env=env
+            )
+            if cpu is not None:
+                set_affinity(proc.pid, cpu)
+            try:
+                returncode = proc.wait(timeout=timeout)
+                status = "ok" if returncode == 0 else "crashed"
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                proc.wait()
+                returncode = None
+                status = "timeout"
+    finally:
+        if cpu is not None:
+            cpus.put(cpu)
+    elapsed = time.perf_counter() - t0
+
+    label = solver if jit is None else f"{solver}_{jit}"
+    print(f"{status:>8} {elapsed:10.1f}s {label} {method} {case}", flush=True)
+    return {
+        "case": case,
+        "solver": solver,
+        "method": method,
+        "jit": jit,
+        "status": status,
+        "returncode": returncode,
+        "wall_time": elapsed,
+        "cpu": cpu,
+        "output": str(outpath),
+    }
+
+
+def run_jobs(jobs, n_jobs, batch=False, timeout=None, pin=False, trial_args=()):
+    # largest cases first so that the long jobs do not end the sweep
+    jobs = sorted(jobs, key=lambda job: case_size(job[2]), reverse=True)
+    # fill the case cache once, before the workers read it
+    for case in dict.fromkeys(job[2] for job in jobs):
+        load_case(case)
+
+    cpus = None
+    if pin:
+        available = (
+            sorted(os.sched_getaffinity(0))
+            if hasattr(os, "sched_getaffinity")
+            else list(range(os.cpu_count()))
+        )
+        if len(available) < n_jobs:
+            raise ValueError(f"Cannot pin {n_jobs} jobs to {len(available)} CPUs")
+        cpus = queue.Queue()
+        for cpu in available[:n_jobs]:
+            cpus.put(cpu)
+
+    with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+        results = list(
+            executor.map(
+                lambda job: run_job(job, batch, timeout, cpus, trial_args), jobs
+            )
+        )
+
+    with open(root_dir / "jobs.json", "w") as f:
+        json.dump(results, f, indent=2)
+    failed = [r for r in results if r["status"] != "ok"]
+    print(f"{len(results) - len(failed)}/{len(results)} jobs finished")
+    for r in failed:
+        print(f"{r['status']}: {r['method']} {r['case']} ({r['output']})")
+    return results
+
+
+def main():
+    json_path = root_dir / "test_cases.json"
+
+    with open(json_path, "r") as f:
+        test_cases = json.load(f)
+
+    # select solver method
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--solver", type=str, nargs="+", default=["poi"])
+    parser.add_argument("--method", type=str, nargs="+", default=["polar"])
+    parser.add_argument("--batch", action="store_true")
+    # JIT engines of PyOptInterface: LLVM, C (TCC) and C-cached (gcc, on disk)
+    parser.add_argument("--jit", type=str, nargs="+", default=["LLVM"])
+    # CasADi NLP compiled by gcc, cached in cache/casadi
+    parser.add_argument("--codegen", action="store_true")
+    # sweep the threads of the vectorized CasADi model, 1 up to the core count
+    # without values
+    parser.add_argument("--threads", type=int, nargs="*", default=None)
+    parser.add_argument("--cases", type=str, nargs="+", default=test_cases)
+    parser.add_argument("--jobs", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=None)
+    parser.add_argument("--pin", action="store_true")
+    parser.add_argument("--warmup", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--max-spread", type=float, default=0.1)
+    # peak Python allocations of the model build, slows the build down
+    parser.add_argument("--tracemalloc", action="store_true")
+    # starting point of the AC model, from the DC or SOC relaxation or from
+    # the AC power flow
+    parser.add_argument(
+        "--init", type=str, default="flat", choices=["flat", "dc", "soc", "pf"]
+    )
+    # exact reduction of the network before the model build
+    parser.add_argument("--reduce", action="store_true")
+    args = parser.parse_args()
+    # the scalar SX sources of large cases are too big for gcc
+    if args.codegen and not args.batch:
+        parser.error("--codegen requires --batch")
+
+    if args.threads is not None:
+        thread_sweep(
+            args.method,
+            args.cases,
+            args.threads or thread_counts(),
+            args.warmup,
+            args.repeat,
+            args.max_spread,
+        )
+        return
+
+    jobs = [
+        (solver, method, case, jit)
+        for solver, method, case in itertools.product(
+            args.solver, args.method, args.cases
+        )
+        if method in solver_methods.get(solver, [method])
+        for jit in (
+            args.jit if solver == "poi" else ["codegen" if args.codegen else None]
+        )
+    ]
+    if args.jobs > 0:
+        trial_args = [
+            f"--warmup={args.warmup}",
+            f"--repeat={args.repeat}",
+            f"--max-spread={args.max_spread}",
+        ]
+        if args.tracemalloc:
+            trial_args.append("--tracemalloc")
+        trial_args.append(f"--init={args.init}")
+        if args.reduce:
+            trial_args.append("--reduce")
+        run_jobs(jobs, args.jobs, args.batch, args.timeout, args.pin, trial_args)
+        return
+
+    for solver, method, case, jit in jobs:
+        run_case(
+            solver,
+            method,
+            case,
+            jit,
+            args.batch,
+            args.warmup,
+            args.repeat,
+            args.max_spread,
+            trace_allocations=args.tracemalloc,
+            init=args.init,
+            reduce=args.reduce,
+        )
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,253 @@
+import numpy as np
+
+from contextlib import contextmanager
+from pathlib import Path
+import json
+import os
+import threading
+import time
+import tracemalloc
+
+# phases that are reported on their own, every other phase is part of
+# the model construction
+SUMMARY_PHASES = {
+    "load": "load",
+    "variables": "variables",
+    "register": "jit",
+    "jit": "jit",
+    "codegen": "jit",
+    "compile": "jit",
+    "solver_init": "solver_init",
+    "init": "init",
+    "power_flow": "init",
+    "reduce": "reduce",
+    "optimize": "optimize",
+}
+
+# phases outside the timed model build and solve of the baseline "Total
+# time": reading the case, the network reduction and the starting point
+SETUP_PHASES = ["load", "reduce", "init", "power_flow"]
+
+
+def current_rss():
+    # resident set size of this process in bytes, None if unknown
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return psutil.Process().memory_info().rss
+
+
+class RssSampler:
+    # samples the RSS in a daemon thread and keeps the peak since the last reset
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._peak = current_rss()
+        thread = threading.Thread(target=self._run, daemon=True)
+        thread.start()
+
+    def _run(self):
+        while True:
+            rss = current_rss()
+            with self._lock:
+                self._peak = max(self._peak, rss)
+            time.sleep(self.interval)
+
+    def reset(self):
+        # (current RSS, peak RSS since the previous reset)
+        rss = current_rss()
+        with self._lock:
+            peak = max(self._peak, rss)
+            self._peak = rss
+        return rss, peak
+
+
+_sampler = None
+
+
+def rss_sampler():
+    # one sampler per process, None where the RSS cannot be read
+    global _sampler
+    if _sampler is None and current_rss() is not None:
+        _sampler = RssSampler()
+    return _sampler
+
+
+class PhaseTimer:
+    def __init__(self, memory=False):
+        self.phases = {}
+        # phase: {"peak_rss", "delta_rss"} in bytes if memory is tracked
+        self.memory = {}
+        # phase: peak of the Python allocations traced by tracemalloc
+        self.alloc_peaks = {}
+        self._sampler = rss_sampler() if memory else None
+        self.mark()
+
+    def mark(self):
+        if self._sampler is not None:
+            self._rss = self._sampler.reset()[0]
+        self._last = time.perf_counter()
+
+    def lap(self, name):
+        # charge the time since the previous mark/lap to the phase `name`
+        now = time.perf_counter()
+        self.phases[name] = self.phases.get(name, 0.0) + (now - self._last)
+        if self._sampler is not None:
+            rss, peak = self._sampler.reset()
+            m = self.memory.setdefault(name, {"peak_rss": 0, "delta_rss": 0})
+            m["peak_rss"] = max(m["peak_rss"], peak)
+            m["delta_rss"] += rss - self._rss
+            self._rss = rss
+        self._last = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name):
+        self.mark()
+        try:
+            yield
+        finally:
+            self.lap(name)
+
+    def total(self, exclude=()):
+        return sum(t for name, t in self.phases.items() if name not in exclude)
+
+    def summary(self):
+        summary = dict.fromkeys(
+            [
+                "load",
+                "reduce",
+                "variables",
+                "constraints",
+                "jit",
+                "solver_init",
+                "init",
+                "optimize",
+            ],
+            0.0,
+        )
+        for name, t in self.phases.items():
+            summary[SUMMARY_PHASES.get(name, "constraints")] += t
+        return summary
+
+    def memory_summary(self):
+        # peak and delta RSS of the summary phases
+        summary = {}
+        for name, m in self.memory.items():
+            s = summary.setdefault(
+                SUMMARY_PHASES.get(name, "constraints"), {"peak_rss": 0, "delta_rss": 0}
+            )
+            s["peak_rss"] = max(s["peak_rss"], m["peak_rss"])
+            s["delta_rss"] += m["delta_rss"]
+        return summary
+
+
+@contextmanager
+def traced_allocations(timer, name="build", enabled=True):
+    # peak of the Python allocations inside the block, tracemalloc slows
+    # down allocation heavy code, so it is only enabled on request
+    if not enabled:
+        yield
+        return
+    tracemalloc.start()
+    try:
+        yield
+    finally:
+        timer.alloc_peaks[name] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        timer.mark()
+
+
+def record_path(logpath):
+    return Path(logpath).with_suffix(".json")
+
+
+def write_record(logpath, timer, **fields):
+    # one JSON record per run next to the Ipopt log
+    record = dict(fields)
+    record["phases"] = timer.phases
+    record["summary"] = timer.summary()
+    if timer.memory:
+        record["memory"] = timer.memory_summary()
+        record["peak_rss"] = max(m["peak_rss"] for m in timer.memory.values())
+    if timer.alloc_peaks:
+        record["alloc_peaks"] = timer.alloc_peaks
+    with open(record_path(logpath), "w") as f:
+        json.dump(record, f, indent=2)
+    return record
+
+
+def read_record(logpath):
+    path = record_path(logpath)
+    if not path.exists():
+        return None
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def trial_statistics(samples, max_spread=0.1, min_time=0.01):
+    # median, IQR and min of every summary phase and the total time over the
+    # measured trials, and of the peak RSS if it was tracked; a quantity is
+    # unstable if IQR / median > max_spread
+    names = list(samples[0]["summary"]) + ["total_time"]
+    if "peak_rss" in samples[0]:
+        names.append("peak_rss")
+    statistics = {}
+    for name in names:
+        values = np.array(
+            [s["summary"][name] if name in s["summary"] else s[name] for s in samples],
+            dtype=float,
+        )
+        q1, median, q3 = np.percentile(values, [25, 50, 75])
+        spread = (q3 - q1) / median if median > 0 else 0.0
+        statistics[name] = {
+            "median": median,
+            "iqr": q3 - q1,
+            "min": values.min(),
+            "spread": spread,
+            "unstable": bool(median >= min_time and spread > max_spread),
+        }
+    return statistics
+
+
+def median_record(samples):
+    # one record of the measured trials to store: the median of every phase,
+    # summary phase, memory figure and time over all trials, phases missing
+    # in a trial count as 0; the solver results are those of the last trial
+    record = dict(samples[-1])
+
+    def medians(dicts, integer=False):
+        names = list(dict.fromkeys(name for d in dicts for name in d))
+        values = {name: np.median([d.get(name, 0) for d in dicts]) for name in names}
+        return {k: int(v) if integer else float(v) for k, v in values.items()}
+
+    record["phases"] = medians([s["phases"] for s in samples])
+    record["summary"] = medians([s["summary"] for s in samples])
+    if "memory" in record:
+        phases = list(dict.fromkeys(p for s in samples for p in s["memory"]))
+        record["memory"] = {
+            p: medians([s["memory"].get(p, {}) for s in samples], integer=True)
+            for p in phases
+        }
+    if "alloc_peaks" in record:
+        record["alloc_peaks"] = medians(
+            [s["alloc_peaks"] for s in samples], integer=True
+        )
+    for name in ["total_time", "wall_time", "ipopt_time", "ad_time", "peak_rss"]:
+        if all(s.get(name) is not None for s in samples):
+            value = np.median([s[name] for s in samples])
+            record[name] = int(value) if name == "peak_rss" else float(value)
+    record["trials"] = len(samples)
+    return record
+
+
+def write_trials(logpath, samples, statistics):
+    path = Path(logpath).with_suffix(".trials.json")
+    with open(path, "w") as f:
+        json.dump({"samples": samples, "statistics": statistics}, f, indent=2)
+    return path